@@ -0,0 +1,3 @@
+from refactor_stats_maker.session_helpers import RefactorStatsSession, StatsType
+
+__all__ = ["RefactorStatsSession", "StatsType"]
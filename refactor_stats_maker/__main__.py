@@ -1,18 +1,74 @@
-from enum import Enum
+from datetime import datetime, timedelta
 from importlib.metadata import version
 from pathlib import Path
+from typing import TextIO
 
 import click
+import humanize
 from codeowners import CodeOwners
+from git import Repo
 from halo import Halo
 
-from refactor_stats_maker.repository_helpers import RepoHandler
+from refactor_stats_maker.batch_helpers import (
+    build_repository_report,
+    display_batch_reports,
+    expand_repository_paths,
+    merge_leaderboards,
+    run_batch,
+)
+from refactor_stats_maker.bundle_helpers import (
+    export_cache_bundle,
+    import_cache_bundle,
+)
+from refactor_stats_maker.export_helpers import (
+    EXPORT_FORMATS,
+    RecordWriter,
+    iter_commit_records,
+    iter_file_records,
+    iter_team_records,
+)
+from refactor_stats_maker.jira_helpers import (
+    JiraIssueCache,
+    JiraSync,
+    build_jira_issues,
+    connect_jira,
+    display_jira_sync_report,
+    get_jira_cache_path,
+)
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE
+from refactor_stats_maker.merge_request_helpers import (
+    build_merge_request_data,
+    display_merge_request_data,
+)
+from refactor_stats_maker.milestone_helpers import (
+    MILESTONE_THRESHOLDS,
+    MilestoneFinder,
+    display_milestones,
+)
+from refactor_stats_maker.repository_helpers import (
+    FETCH_FRESHNESS,
+    MAINTENANCE_LOOSE_OBJECTS,
+    MaintenanceReport,
+)
+from refactor_stats_maker.server_helpers import (
+    POLL_INTERVAL,
+    StatsService,
+    serve_stats,
+)
+from refactor_stats_maker.session_helpers import (
+    EXCLUDE,
+    PROJECT_NAMES,
+    RefactorStatsSession,
+    StatsType,
+    get_scan_args,
+    read_codeowners,
+)
 from refactor_stats_maker.stats_helpers import (
-    build_chart_data,
+    CHART_BUCKETS,
+    LEADERBOARD_WINDOWS,
     BasicOracle,
-    build_file_status_list,
-    build_leaderboard_data,
-    build_stats_data,
+    build_chart_data,
+    resolve_leaderboard_window,
 )
 from refactor_stats_maker.stats_helpers import (
     display_chart,
@@ -21,21 +77,25 @@ from refactor_stats_maker.stats_helpers import (
     display_team_assignments,
 )
 from refactor_stats_maker.stats_helpers import get_file_owners
+from refactor_stats_maker.store_helpers import (
+    CumulativeLeaderboard,
+    RefactorCommitStore,
+)
+from refactor_stats_maker.tree_helpers import (
+    build_ref_comparison,
+    build_snapshot_data,
+    display_ref_comparison,
+)
 
 
-class StatsType(Enum):
-    EXPANDS = "expands"
-    CLASS_BASED = "class-based"
-
-
-def get_codeowners(repo_path) -> CodeOwners:
+def get_codeowners(
+    repo_path, session: RefactorStatsSession | None = None
+) -> CodeOwners:
     # PARSE CODEOWNERS FILE
-    codeowners_file = Path(f"{repo_path}/CODEOWNERS").expanduser()
-
     try:
-        with codeowners_file.open() as f:
-            codeowners = CodeOwners(f.read())
-            return codeowners
+        if session:
+            return session.codeowners
+        return read_codeowners(Path(f"{repo_path}").expanduser())
     except IOError:
         print(
             f"Cannot find a CODEOWNERS file "
@@ -60,18 +120,65 @@ def get_team_assignments(
     return team_assignments
 
 
-def get_scan_args(stats_type: StatsType) -> tuple[str, str]:
-    match stats_type.value:
-        case "expands":
-            return "a4c5abe006e7b55ecdab72bf6e997118cc6e60e6", "expanded: [',\\[].*"
-        case "class-based":
-            return "74d716e70263ffb017171a39a5a0e724c02356b3", "@Component"
-    raise Exception("Invalid type for commit hash")
+def validate_leaderboard_windows(ctx, param, value: tuple[str, ...]):
+    for window in value:
+        try:
+            resolve_leaderboard_window(window, datetime.now())
+        except Exception:
+            raise click.BadParameter(
+                f"{window} is not one of {', '.join(LEADERBOARD_WINDOWS)}"
+            )
+    return value
+
+
+def validate_repository_paths(ctx, param, value: tuple[str, ...]) -> list[Path]:
+    try:
+        paths = expand_repository_paths(value)
+    except FileNotFoundError as e:
+        raise click.BadParameter(f"{e} does not exist")
+    if not paths:
+        raise click.BadParameter(f"no repository matches {', '.join(value)}")
+    return paths
+
+
+def display_leaderboards(
+    stores: list[RefactorCommitStore],
+    leaderboard_window: tuple[str, ...],
+    sprint_start: datetime,
+    sprint_length: int,
+):
+    if not leaderboard_window:
+        # DISPLAY A LEADERBOARD
+        display_leaderboard(merge_leaderboards(s.leaderboard_data() for s in stores))
+        return
+
+    # DISPLAY A LEADERBOARD PER WINDOW
+    cumulative_leaderboards = [CumulativeLeaderboard(s) for s in stores]
+    for window in leaderboard_window:
+        start, end = resolve_leaderboard_window(
+            window, datetime.now(), sprint_start, sprint_length
+        )
+        display_leaderboard(
+            merge_leaderboards(c.window(start, end) for c in cumulative_leaderboards),
+            window=window,
+        )
+
+
+def display_maintenance_report(report: MaintenanceReport | None):
+    if not report:
+        return
+    click.secho(
+        f"Cache repository maintenance took {report.duration.total_seconds():.1f}s "
+        f"and reclaimed {humanize.naturalsize(max(report.reclaimed, 0))}",
+        fg="green",
+    )
 
 
 @click.command()
 @click.version_option(version=version("refactor_stats_maker"))
-@click.argument("repository-path", nargs=1, type=click.Path(exists=True))
+@click.argument(
+    "repository-path", nargs=-1, required=True, callback=validate_repository_paths
+)
 @click.option(
     "-l", "--file-list", default=False, is_flag=True, help="Display file list."
 )
@@ -95,8 +202,183 @@ def get_scan_args(stats_type: StatsType) -> tuple[str, str]:
     type=click.Choice(["expands", "class-based"], case_sensitive=False),
     help="Type of statistics to generate.",
 )
+@click.option(
+    "--chart-bucket",
+    default="day",
+    type=click.Choice(CHART_BUCKETS, case_sensitive=False),
+    help="Aggregate the statistics chart by commit, day, week or month.",
+)
+@click.option(
+    "--leaderboard-window",
+    multiple=True,
+    callback=validate_leaderboard_windows,
+    help="Display the leaderboard for a window: all, week, month, sprint or a "
+    "rolling number of days such as 30d. Can be repeated.",
+)
+@click.option(
+    "--sprint-start",
+    default="2024-01-01",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Start date of any sprint, used by the sprint leaderboard window.",
+)
+@click.option(
+    "--sprint-length",
+    default=14,
+    type=click.IntRange(min=1),
+    help="Sprint length in days.",
+)
+@click.option(
+    "--by-team",
+    default=False,
+    is_flag=True,
+    help="Display statistics for each team.",
+)
+@click.option(
+    "--merge-request",
+    nargs=2,
+    type=str,
+    default=None,
+    metavar="BASE HEAD",
+    help="Only count matches in the files changed between BASE and HEAD, exits "
+    "with a non-zero status if matches were added.",
+)
+@click.option(
+    "--fetch-freshness",
+    default=int(FETCH_FRESHNESS.total_seconds()),
+    type=click.IntRange(min=0),
+    help="Skip fetching the cache repository if it was fetched less than this many "
+    "seconds ago.",
+)
+@click.option(
+    "--maintenance",
+    default="auto",
+    type=click.Choice(["auto", "always", "never"], case_sensitive=False),
+    help="Maintain the cache repository in the background: only when needed, on "
+    "every run or never.",
+)
+@click.option(
+    "--maintenance-threshold",
+    default=MAINTENANCE_LOOSE_OBJECTS,
+    type=click.IntRange(min=0),
+    help="Number of loose objects that triggers maintenance of the cache repository.",
+)
+@click.option(
+    "--serve",
+    default=False,
+    is_flag=True,
+    help="Keep running and serve the statistics as JSON over HTTP.",
+)
+@click.option("--host", default="127.0.0.1", help="Host to serve the statistics on.")
+@click.option(
+    "--port",
+    default=8000,
+    type=click.IntRange(min=0, max=65535),
+    help="Port to serve the statistics on.",
+)
+@click.option(
+    "--poll-interval",
+    default=POLL_INTERVAL,
+    type=click.IntRange(min=1),
+    help="Seconds between checks for new commits while serving.",
+)
+@click.option(
+    "--snapshot-interval",
+    default=None,
+    type=click.Choice(["day", "week", "month"], case_sensitive=False),
+    help="Build the statistics chart from one snapshot per day, week or month of "
+    "first-parent history instead of inspecting every commit.",
+)
+@click.option(
+    "--milestones",
+    default=False,
+    is_flag=True,
+    help="Display the commits that crossed each refactored files threshold.",
+)
+@click.option(
+    "--milestone-threshold",
+    multiple=True,
+    default=MILESTONE_THRESHOLDS,
+    type=click.IntRange(min=1, max=100),
+    help="Percentage of refactored files displayed by --milestones. Can be repeated.",
+)
+@click.option(
+    "--fixed-file",
+    multiple=True,
+    metavar="PATH",
+    help="Display the commit that fixed a file. Can be repeated.",
+)
+@click.option(
+    "--compare-ref",
+    multiple=True,
+    metavar="REF",
+    help="Display the status of several refs side by side, read straight from the "
+    "cache repository without checking them out. Can be repeated.",
+)
+@click.option(
+    "--max-blob-size",
+    default=MAX_BLOB_SIZE,
+    type=click.IntRange(min=1),
+    help="Skip files read from git that are larger than this many bytes, skipped "
+    "files are logged.",
+)
+@click.option(
+    "--workers",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of repositories, snapshots or Jira requests processed at the same "
+    "time.",
+)
+@click.option(
+    "--repo-timeout",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Give up on a repository after this many seconds.",
+)
+@click.option(
+    "--export",
+    default=None,
+    type=click.File("w"),
+    metavar="PATH",
+    help="Stream file statuses, team assignments and refactor commits to PATH, use "
+    "- to write to stdout.",
+)
+@click.option(
+    "--export-format",
+    default="ndjson",
+    type=click.Choice(EXPORT_FORMATS, case_sensitive=False),
+    help="Export one JSON document per line or a single JSON array.",
+)
+@click.option(
+    "--import-cache",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    metavar="PATH",
+    help="Restore the cache from a bundle created by --export-cache before running, "
+    "a missing bundle is skipped.",
+)
+@click.option(
+    "--export-cache",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    metavar="PATH",
+    help="Pack the cache repository and the results of this run into a bundle that "
+    "a later run can restore.",
+)
+@click.option(
+    "--jira-sync",
+    default=False,
+    is_flag=True,
+    help="Create or update one Jira issue per team listing its remaining files.",
+)
+@click.option("--jira-server", envvar="JIRA_SERVER", help="Jira server URL.")
+@click.option("--jira-project", envvar="JIRA_PROJECT", help="Jira project key.")
+@click.option("--jira-user", envvar="JIRA_USER", help="Jira user email.")
+@click.option("--jira-token", envvar="JIRA_TOKEN", help="Jira API token.")
+@click.option(
+    "--jira-issue-type", default="Task", help="Type of the Jira issues created."
+)
 def run(
-    repository_path: Path,
+    repository_path: list[Path],
     file_list: bool,
     copy: bool,
     gitlab: bool,
@@ -104,67 +386,281 @@ def run(
     list_commits: bool,
     stats: bool,
     type: str,
+    chart_bucket: str,
+    leaderboard_window: tuple[str, ...],
+    sprint_start: datetime,
+    sprint_length: int,
+    by_team: bool,
+    merge_request: tuple[str, str] | None,
+    fetch_freshness: int,
+    maintenance: str,
+    maintenance_threshold: int,
+    serve: bool,
+    host: str,
+    port: int,
+    poll_interval: int,
+    workers: int,
+    max_blob_size: int,
+    repo_timeout: int | None,
+    compare_ref: tuple[str, ...],
+    snapshot_interval: str | None,
+    milestones: bool,
+    milestone_threshold: tuple[int, ...],
+    fixed_file: tuple[str, ...],
+    jira_sync: bool,
+    jira_server: str | None,
+    jira_project: str | None,
+    jira_user: str | None,
+    jira_token: str | None,
+    jira_issue_type: str,
+    export: TextIO | None,
+    export_format: str,
+    import_cache: Path | None,
+    export_cache: Path | None,
 ):
-    repo_path = repository_path
     verbose = file_list
     copy_to_clipboard = copy
     format_for_gitlab = gitlab
 
-    stats_type = StatsType.EXPANDS  # default
-    project_name = ""
-    match type:
-        case "expands":
-            stats_type = StatsType.EXPANDS
-            project_name = "Old Expands"
-        case "class-based":
-            project_name = "Class Based to Options API"
-            stats_type = StatsType.CLASS_BASED
-
-    # VALIDATE THE REPOSITORY PATH
-    if repo_path is None:
-        print("Invalid repository path")
+    stats_type = StatsType(type)
+    project_name = PROJECT_NAMES[stats_type]
+    commit_hash, regex = get_scan_args(stats_type)
+    exclude = EXCLUDE
+
+    if jira_sync and not all([jira_server, jira_project, jira_user, jira_token]):
+        print(
+            "--jira-sync needs --jira-server, --jira-project, --jira-user and "
+            "--jira-token"
+        )
         exit(1)
 
-    working_repo_handler = RepoHandler(repo_path)
+    if len(repository_path) > 1:
+        single_repository_options = {
+            "--stats": stats,
+            "--by-team": by_team,
+            "--snapshot-interval": snapshot_interval,
+            "--milestones": milestones,
+            "--fixed-file": fixed_file,
+            "--compare-ref": compare_ref,
+            "--merge-request": merge_request,
+            "--serve": serve,
+            "--jira-sync": jira_sync,
+            "--export": export,
+            "--import-cache": import_cache,
+            "--export-cache": export_cache,
+        }
+        used_options = [
+            name for name, value in single_repository_options.items() if value
+        ]
+        if used_options:
+            print(f"{', '.join(used_options)} only support a single repository")
+            exit(1)
+
+        # PROCESS EVERY REPOSITORY CONCURRENTLY
+        click.secho(
+            f"Generating statistics for {project_name} in "
+            f"{len(repository_path)} repositories",
+            fg="green",
+        )
+        reports = run_batch(
+            repository_path,
+            lambda path: build_repository_report(
+                path,
+                commit_hash,
+                regex,
+                exclude,
+                with_history=leaderboard or list_commits,
+                fetch_freshness=timedelta(seconds=fetch_freshness),
+                max_blob_size=max_blob_size,
+                git_timeout=repo_timeout,
+            ),
+            workers,
+            repo_timeout,
+        )
+        display_batch_reports(
+            project_name, reports, verbose=verbose, format_for_gitlab=format_for_gitlab
+        )
+
+        stores = [r.stats_store for r in reports if r.stats_store]
+        if list_commits:
+            for report in reports:
+                if report.stats_store:
+                    click.secho(report.name, fg="green")
+                    display_commits(report.stats_store.rows(newest_first=True))
+        if leaderboard:
+            display_leaderboards(
+                stores, leaderboard_window, sprint_start, sprint_length
+            )
+
+        if any(r.error for r in reports):
+            exit(1)
+        return
+
+    repo_path = repository_path[0]
+
+    if import_cache:
+        # START FROM THE CACHE OF A PREVIOUS RUN
+        if import_cache.exists():
+            try:
+                import_cache_bundle(import_cache, Repo(repo_path))
+            except Exception as e:
+                print(f"Cannot import {import_cache}: {e}")
+                exit(1)
+            click.secho(f"Restored the cache from {import_cache}", fg="green")
+        else:
+            click.secho(f"{import_cache} does not exist, starting cold", fg="yellow")
+
+    if merge_request:
+        # ONLY SCAN FILES CHANGED BY THE MERGE REQUEST
+        base, head = merge_request
+        try:
+            merge_request_files = build_merge_request_data(
+                Repo(repo_path),
+                base,
+                head,
+                regex,
+                exclude,
+                get_codeowners(repo_path),
+                max_blob_size,
+            )
+        except Exception as e:
+            print(f"Cannot compare {base} with {head}: {e}")
+            exit(1)
+        display_merge_request_data(merge_request_files)
+        if any(f.delta > 0 for f in merge_request_files):
+            exit(1)
+        return
+
+    session = RefactorStatsSession(
+        repo_path,
+        stats_type,
+        fetch_freshness=timedelta(seconds=fetch_freshness),
+        maintenance_loose_objects=maintenance_threshold,
+        max_blob_size=max_blob_size,
+        sprint_start=sprint_start,
+        sprint_length=sprint_length,
+        # keep stdout clean when the export is piped
+        quiet=export is not None and export.name == "<stdout>",
+    )
+    working_repo_handler = session.handler
+
+    if compare_ref:
+        # COMPARE REFS SIDE BY SIDE WITHOUT CHECKING THEM OUT
+        working_repo_handler.update_cache_repo()
+        with working_repo_handler.lock.shared():
+            ref_statuses = build_ref_comparison(
+                working_repo_handler.cache_repo,
+                list(compare_ref),
+                commit_hash,
+                regex,
+                exclude,
+                max_blob_size,
+            )
+        display_ref_comparison(
+            project_name, ref_statuses, get_codeowners(repo_path, session)
+        )
+        return
+
+    if milestones or fixed_file:
+        # BINARY SEARCH MILESTONES IN FIRST-PARENT HISTORY
+        working_repo_handler.update_cache_repo()
+        with working_repo_handler.lock.shared():
+            finder = MilestoneFinder(
+                working_repo_handler.cache_repo,
+                commit_hash,
+                working_repo_handler.resolve_rev(session.rev),
+                regex,
+                exclude,
+                max_blob_size,
+            )
+            found_milestones = []
+            if milestones:
+                found_milestones += [
+                    finder.find_threshold(t) for t in sorted(milestone_threshold)
+                ]
+            found_milestones += [finder.find_file_fixed(path) for path in fixed_file]
+        display_milestones(found_milestones)
+        return
+
+    if export:
+        # STREAM THE DATASET WHILE IT'S PRODUCED
+        codeowners = get_codeowners(repo_path, session)
+        status_files = session.file_statuses()
+        with RecordWriter(export, export_format) as writer:
+            writer.write_all(iter_file_records(status_files, codeowners))
+            writer.write_all(iter_team_records(status_files, codeowners))
+            writer.write_all(iter_commit_records(session.iter_refactor_commits()))
+        return
+
+    maintenance_thread = None
+    if maintenance != "never":
+        maintenance_thread = working_repo_handler.start_maintenance(
+            force=maintenance == "always"
+        )
+
+    if serve:
+        # KEEP THE STATISTICS IN MEMORY AND SERVE THEM
+        # exit early when the CODEOWNERS file is missing
+        get_codeowners(repo_path, session)
+        service = StatsService(session)
+        serve_stats(service, host, port, poll_interval)
+        return
 
     # LET THE USER KNOW WHAT I'M ABOUT TO DO
     click.secho(f"Generating statistics for {project_name}", fg="green")
 
     # LOOK FOR FILES TO REFACTOR
 
-    commit_hash = get_scan_args(stats_type)[0]
-    regex = get_scan_args(stats_type)[1]
-    exclude = ["spec.ts", "stories.ts", "md"]
-    current_files = working_repo_handler.get_files_to_refactor(regex, exclude=exclude)
-    baseline_files = working_repo_handler.get_baseline_file_paths(
-        commit_hash, regex, exclude=exclude
-    )
-    codeowners = get_codeowners(repo_path)
+    codeowners = get_codeowners(repo_path, session)
+    # baseline files and refactor commits are reused from the previous run
+    status_files = session.file_statuses()
+
+    if stats and snapshot_interval:
+        # SAMPLE REMAINING REFACTORS ALONG FIRST-PARENT HISTORY
+        working_repo_handler.update_cache_repo()
+        spinner = Halo(text="Inspecting snapshots...", spinner="dots")
+        spinner.start()
+        with working_repo_handler.lock.shared():
+            snapshots = build_snapshot_data(
+                working_repo_handler.cache_repo,
+                commit_hash,
+                working_repo_handler.resolve_rev(session.rev),
+                regex,
+                exclude,
+                bucket=snapshot_interval,
+                workers=workers,
+                max_blob_size=max_blob_size,
+            )
+        spinner.stop()
+
+        data = build_chart_data(snapshots)
+        display_chart(data, bucket=snapshot_interval)
+
+        print()
 
-    # compare each file list and return a list of File status objects
-    status_files = build_file_status_list(baseline_files, current_files)
+        if BasicOracle.can_make_prediction(data):
+            estimates = BasicOracle.make_prediction(data)
+            BasicOracle.display_estimates(estimates)
 
     if leaderboard or list_commits:
-        working_repo_handler.move_to_baseline_commit("develop", pull=True)
-        commits = working_repo_handler.get_commits_since_hash(commit_hash)
         spinner = Halo(text="Inspecting commits...", spinner="dots")
         spinner.start()
-        stats_data = build_stats_data(commits, regex, baseline_files)
+        # only the commits that landed since the previous run are inspected
+        stats_store = session.store()
         spinner.stop()
 
         if list_commits:
             # DISPLAY A LIST OF RELEVANT COMMITS
-            display_commits(
-                sorted(stats_data, key=lambda commit: commit.date, reverse=True)
-            )
+            display_commits(stats_store.rows(newest_first=True))
         if leaderboard:
-            # DISPLAY A LEADERBOARD
-            display_leaderboard(build_leaderboard_data(stats_data))
+            display_leaderboards(
+                [stats_store], leaderboard_window, sprint_start, sprint_length
+            )
 
-        if stats:
+        if stats and not snapshot_interval:
             # DISPLAY REMAINING REFACTORS OVER TIME
-            data = build_chart_data(stats_data)
-            display_chart(data)
+            data = stats_store.chart_data()
+            display_chart(data, bucket=chart_bucket)
 
             print()
 
@@ -172,6 +668,21 @@ def run(
             estimates = BasicOracle.make_prediction(data)
             BasicOracle.display_estimates(estimates)
 
+        if stats and by_team and not snapshot_interval:
+            # DISPLAY REMAINING REFACTORS OVER TIME FOR EACH TEAM
+            for team, team_data in sorted(stats_store.team_chart_data().items()):
+                display_chart(
+                    team_data,
+                    bucket=chart_bucket,
+                    title=f"{team} refactored files over time",
+                )
+
+                print()
+
+                if BasicOracle.can_make_prediction(team_data):
+                    estimates = BasicOracle.make_prediction(team_data)
+                    BasicOracle.display_estimates(estimates)
+
     # DRAW A TIMELINE OF REFACTORS LEFT
 
     # plt.date_form('Y/m/d')
@@ -186,6 +697,8 @@ def run(
     # fig = px.line(x=dates, y=refactors_left, title='Cenas')
     # fig.show()
 
+    session.save()
+
     display_team_assignments(
         project_name,
         status_files,
@@ -195,6 +708,35 @@ def run(
         format_for_gitlab=format_for_gitlab,
     )
 
+    if jira_sync:
+        # SYNC EACH TEAM'S REMAINING FILES TO A JIRA ISSUE
+        cache = JiraIssueCache(
+            get_jira_cache_path(jira_server, jira_project, project_name)
+        )
+        sync = JiraSync(
+            connect_jira(jira_server, jira_user, jira_token, workers),
+            jira_project,
+            cache,
+            issue_type=jira_issue_type,
+            workers=workers,
+        )
+        spinner = Halo(text="Syncing Jira issues...", spinner="dots")
+        spinner.start()
+        jira_report = sync.sync(
+            build_jira_issues(project_name, status_files, codeowners)
+        )
+        spinner.stop()
+        display_jira_sync_report(jira_report, cache)
+
+    if maintenance_thread:
+        maintenance_thread.join()
+        display_maintenance_report(working_repo_handler.maintenance_report)
+
+    if export_cache:
+        # PACK THE CACHE FOR THE NEXT RUN
+        export_cache_bundle(working_repo_handler, export_cache)
+        click.secho(f"Exported the cache to {export_cache}", fg="green")
+
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,276 @@
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from threading import BoundedSemaphore, Thread
+from typing import Callable, Iterable
+
+import click
+import plotext as plt
+from codeowners import CodeOwners
+from git import Actor
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE
+from refactor_stats_maker.repository_helpers import FETCH_FRESHNESS
+from refactor_stats_maker.session_helpers import RefactorStatsSession
+from refactor_stats_maker.stats_helpers import (
+    File,
+    assign_files_to_teams,
+    display_team_assignments,
+)
+from refactor_stats_maker.store_helpers import RefactorCommitStore
+
+GLOB_CHARACTERS = "*?["
+
+
+@dataclass
+class RepositoryReport:
+    path: Path
+    status_files: list[File] = field(default_factory=list)
+    codeowners: CodeOwners | None = None
+    stats_store: RefactorCommitStore | None = None
+    duration: timedelta = timedelta(0)
+    error: str | None = None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def fixed_files_count(self) -> int:
+        return len([f for f in self.status_files if f.fixed])
+
+
+def expand_repository_paths(patterns: Iterable[str]) -> list[Path]:
+    """
+    Expands glob patterns into repository folders, folders matched more than once are
+    only listed once
+
+    :raise FileNotFoundError: if a path without glob characters doesn't exist
+    """
+    paths: list[Path] = []
+    for pattern in patterns:
+        pattern = str(Path(pattern).expanduser())
+        if any(c in pattern for c in GLOB_CHARACTERS):
+            matches = sorted(glob.glob(pattern))
+        elif Path(pattern).exists():
+            matches = [pattern]
+        else:
+            raise FileNotFoundError(pattern)
+        for match in matches:
+            path = Path(match)
+            if path.is_dir() and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def build_repository_report(
+    repo_path: Path,
+    commit_hash: str,
+    regex: str,
+    exclude: list[str],
+    with_history: bool = False,
+    fetch_freshness: timedelta = FETCH_FRESHNESS,
+    max_blob_size: int = MAX_BLOB_SIZE,
+    git_timeout: float | None = None,
+) -> RepositoryReport:
+    """
+    Runs the whole stats pipeline for a single repository, any error is recorded in
+    the report instead of being raised
+
+    :param git_timeout: seconds after which clones, fetches and pulls are killed
+    """
+    start = time.monotonic()
+    report = RepositoryReport(repo_path)
+    try:
+        session = RefactorStatsSession(
+            repo_path,
+            commit_hash=commit_hash,
+            regex=regex,
+            exclude=exclude,
+            fetch_freshness=fetch_freshness,
+            max_blob_size=max_blob_size,
+            git_timeout=git_timeout,
+            quiet=True,
+        )
+        report.codeowners = session.codeowners
+        report.status_files = session.file_statuses()
+        if with_history:
+            report.stats_store = session.store()
+        session.save()
+    except Exception as e:
+        report.error = str(e) or type(e).__name__
+    report.duration = timedelta(seconds=time.monotonic() - start)
+    return report
+
+
+def run_with_timeout(
+    repo_path: Path,
+    build_report: Callable[[Path], RepositoryReport],
+    timeout: float | None,
+    slots: BoundedSemaphore | None = None,
+) -> RepositoryReport:
+    """
+    Builds the report in a daemon thread so that a repository that hangs, e.g. on a
+    fetch, is abandoned once the timeout expires without blocking the process exit
+
+    An abandoned thread keeps running, and holding its cache lock, so it keeps its
+    slot until it really ends: the next repository waits for a free slot, up to the
+    timeout, and is reported as not started if none frees up
+    """
+    reports: list[RepositoryReport] = []
+    if slots and not slots.acquire(timeout=timeout):
+        return RepositoryReport(
+            repo_path,
+            error=f"Not started, no worker was free after {timeout:g}s",
+        )
+
+    def target():
+        try:
+            reports.append(build_report(repo_path))
+        except Exception as e:
+            reports.append(RepositoryReport(repo_path, error=str(e)))
+        finally:
+            if slots:
+                slots.release()
+
+    thread = Thread(target=target, name=f"batch-{repo_path.name}", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if reports:
+        return reports[0]
+    return RepositoryReport(
+        repo_path,
+        duration=timedelta(seconds=timeout),
+        error=f"Timed out after {timeout:g}s",
+    )
+
+
+def run_batch(
+    repo_paths: list[Path],
+    build_report: Callable[[Path], RepositoryReport],
+    workers: int,
+    timeout: float | None = None,
+) -> list[RepositoryReport]:
+    """
+    Builds the report of each repository with at most workers repositories being
+    processed at the same time
+
+    :return: reports in the same order as repo_paths
+    """
+    slots = BoundedSemaphore(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda path: run_with_timeout(path, build_report, timeout, slots),
+                repo_paths,
+            )
+        )
+
+
+def merge_team_assignments(
+    reports: list[RepositoryReport],
+) -> dict[str, list[File]]:
+    assignments: dict[str, list[File]] = {}
+    for report in reports:
+        if report.error or not report.codeowners:
+            continue
+        for team, files in assign_files_to_teams(
+            report.status_files, report.codeowners
+        ).items():
+            assignments[team] = assignments.get(team, []) + files
+    return dict(sorted(assignments.items()))
+
+
+def merge_leaderboards(leaderboards: Iterable[dict[Actor, int]]) -> dict[Actor, int]:
+    authors: dict[Actor, int] = {}
+    for leaderboard in leaderboards:
+        for author, refactor_count in leaderboard.items():
+            authors[author] = authors.get(author, 0) + refactor_count
+    return authors
+
+
+def display_batch_summary(reports: list[RepositoryReport]):
+    table = Table(title="Repositories", box=box.SIMPLE_HEAD)
+    table.add_column("Repository")
+    table.add_column("Fixed", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Done", justify="right")
+    table.add_column("Duration", justify="right")
+    table.add_column("Status")
+    for report in reports:
+        duration = f"{report.duration.total_seconds():.1f}s"
+        if report.error:
+            table.add_row(
+                report.name, "", "", "", duration, f"[red1]{report.error}[/red1]"
+            )
+            continue
+        total_file_count = len(report.status_files)
+        percent_done = (
+            report.fixed_files_count / total_file_count * 100 if total_file_count else 0
+        )
+        table.add_row(
+            report.name,
+            str(report.fixed_files_count),
+            str(total_file_count),
+            f"{percent_done:.2f}%",
+            duration,
+            "[green1]OK[/green1]",
+        )
+    Console().print(table)
+
+
+def display_batch_reports(
+    project_name: str,
+    reports: list[RepositoryReport],
+    verbose=False,
+    format_for_gitlab=False,
+):
+    # PER REPOSITORY REPORTS
+
+    for report in reports:
+        click.secho(f"{report.name} ({report.path})", fg="green")
+        if report.error:
+            click.secho(f"Unable to generate statistics: {report.error}", fg="red")
+        else:
+            display_team_assignments(
+                project_name,
+                report.status_files,
+                report.codeowners,
+                verbose=verbose,
+                format_for_gitlab=format_for_gitlab,
+            )
+        print()
+
+    display_batch_summary(reports)
+
+    # AGGREGATED TEAM STATS
+
+    assignments = merge_team_assignments(reports)
+    if not assignments:
+        print("No stats to display")
+        return
+
+    team_names = []
+    percentages = []
+    for team, files in assignments.items():
+        fixed_files_count = len([f for f in files if f.fixed])
+        team_names.append(f"{team} {fixed_files_count}/{len(files)}")
+        percentages.append(round(fixed_files_count / len(files) * 100, 1))
+
+    succeeded = [r for r in reports if not r.error]
+    fixed_files_count = sum(r.fixed_files_count for r in succeeded)
+    total_file_count = sum(len(r.status_files) for r in succeeded)
+    percent_done = fixed_files_count / total_file_count * 100 if total_file_count else 0
+    title = (
+        f"OVERALL REFACTORING STATUS OF {project_name.upper()} ACROSS "
+        f"{len(succeeded)} REPOSITORIES {percent_done:.2f}%"
+    )
+
+    plt.simple_bar(team_names, percentages, width=75, title=title)
+    plt.show()
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import BinaryIO
+
+from git import Repo
+
+from refactor_stats_maker.lock_helpers import CacheLock
+from refactor_stats_maker.match_helpers import CHUNK_SIZE
+from refactor_stats_maker.repository_helpers import RepoHandler, get_cache_repo_root
+
+BUNDLE_FORMAT = "refactor-stats-maker-cache"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+REPOSITORY_BUNDLE_NAME = "repository.bundle"
+# scan caches and history states saved in the cache repository's git dir
+STATE_FILE_PATTERN = "refactor_stats_maker_*"
+STATE_FILE_SUFFIXES = (".json", ".npz")
+
+
+def hash_stream(stream: BinaryIO, destination: BinaryIO | None = None) -> str:
+    """
+    :return: SHA-256 of the stream, which is copied to destination if given
+    """
+    digest = hashlib.sha256()
+    while chunk := stream.read(CHUNK_SIZE):
+        digest.update(chunk)
+        if destination:
+            destination.write(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    with path.open("rb") as f:
+        return hash_stream(f)
+
+
+def get_state_file_paths(repo: Repo) -> list[Path]:
+    return sorted(
+        path
+        for path in Path(repo.git_dir).glob(STATE_FILE_PATTERN)
+        if path.suffix in STATE_FILE_SUFFIXES
+    )
+
+
+def export_cache_bundle(handler: RepoHandler, bundle_path: Path) -> list[str]:
+    """
+    Packs the cache repository, as a git bundle, and the state files of previous
+    runs into a single zip archive. The manifest holds the archive's version and
+    the SHA-256 of every other file.
+
+    :return: names of the packed files
+    """
+    repo = handler.cache_repo
+    with handler.lock.shared(), TemporaryDirectory() as temporary_dir:
+        repository_bundle = Path(temporary_dir, REPOSITORY_BUNDLE_NAME)
+        repo.git.bundle("create", str(repository_bundle), "--all")
+        files = {REPOSITORY_BUNDLE_NAME: repository_bundle}
+        for path in get_state_file_paths(repo):
+            files[f"state/{path.name}"] = path
+
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "head": (
+                repo.head.commit.hexsha
+                if repo.head.is_detached
+                else repo.active_branch.name
+            ),
+            "files": {name: hash_file(path) for name, path in files.items()},
+        }
+
+        # write to a temporary file first so that a failed export doesn't leave a
+        # truncated archive behind
+        temporary_path = Path(f"{bundle_path}.{os.getpid()}.tmp")
+        try:
+            with zipfile.ZipFile(temporary_path, "w") as archive:
+                archive.writestr(
+                    MANIFEST_NAME,
+                    json.dumps(manifest, indent=4, sort_keys=True),
+                    zipfile.ZIP_DEFLATED,
+                )
+                for name, path in files.items():
+                    # git bundles and .npz files are already compressed
+                    archive.write(path, name, zipfile.ZIP_STORED)
+            os.replace(temporary_path, bundle_path)
+        finally:
+            temporary_path.unlink(missing_ok=True)
+    return list(files)
+
+
+def read_manifest(archive: zipfile.ZipFile) -> dict:
+    """
+    :raise Exception: if the archive isn't a cache bundle of a supported version
+    """
+    try:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    except (KeyError, ValueError):
+        raise Exception("Not a refactor_stats_maker cache bundle")
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise Exception("Not a refactor_stats_maker cache bundle")
+    if manifest.get("version") != BUNDLE_VERSION:
+        raise Exception(f"Unsupported cache bundle version {manifest.get('version')}")
+    for name in manifest["files"]:
+        if name != REPOSITORY_BUNDLE_NAME and not (
+            name.startswith("state/") and "/" not in name[len("state/") :]
+        ):
+            raise Exception(f"Unexpected file {name} in cache bundle")
+    return manifest
+
+
+def extract_verified(archive: zipfile.ZipFile, name: str, checksum: str, path: Path):
+    """
+    :raise Exception: if the extracted file doesn't match its checksum
+    """
+    try:
+        with archive.open(name) as source, path.open("wb") as destination:
+            actual_checksum = hash_stream(source, destination)
+    except KeyError:
+        raise Exception(f"{name} is missing from the cache bundle")
+    if actual_checksum != checksum:
+        raise Exception(f"{name} doesn't match its checksum, the bundle is corrupted")
+
+
+def restore_repository(
+    repository_bundle: Path, path: Path, head: str, remote_url: str | None
+) -> Repo:
+    repo = Repo.init(path)
+    # copy every ref as is, remote tracking refs included
+    repo.git.fetch(str(repository_bundle), "+refs/*:refs/*", "--update-head-ok")
+    if remote_url:
+        repo.create_remote("origin", remote_url)
+    # the bundle doesn't carry the branches' upstream configuration
+    prefix = "refs/remotes/origin/"
+    remote_branches = {
+        r.path[len(prefix) :] for r in repo.refs if r.path.startswith(prefix)
+    }
+    for branch in repo.branches:
+        if branch.name in remote_branches:
+            repo.git.branch(f"--set-upstream-to=origin/{branch.name}", branch.name)
+    repo.git.checkout(head)
+    return repo
+
+
+def import_cache_bundle(bundle_path: Path, root_repo: Repo) -> Path:
+    """
+    Restores a cache bundle into the cache of root_repo, replacing the existing
+    cache once every file was verified
+
+    :return: path of the restored cache repository
+    :raise Exception: if the bundle is invalid or corrupted
+    """
+    cache_repo_root = get_cache_repo_root(root_repo)
+    cache_repo_root.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        remote_url = root_repo.remotes.origin.url
+    except AttributeError:
+        remote_url = None
+
+    with (
+        zipfile.ZipFile(bundle_path) as archive,
+        TemporaryDirectory(dir=cache_repo_root.parent) as temporary_dir,
+    ):
+        manifest = read_manifest(archive)
+        extracted_dir = Path(temporary_dir, "files")
+        extracted_dir.mkdir()
+        for name, checksum in manifest["files"].items():
+            extract_verified(
+                archive, name, checksum, extracted_dir.joinpath(Path(name).name)
+            )
+
+        restored_path = Path(temporary_dir, "repository")
+        repo = restore_repository(
+            extracted_dir.joinpath(REPOSITORY_BUNDLE_NAME),
+            restored_path,
+            manifest["head"],
+            remote_url,
+        )
+        for name in manifest["files"]:
+            if name != REPOSITORY_BUNDLE_NAME:
+                shutil.copy(extracted_dir.joinpath(Path(name).name), repo.git_dir)
+
+        with CacheLock(cache_repo_root.with_suffix(".lock")).exclusive():
+            if cache_repo_root.exists():
+                shutil.rmtree(cache_repo_root)
+            os.replace(restored_path, cache_repo_root)
+    return cache_repo_root
@@ -0,0 +1,98 @@
+import json
+from collections.abc import Iterable, Iterator
+from typing import TextIO
+
+from codeowners import CodeOwners
+
+from refactor_stats_maker.stats_helpers import (
+    File,
+    RefactorCommit,
+    assign_files_to_teams,
+    get_file_owners,
+)
+
+EXPORT_FORMATS = ["ndjson", "json"]
+
+
+class RecordWriter:
+    """
+    Writes each record as soon as it's produced, either as one JSON document per
+    line (ndjson) or as the items of a single JSON array (json), no record is kept
+    in memory
+    """
+
+    def __init__(self, stream: TextIO, export_format: str = "ndjson"):
+        self.stream = stream
+        self.export_format = export_format
+        # records written so far
+        self.count = 0
+
+    def write(self, record: dict):
+        data = json.dumps(record, sort_keys=True)
+        if self.export_format == "json":
+            data = ("[\n" if not self.count else ",\n") + data
+        else:
+            data += "\n"
+        self.stream.write(data)
+        self.count += 1
+
+    def write_all(self, records: Iterable[dict]):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        if self.export_format == "json":
+            self.stream.write("\n]\n" if self.count else "[]\n")
+        self.stream.flush()
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            # leave the array open so that a truncated export isn't valid JSON
+            self.stream.flush()
+            return
+        self.close()
+
+
+def iter_file_records(
+    status_files: list[File], codeowners: CodeOwners
+) -> Iterator[dict]:
+    for f in sorted(status_files):
+        yield {
+            "type": "file",
+            "name": f.name(),
+            "path": f.path,
+            "fixed": f.fixed,
+            "is_new": f.is_new,
+            "teams": get_file_owners(f.path, codeowners),
+        }
+
+
+def iter_team_records(
+    status_files: list[File], codeowners: CodeOwners
+) -> Iterator[dict]:
+    for team, files in sorted(assign_files_to_teams(status_files, codeowners).items()):
+        yield {
+            "type": "team",
+            "team": team,
+            "fixed": len([f for f in files if f.fixed]),
+            "total": len(files),
+            "remaining_files": [f.path for f in files if not f.fixed],
+        }
+
+
+def iter_commit_records(commits: Iterable[RefactorCommit]) -> Iterator[dict]:
+    for commit in commits:
+        yield {
+            "type": "commit",
+            "hexsha": commit.hexsha,
+            "date": commit.date.isoformat(),
+            "summary": commit.summary,
+            "author_name": commit.author_name,
+            "author_email": commit.author_email,
+            "refactor_count": commit.refactor_count,
+            "remaining_files_count": commit.remaining_files_count,
+            "team_remaining_files_counts": commit.team_remaining_files_counts,
+        }
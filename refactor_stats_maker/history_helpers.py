@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from codeowners import CodeOwners
+
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.repository_helpers import RepoHandler
+from refactor_stats_maker.store_helpers import RefactorCommitStore, build_stats_store
+
+HISTORY_STATE_VERSION = 1
+
+
+def get_codeowners_fingerprint(codeowners: CodeOwners) -> str:
+    rules = [(path[1], path[2]) for path in codeowners.paths]
+    return hashlib.md5(repr(rules).encode()).hexdigest()
+
+
+class HistoryState:
+    """
+    Outcome of the previous history walk so that the next one only inspects the
+    commits that landed since: the baseline files, the ones that weren't fixed yet,
+    the last commit walked and the commit store
+
+    It's saved in the cache repository's git dir as a JSON file next to the store's
+    .npz file, one per rev walked, and discarded when the scan arguments or the
+    CODEOWNERS rules change, or when the last commit walked was rewritten out of the
+    history.
+    """
+
+    def __init__(
+        self,
+        repo_handler: RepoHandler,
+        commit_hash: str,
+        regex: str,
+        exclude: list[str],
+        codeowners: CodeOwners,
+        matcher: BlobMatcher,
+        rev: str = "develop",
+    ):
+        self.repo_handler = repo_handler
+        self.commit_hash = commit_hash
+        self.regex = regex
+        self.exclude = exclude
+        self.codeowners = codeowners
+        self.matcher = matcher
+        self.rev = rev
+        self.path = repo_handler.get_history_path(commit_hash, regex, rev)
+        self.store_path = self.path.with_suffix(".npz")
+        self.key = hashlib.md5(
+            json.dumps(
+                [
+                    commit_hash,
+                    regex,
+                    rev,
+                    sorted(exclude),
+                    get_codeowners_fingerprint(codeowners),
+                    matcher.max_size,
+                ]
+            ).encode()
+        ).hexdigest()
+        self.baseline_files: list[str] | None = None
+        self.reset()
+        self.load()
+
+    def reset(self):
+        """
+        Forgets the walked history but keeps the baseline files
+        """
+        self.remaining_baseline_files: list[str] = list(self.baseline_files or [])
+        self.last_commit: str | None = None
+        self.store = RefactorCommitStore()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (IOError, ValueError):
+            return
+        if data.get("version") != HISTORY_STATE_VERSION or data.get("key") != self.key:
+            return
+        self.baseline_files = data["baseline_files"]
+        self.remaining_baseline_files = data["remaining_baseline_files"]
+        self.last_commit = data["last_commit"]
+        if not self.last_commit:
+            return
+        try:
+            self.store = RefactorCommitStore.load(self.store_path)
+        except Exception:
+            # a missing or outdated store means walking the history again
+            self.reset()
+
+    def save(self):
+        # write to temporary files first so that a concurrent run never reads a
+        # partially written state
+        suffix = f".{os.getpid()}.tmp"
+        if self.last_commit:
+            temporary_path = Path(f"{self.store_path}{suffix}")
+            self.store.save(temporary_path)
+            os.replace(temporary_path, self.store_path)
+        data = {
+            "version": HISTORY_STATE_VERSION,
+            "key": self.key,
+            "baseline_files": self.baseline_files,
+            "remaining_baseline_files": self.remaining_baseline_files,
+            "last_commit": self.last_commit,
+        }
+        temporary_path = Path(f"{self.path}{suffix}")
+        temporary_path.write_text(json.dumps(data))
+        os.replace(temporary_path, self.path)
+
+    def get_baseline_files(self) -> list[str]:
+        """
+        Only checks out and scans the baseline commit if no previous run did
+        """
+        if self.baseline_files is None:
+            self.baseline_files = self.repo_handler.get_baseline_file_paths(
+                self.commit_hash, self.regex, self.exclude
+            )
+            self.remaining_baseline_files = list(self.baseline_files)
+        return self.baseline_files
+
+    def update(self) -> RefactorCommitStore:
+        """
+        Walks the commits between the last commit walked and the tip of rev
+
+        :return: the commit store with every refactor commit up to rev
+        """
+        handler = self.repo_handler
+        handler.update_cache_repo()
+        tip = handler.resolve_rev(self.rev)
+        if tip == self.last_commit:
+            return self.store
+
+        self.get_baseline_files()
+        if self.last_commit and not handler.is_ancestor(self.last_commit, tip):
+            # the history was rewritten
+            self.reset()
+
+        if self.last_commit:
+            commits = handler.get_commits_after(self.last_commit, tip)
+        else:
+            commits = handler.get_commits_since_hash(self.commit_hash, tip)
+        # the previous store may still be read by other threads, new rows go into a
+        # copy that replaces it once complete
+        store = self.store.copy()
+        remaining_baseline_files = list(self.remaining_baseline_files)
+        with handler.lock.shared():
+            build_stats_store(
+                commits,
+                self.regex,
+                remaining_baseline_files,
+                self.codeowners,
+                store=store,
+                matcher=self.matcher,
+            )
+        self.store = store
+        self.remaining_baseline_files = remaining_baseline_files
+        self.last_commit = tip
+        return self.store
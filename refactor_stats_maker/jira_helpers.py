@@ -0,0 +1,258 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import click
+import platformdirs
+from codeowners import CodeOwners
+from jira import JIRA, JIRAError
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from refactor_stats_maker.stats_helpers import File, assign_files_to_teams
+
+# Jira rejects bulk creates of more than 50 issues
+JIRA_BATCH_SIZE = 50
+JIRA_WORKERS = 4
+JIRA_MAX_RETRIES = 3
+
+
+@dataclass
+class JiraIssue:
+    """
+    Desired state of the issue that tracks a team's remaining files
+    """
+
+    team: str
+    summary: str
+    description: str
+
+    @property
+    def fingerprint(self) -> str:
+        return hashlib.sha1(f"{self.summary}\n{self.description}".encode()).hexdigest()
+
+    def fields(self) -> dict:
+        return {"summary": self.summary, "description": self.description}
+
+
+@dataclass
+class JiraSyncReport:
+    created: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    unchanged: list[str] = field(default_factory=list)
+    # error message by team
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def build_jira_issues(
+    project_name: str, status_files: list[File], codeowners: CodeOwners
+) -> list[JiraIssue]:
+    issues = []
+    for team, files in sorted(assign_files_to_teams(status_files, codeowners).items()):
+        remaining_files = [f for f in files if not f.fixed]
+        lines = [f"{len(remaining_files)} of {len(files)} files left to refactor", ""]
+        lines += [f"* {f.get_simple_path()}" for f in remaining_files]
+        issues.append(
+            JiraIssue(team, f"{project_name}: {team} refactor", "\n".join(lines))
+        )
+    return issues
+
+
+def get_jira_cache_path(server: str, project_key: str, project_name: str) -> Path:
+    cache_root = platformdirs.user_cache_dir("refactor_stats_maker", "Tiago Pereira")
+    name = hashlib.md5(f"{server} {project_key} {project_name}".encode()).hexdigest()
+    return Path(cache_root).joinpath("jira", f"{name}.json")
+
+
+class JiraIssueCache:
+    """
+    Key and fingerprint of the issue created for each team, so that a sync knows
+    which issues exist and which changed without querying Jira
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # team: {"key": issue key, "fingerprint": fingerprint of the synced fields}
+        self.issues: dict[str, dict[str, str]] = {}
+        self.load()
+
+    def load(self):
+        try:
+            self.issues = json.loads(self.path.read_text())
+        except (IOError, ValueError):
+            self.issues = {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.issues, indent=4, sort_keys=True))
+
+
+def connect_jira(
+    server: str,
+    user: str,
+    token: str,
+    workers: int = JIRA_WORKERS,
+    max_retries: int = JIRA_MAX_RETRIES,
+) -> JIRA:
+    """
+    The client's session retries rate limited and unavailable responses, its
+    connection pool is sized so that every worker keeps its connection alive
+    """
+    jira = JIRA(
+        server,
+        basic_auth=(user, token),
+        get_server_info=False,
+        max_retries=max_retries,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    # the client doesn't expose its session, it's the only way to size the pool
+    jira._session.mount(server, adapter)
+    return jira
+
+
+class JiraSync:
+    def __init__(
+        self,
+        jira: JIRA,
+        project_key: str,
+        cache: JiraIssueCache,
+        issue_type: str = "Task",
+        workers: int = JIRA_WORKERS,
+        batch_size: int = JIRA_BATCH_SIZE,
+    ):
+        self.jira = jira
+        self.project_key = project_key
+        self.cache = cache
+        self.issue_type = issue_type
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def plan(
+        self, issues: list[JiraIssue]
+    ) -> tuple[list[JiraIssue], list[JiraIssue], list[JiraIssue]]:
+        """
+        :return: issues to create, to update and unchanged issues
+        """
+        creates, updates, unchanged = [], [], []
+        for issue in issues:
+            cached = self.cache.issues.get(issue.team)
+            if not cached:
+                creates.append(issue)
+            elif cached["fingerprint"] != issue.fingerprint:
+                updates.append(issue)
+            else:
+                unchanged.append(issue)
+        return creates, updates, unchanged
+
+    def create_batch(
+        self, issues: list[JiraIssue]
+    ) -> list[tuple[JiraIssue, str | None, str | None]]:
+        """
+        :return: (issue, key, error message) of each issue, key is None if the
+        creation failed
+        """
+        field_list = [
+            {
+                "project": {"key": self.project_key},
+                "issuetype": {"name": self.issue_type},
+                **issue.fields(),
+            }
+            for issue in issues
+        ]
+        try:
+            results = self.jira.create_issues(field_list, prefetch=False)
+        except JIRAError as e:
+            return [(issue, None, e.text or str(e)) for issue in issues]
+        except RequestException as e:
+            # the connection failed even after the session's retries
+            return [(issue, None, str(e)) for issue in issues]
+        return [
+            (issue, r["issue"].key, None)
+            if r["status"] == "Success"
+            else (issue, None, str(r["error"]))
+            for issue, r in zip(issues, results)
+        ]
+
+    def update(self, issue: JiraIssue, key: str) -> str | None:
+        """
+        :return: an error message if the update failed
+        """
+        url = f"{self.jira._get_url(f'issue/{key}')}?notifyUsers=false"
+        try:
+            self.jira._session.put(url, data=json.dumps({"fields": issue.fields()}))
+        except JIRAError as e:
+            return str(e.status_code) if e.status_code == 404 else e.text or str(e)
+        except RequestException as e:
+            return str(e)
+        return None
+
+    def run_creates(
+        self,
+        executor: ThreadPoolExecutor,
+        issues: list[JiraIssue],
+        report: JiraSyncReport,
+    ):
+        batches = [
+            issues[i : i + self.batch_size]
+            for i in range(0, len(issues), self.batch_size)
+        ]
+        for results in executor.map(self.create_batch, batches):
+            for issue, key, error in results:
+                if key is None:
+                    report.failed[issue.team] = error
+                    continue
+                self.cache.issues[issue.team] = {
+                    "key": key,
+                    "fingerprint": issue.fingerprint,
+                }
+                report.created.append(issue.team)
+
+    def sync(self, issues: list[JiraIssue]) -> JiraSyncReport:
+        """
+        Creates the issues of new teams in batches and updates the issues whose
+        fields changed since the previous sync, at most workers requests are made at
+        the same time. The cache is saved even if some requests failed.
+        """
+        report = JiraSyncReport()
+        creates, updates, unchanged = self.plan(issues)
+        report.unchanged = [issue.team for issue in unchanged]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                self.run_creates(executor, creates, report)
+
+                errors = executor.map(
+                    lambda issue: self.update(
+                        issue, self.cache.issues[issue.team]["key"]
+                    ),
+                    updates,
+                )
+                # issues deleted in Jira are created again
+                recreates = []
+                for issue, error in zip(updates, errors):
+                    if error == "404":
+                        recreates.append(issue)
+                    elif error:
+                        report.failed[issue.team] = error
+                    else:
+                        self.cache.issues[issue.team]["fingerprint"] = issue.fingerprint
+                        report.updated.append(issue.team)
+                self.run_creates(executor, recreates, report)
+
+        finally:
+            # keep the keys of the issues created before a failure
+            self.cache.save()
+        return report
+
+
+def display_jira_sync_report(report: JiraSyncReport, cache: JiraIssueCache):
+    for team in report.created:
+        click.secho(f"Created {cache.issues[team]['key']} for {team}", fg="green")
+    for team in report.updated:
+        click.secho(f"Updated {cache.issues[team]['key']} for {team}", fg="green")
+    if report.unchanged:
+        click.echo(f"{len(report.unchanged)} issues are up to date")
+    for team, error in report.failed.items():
+        click.secho(f"Failed to sync the issue for {team}: {error}", fg="red")
@@ -0,0 +1,249 @@
+import json
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from threading import Event, Lock, RLock, Thread
+
+LOCK_TIMEOUT = timedelta(minutes=10)
+STALE_LOCK_TIMEOUT = timedelta(hours=1)
+
+EXCLUSIVE_LOCK_FILE = "exclusive.lock"
+SHARED_LOCK_PREFIX = "shared-"
+
+
+class LockTimeout(Exception):
+    pass
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists but belongs to another user
+        return True
+    return True
+
+
+class CacheLock:
+    """
+    Readers-writer lock shared between processes, backed by lock files in a folder
+
+    Writers create exclusive.lock and wait for readers to leave, readers create one
+    shared-*.lock file each and wait while exclusive.lock exists. Lock files record
+    their owner so that locks left behind by crashed runs (dead process on this host
+    or older than stale_timeout) are removed. A background thread touches the lock
+    files this process holds every refresh_interval, so that a long fetch or scan
+    never looks stale to other processes.
+
+    Locks are reentrant and held on behalf of the whole process: shared locks of
+    this process never block its own exclusive lock.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        timeout: timedelta = LOCK_TIMEOUT,
+        stale_timeout: timedelta = STALE_LOCK_TIMEOUT,
+        poll_interval: float = 0.1,
+        refresh_interval: timedelta | None = None,
+    ):
+        self.path = path
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.poll_interval = poll_interval
+        self.refresh_interval = refresh_interval or stale_timeout / 4
+        self.token = uuid.uuid4().hex
+        self.exclusive_path = self.path.joinpath(EXCLUSIVE_LOCK_FILE)
+        self.shared_path = self.path.joinpath(f"{SHARED_LOCK_PREFIX}{self.token}.lock")
+
+        self._exclusive_lock = RLock()
+        self._exclusive_depth = 0
+        self._shared_lock = Lock()
+        self._shared_depth = 0
+        # lock files held by this process, kept fresh by the heartbeat thread
+        self._held_paths: set[Path] = set()
+        self._held_lock = Lock()
+        self._heartbeat_stopped: Event | None = None
+
+    # LOCK FILES
+
+    def write_lock_file(self, path: Path):
+        """
+        :raise FileExistsError: if the lock file already exists
+        """
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        owner = {"pid": os.getpid(), "host": socket.gethostname(), "token": self.token}
+        with os.fdopen(fd, "w") as f:
+            json.dump(owner, f)
+
+    def hold(self, path: Path):
+        with self._held_lock:
+            self._held_paths.add(path)
+            if self._heartbeat_stopped is None:
+                self._heartbeat_stopped = Event()
+                Thread(
+                    target=self.keep_alive, args=(self._heartbeat_stopped,), daemon=True
+                ).start()
+
+    def release(self, path: Path):
+        with self._held_lock:
+            self._held_paths.discard(path)
+            if not self._held_paths and self._heartbeat_stopped is not None:
+                self._heartbeat_stopped.set()
+                self._heartbeat_stopped = None
+        path.unlink(missing_ok=True)
+
+    def keep_alive(self, stopped: Event):
+        while not stopped.wait(self.refresh_interval.total_seconds()):
+            with self._held_lock:
+                paths = list(self._held_paths)
+            for path in paths:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+
+    def is_stale(self, path: Path, stat: os.stat_result | None = None) -> bool:
+        try:
+            age = time.time() - (stat or path.stat()).st_mtime
+            owner = json.loads(path.read_text())
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            # the owner may still be writing its lock file
+            return age > self.stale_timeout.total_seconds()
+        if owner.get("token") == self.token:
+            return False
+        if age > self.stale_timeout.total_seconds():
+            return True
+        return owner.get("host") == socket.gethostname() and not is_process_alive(
+            owner.get("pid", 0)
+        )
+
+    def remove_stale_locks(self):
+        for path in self.path.glob("*.lock"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if not self.is_stale(path, stat):
+                continue
+            # the lock may have been released and acquired again, or refreshed by
+            # its owner, since it was found stale
+            try:
+                current = path.stat()
+            except FileNotFoundError:
+                continue
+            if (current.st_ino, current.st_mtime_ns) == (stat.st_ino, stat.st_mtime_ns):
+                path.unlink(missing_ok=True)
+
+    def other_shared_locks(self) -> list[Path]:
+        return [
+            p
+            for p in self.path.glob(f"{SHARED_LOCK_PREFIX}*.lock")
+            if p != self.shared_path
+        ]
+
+    def wait(self, deadline: float, message: str):
+        if time.monotonic() > deadline:
+            raise LockTimeout(f"Timed out waiting for {message} on {self.path}")
+        time.sleep(self.poll_interval)
+        self.remove_stale_locks()
+
+    # EXCLUSIVE
+
+    def acquire_exclusive(self):
+        self._exclusive_lock.acquire()
+        if self._exclusive_depth:
+            self._exclusive_depth += 1
+            return
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        deadline = time.monotonic() + self.timeout.total_seconds()
+        try:
+            self.remove_stale_locks()
+            while True:
+                try:
+                    self.write_lock_file(self.exclusive_path)
+                    self.hold(self.exclusive_path)
+                    break
+                except FileExistsError:
+                    self.wait(deadline, "the exclusive lock")
+
+            # new readers are now kept out, wait for the current ones to leave
+            while self.other_shared_locks():
+                try:
+                    self.wait(deadline, "shared locks to be released")
+                except LockTimeout:
+                    self.release(self.exclusive_path)
+                    raise
+        except BaseException:
+            self._exclusive_lock.release()
+            raise
+        self._exclusive_depth = 1
+
+    def release_exclusive(self):
+        self._exclusive_depth -= 1
+        if not self._exclusive_depth:
+            self.release(self.exclusive_path)
+        self._exclusive_lock.release()
+
+    @contextmanager
+    def exclusive(self):
+        self.acquire_exclusive()
+        try:
+            yield self
+        finally:
+            self.release_exclusive()
+
+    # SHARED
+
+    def holds_exclusive(self) -> bool:
+        try:
+            owner = json.loads(self.exclusive_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+        return owner.get("token") == self.token
+
+    def acquire_shared(self):
+        with self._shared_lock:
+            if self._shared_depth:
+                self._shared_depth += 1
+                return
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            deadline = time.monotonic() + self.timeout.total_seconds()
+            self.remove_stale_locks()
+            while True:
+                if self.exclusive_path.exists() and not self.holds_exclusive():
+                    self.wait(deadline, "the exclusive lock to be released")
+                    continue
+                self.write_lock_file(self.shared_path)
+                # a writer may have slipped in between the check and our lock file
+                if self.exclusive_path.exists() and not self.holds_exclusive():
+                    self.shared_path.unlink(missing_ok=True)
+                    self.wait(deadline, "the exclusive lock to be released")
+                    continue
+                break
+            self.hold(self.shared_path)
+            self._shared_depth = 1
+
+    def release_shared(self):
+        with self._shared_lock:
+            self._shared_depth -= 1
+            if not self._shared_depth:
+                self.release(self.shared_path)
+
+    @contextmanager
+    def shared(self):
+        self.acquire_shared()
+        try:
+            yield self
+        finally:
+            self.release_shared()
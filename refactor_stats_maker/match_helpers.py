@@ -0,0 +1,89 @@
+import logging
+import re
+from typing import BinaryIO
+
+from git import Blob
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOB_SIZE = 10 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# same heuristic as git: a NUL byte in the first 8000 bytes means binary content
+BINARY_HEADER_SIZE = 8000
+
+
+def is_binary(header: bytes) -> bool:
+    return b"\0" in header[:BINARY_HEADER_SIZE]
+
+
+class BlobMatcher:
+    """
+    Counts regex matches in blobs without loading them whole: blobs larger than
+    max_size are skipped, binary blobs are detected from their header and the rest
+    is streamed in chunks of chunk_size bytes
+
+    Matching is done on bytes so content that isn't valid UTF-8 doesn't raise. The
+    patterns this tool looks for never span lines, so each chunk is matched up to its
+    last line break and the incomplete line is carried over to the next chunk.
+    """
+
+    def __init__(
+        self, regex: str, max_size: int = MAX_BLOB_SIZE, chunk_size: int = CHUNK_SIZE
+    ):
+        self.regex_expr = re.compile(regex.encode())
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        # (path or blob SHA, size) of the blobs skipped for being too large
+        self.skipped: list[tuple[str, int]] = []
+
+    def is_too_large(self, size: int, name: str = "") -> bool:
+        if size <= self.max_size:
+            return False
+        self.skipped.append((name, size))
+        logger.warning(
+            "Skipping %s, %d bytes is over the %d bytes limit",
+            name,
+            size,
+            self.max_size,
+        )
+        return True
+
+    def drain(self, stream: BinaryIO):
+        """
+        Reads what's left of an abandoned stream in chunks, GitPython's streams read
+        all their remaining bytes at once when they're garbage collected
+        """
+        while stream.read(self.chunk_size):
+            pass
+
+    def count_stream(self, stream: BinaryIO, size: int, name: str = "") -> int:
+        """
+        Git object streams must be checked with is_too_large() before they're opened,
+        an oversized stream is left unread here
+        """
+        if self.is_too_large(size, name):
+            return 0
+
+        chunk = stream.read(self.chunk_size)
+        if is_binary(chunk):
+            self.drain(stream)
+            return 0
+
+        count = 0
+        carry = b""
+        while chunk:
+            buffer = carry + chunk
+            end = buffer.rfind(b"\n") + 1
+            count += len(self.regex_expr.findall(buffer, 0, end))
+            carry = buffer[end:]
+            chunk = stream.read(self.chunk_size)
+        return count + len(self.regex_expr.findall(carry))
+
+    def count_blob(self, blob: Blob | None, name: str | None = None) -> int:
+        if blob is None:
+            return 0
+        name = name or blob.path
+        # the size comes from the object header, the content isn't read
+        if self.is_too_large(blob.size, name):
+            return 0
+        return self.count_stream(blob.data_stream, blob.size, name)
@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+
+from codeowners import CodeOwners
+from git import Repo
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE, BlobMatcher
+from refactor_stats_maker.stats_helpers import get_file_owners
+
+
+@dataclass(order=True)
+class MergeRequestFile:
+    path: str
+    matches_before: int
+    matches_after: int
+    teams: list[str] = field(default_factory=list)
+
+    @property
+    def delta(self) -> int:
+        return self.matches_after - self.matches_before
+
+
+def is_excluded(path: str, exclude: list[str]) -> bool:
+    return any(path.endswith(f".{extension}") for extension in exclude)
+
+
+def build_merge_request_data(
+    repo: Repo,
+    base: str,
+    head: str,
+    regex: str,
+    exclude: list[str],
+    codeowners: CodeOwners,
+    max_blob_size: int = MAX_BLOB_SIZE,
+) -> list[MergeRequestFile]:
+    """
+    Counts matches only in the files changed between the merge base of base and head
+    and head itself, the same way a merge request diff is computed
+
+    :return: files whose match count changed, sorted by path
+    :raise Exception: if base and head have no common commit
+    """
+    matcher = BlobMatcher(regex, max_blob_size)
+    merge_bases = repo.merge_base(base, head)
+    if not merge_bases:
+        raise Exception(f"{base} and {head} have no common commit")
+    merge_base = merge_bases[0]
+
+    files: list[MergeRequestFile] = []
+    for d in merge_base.diff(head):
+        path = d.b_path or d.a_path
+        if is_excluded(path, exclude):
+            continue
+        matches_before = matcher.count_blob(d.a_blob, path)
+        matches_after = matcher.count_blob(d.b_blob, path)
+        if matches_before == matches_after:
+            continue
+        files.append(
+            MergeRequestFile(
+                path, matches_before, matches_after, get_file_owners(path, codeowners)
+            )
+        )
+
+    return sorted(files)
+
+
+def get_team_deltas(files: list[MergeRequestFile]) -> dict[str, tuple[int, int]]:
+    """
+    :return: dictionary of (added matches, removed matches) per team
+    """
+    team_deltas: dict[str, tuple[int, int]] = {}
+    for f in files:
+        for team in f.teams:
+            added, removed = team_deltas.get(team, (0, 0))
+            team_deltas[team] = (
+                added + max(f.delta, 0),
+                removed + max(-f.delta, 0),
+            )
+    return dict(sorted(team_deltas.items()))
+
+
+def display_merge_request_data(files: list[MergeRequestFile]):
+    console = Console()
+
+    if not files:
+        console.print("No matches added or removed")
+        return
+
+    table = Table(title="Matches changed by this merge request", box=box.SIMPLE_HEAD)
+    table.add_column("File")
+    table.add_column("Before", justify="right")
+    table.add_column("After", justify="right")
+    table.add_column("Teams")
+    for f in files:
+        style = "red1" if f.delta > 0 else "green1"
+        table.add_row(
+            f.path,
+            str(f.matches_before),
+            f"[{style}]{f.matches_after}[/{style}]",
+            ", ".join(f.teams),
+        )
+    console.print(table)
+
+    table = Table(title="Matches changed by team", box=box.SIMPLE_HEAD)
+    table.add_column("Team")
+    table.add_column("Added", justify="right", style="red1")
+    table.add_column("Removed", justify="right", style="green1")
+    for team, (added, removed) in get_team_deltas(files).items():
+        table.add_row(team, str(added), str(removed))
+    console.print(table)
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from git import Commit, Repo
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE
+from refactor_stats_maker.tree_helpers import (
+    BlobMatchCache,
+    count_remaining_files,
+    get_files_to_refactor_at_rev,
+    get_first_parent_commits,
+)
+
+MILESTONE_THRESHOLDS = [50, 75, 90]
+
+
+@dataclass
+class Milestone:
+    label: str
+    hexsha: str | None = None
+    date: datetime | None = None
+    summary: str | None = None
+    author_name: str | None = None
+    author_email: str | None = None
+    # why the milestone can't be found, when it can't
+    note: str | None = None
+
+    @property
+    def reached(self) -> bool:
+        return self.hexsha is not None
+
+
+class MilestoneFinder:
+    """
+    Finds the first commit of first-parent history, between the baseline commit and
+    rev, that reached a milestone by binary searching it, each probe counts the
+    matches in a single commit tree
+
+    The remaining file count is assumed to only go down, if files are reintroduced
+    the commit found is one where the milestone was crossed but maybe not the first.
+    """
+
+    def __init__(
+        self,
+        repo: Repo,
+        commit_hash: str,
+        rev: str,
+        regex: str,
+        exclude: list[str],
+        max_blob_size: int = MAX_BLOB_SIZE,
+    ):
+        self.repo = repo
+        self.commits = get_first_parent_commits(repo, commit_hash, rev)
+        self.cache = BlobMatchCache(regex, max_blob_size)
+        self.baseline_files = set(
+            get_files_to_refactor_at_rev(repo, commit_hash, self.cache, exclude)
+        )
+        self.remaining_files_counts: dict[int, int] = {}
+        # number of commit trees inspected
+        self.scans = 0
+
+    def get_remaining_files_count(self, index: int) -> int:
+        count = self.remaining_files_counts.get(index)
+        if count is None:
+            self.scans += 1
+            count = count_remaining_files(
+                self.repo, self.commits[index].hexsha, self.baseline_files, self.cache
+            )
+            self.remaining_files_counts[index] = count
+        return count
+
+    def file_matches(self, index: int, path: str) -> bool:
+        """
+        Only reads the blob of path, it isn't counted as a scan
+        """
+        try:
+            blob = self.commits[index].tree[path]
+        except KeyError:
+            # the file was deleted or moved
+            return False
+        return bool(self.cache.count(self.repo, blob.hexsha, path))
+
+    def bisect(self, predicate: Callable[[int], bool]) -> Commit | None:
+        """
+        :return: first commit for which predicate holds or None if it doesn't hold
+        for the most recent commit
+        """
+        low, high = 0, len(self.commits) - 1
+        if not predicate(high):
+            return None
+        while low < high:
+            middle = (low + high) // 2
+            if predicate(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return self.commits[low]
+
+    def find_threshold(self, percentage: int) -> Milestone:
+        """
+        :param percentage: percentage of baseline files refactored
+        """
+        max_remaining_files = len(self.baseline_files) * (100 - percentage) / 100
+        commit = self.bisect(
+            lambda i: self.get_remaining_files_count(i) <= max_remaining_files
+        )
+        return build_milestone(f"{percentage}% refactored", commit)
+
+    def find_file_fixed(self, path: str) -> Milestone:
+        label = f"{path} fixed"
+        # otherwise the baseline commit would be found as the one that fixed it
+        if not self.file_matches(0, path):
+            return Milestone(label, note="Not a baseline file")
+        commit = self.bisect(lambda i: not self.file_matches(i, path))
+        return build_milestone(label, commit)
+
+
+def build_milestone(label: str, commit: Commit | None) -> Milestone:
+    if commit is None:
+        return Milestone(label)
+    return Milestone(
+        label,
+        commit.hexsha,
+        datetime.fromtimestamp(commit.committed_date),
+        commit.summary,
+        commit.author.name,
+        commit.author.email,
+    )
+
+
+def display_milestones(milestones: list[Milestone]):
+    table = Table(title="MILESTONES", box=box.SIMPLE_HEAD)
+    table.add_column("Milestone")
+    table.add_column("Date")
+    table.add_column("Commit")
+    table.add_column("Author")
+    table.add_column("Summary")
+    for milestone in milestones:
+        if not milestone.reached:
+            note = milestone.note or "Not reached yet"
+            table.add_row(milestone.label, f"[#808080]{note}[/#808080]")
+            continue
+        table.add_row(
+            milestone.label,
+            milestone.date.strftime("%Y-%m-%d"),
+            milestone.hexsha[:8],
+            milestone.author_name,
+            milestone.summary,
+        )
+    Console().print(table)
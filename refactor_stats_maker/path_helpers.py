@@ -0,0 +1,98 @@
+from array import array
+from threading import Lock
+
+
+class PathTable:
+    """
+    Interns file paths: each path is stored once as a directory id plus a basename
+    id and directories and basenames are shared by every path that has them, so
+    files only need to hold a path id
+
+    The name of each path is its basename and the simple path, without the src/
+    root folder, is built from a directory prefix that is only computed once per
+    directory. Full paths are joined on first read and kept, they're read by every
+    sort and lookup.
+
+    Interning takes a lock so a table can be shared by concurrent scans, reads
+    don't.
+    """
+
+    def __init__(self):
+        # directories keep their trailing slash, files at the root have ""
+        self.directories: list[str] = []
+        self.simple_directories: list[str] = []
+        self.basenames: list[str] = []
+        self._directory_index: dict[str, int] = {}
+        self._basename_index: dict[str, int] = {}
+        # path id by (directory id, basename id) packed into a single int
+        self._path_index: dict[int, int] = {}
+        self._directory_ids = array("i")
+        self._basename_ids = array("i")
+        # joined path by id, None until it's read
+        self._paths: list[str | None] = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._directory_ids)
+
+    def _intern_directory(self, directory: str) -> int:
+        directory_id = self._directory_index.get(directory)
+        if directory_id is None:
+            directory_id = len(self.directories)
+            self.directories.append(directory)
+            self.simple_directories.append(directory.replace("src/", ""))
+            self._directory_index[directory] = directory_id
+        return directory_id
+
+    def _intern_basename(self, basename: str) -> int:
+        basename_id = self._basename_index.get(basename)
+        if basename_id is None:
+            basename_id = len(self.basenames)
+            self.basenames.append(basename)
+            self._basename_index[basename] = basename_id
+        return basename_id
+
+    def intern(self, path: str) -> int:
+        """
+        :return: id of path, the same path always gets the same id
+        """
+        basename = path.rpartition("/")[2]
+        directory = path[: len(path) - len(basename)]
+        with self._lock:
+            directory_id = self._intern_directory(directory)
+            basename_id = self._intern_basename(basename)
+            key = directory_id << 32 | basename_id
+            path_id = self._path_index.get(key)
+            if path_id is None:
+                path_id = len(self._directory_ids)
+                self._directory_ids.append(directory_id)
+                self._basename_ids.append(basename_id)
+                self._paths.append(None)
+                self._path_index[key] = path_id
+        return path_id
+
+    def basename_id(self, path_id: int) -> int:
+        return self._basename_ids[path_id]
+
+    def path(self, path_id: int) -> str:
+        path = self._paths[path_id]
+        if path is None:
+            path = (
+                self.directories[self._directory_ids[path_id]]
+                + self.basenames[self._basename_ids[path_id]]
+            )
+            self._paths[path_id] = path
+        return path
+
+    def name(self, path_id: int) -> str:
+        return self.basenames[self._basename_ids[path_id]]
+
+    def simple_path(self, path_id: int) -> str:
+        return (
+            self.simple_directories[self._directory_ids[path_id]]
+            + self.basenames[self._basename_ids[path_id]]
+        )
+
+
+# shared by every File built on its own, file status lists have their own table
+PATHS = PathTable()
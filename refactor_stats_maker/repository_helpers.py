@@ -1,35 +1,146 @@
 import hashlib
+import json
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
+from threading import Thread
 
 import platformdirs
-from git import InvalidGitRepositoryError, Repo, Commit
+from git import (
+    BadName,
+    Commit,
+    Git,
+    GitCommandError,
+    InvalidGitRepositoryError,
+    Repo,
+)
 from halo import Halo
 from ripgrepy import Ripgrepy
 
+from refactor_stats_maker.lock_helpers import CacheLock
+from refactor_stats_maker.scan_helpers import WorkingTreeScanner
+from refactor_stats_maker.tree_helpers import resolve_ref
+
+
+FETCH_FRESHNESS = timedelta(minutes=5)
+MAINTENANCE_LOOSE_OBJECTS = 1000
+MAINTENANCE_INTERVAL = timedelta(days=7)
+
 
 def hash_root_repo_path(path: str) -> str:
     return hashlib.md5(str.encode(path)).hexdigest()
 
 
+def get_cache_repo_root(root_repo: Repo) -> Path:
+    cache_repo_root_str: str = platformdirs.user_cache_dir(
+        "refactor_stats_maker", "Tiago Pereira"
+    )
+    return Path(cache_repo_root_str).joinpath(
+        hash_root_repo_path(root_repo.git_dir.__str__())
+    )
+
+
+class CacheState:
+    """
+    State of the cache repository that must survive between runs, stored as JSON
+    inside the cache repository's git dir
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.fetched_at: datetime | None = None
+        self.remote_tips: dict[str, str] = {}
+        self.maintained_at: datetime | None = None
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except (IOError, ValueError):
+            return
+        if data.get("fetched_at"):
+            self.fetched_at = datetime.fromisoformat(data["fetched_at"])
+        self.remote_tips = data.get("remote_tips", {})
+        if data.get("maintained_at"):
+            self.maintained_at = datetime.fromisoformat(data["maintained_at"])
+
+    def save(self):
+        data = {
+            "fetched_at": self.fetched_at.isoformat() if self.fetched_at else None,
+            "remote_tips": self.remote_tips,
+            "maintained_at": (
+                self.maintained_at.isoformat() if self.maintained_at else None
+            ),
+        }
+        self.path.write_text(json.dumps(data, indent=4, sort_keys=True))
+
+    def is_fresh(self, freshness: timedelta) -> bool:
+        if not self.fetched_at:
+            return False
+        return datetime.now() - self.fetched_at < freshness
+
+
+@dataclass
+class MaintenanceReport:
+    duration: timedelta
+    size_before: int
+    size_after: int
+
+    @property
+    def reclaimed(self) -> int:
+        return self.size_before - self.size_after
+
+
 class RepoHandler:
     root_repo_path: Path | None = None
     root_repo: Repo
     cache_repo_root: Path | None = None
     cache_repo: Repo
+    cache_state: CacheState
+    fetch_freshness: timedelta = FETCH_FRESHNESS
+    # the cache repository is fetched at most once per RepoHandler
+    fetched: bool = False
+    maintenance_loose_objects: int = MAINTENANCE_LOOSE_OBJECTS
+    maintenance_interval: timedelta = MAINTENANCE_INTERVAL
+    maintenance_report: MaintenanceReport | None = None
+    # hide spinners, e.g. when several handlers run concurrently
+    quiet: bool = False
+    # seconds after which network commands are killed, so a hung fetch ends
+    git_timeout: float | None = None
 
-    def __init__(self, root: Path):
+    def __init__(
+        self,
+        root: Path,
+        fetch_freshness: timedelta = FETCH_FRESHNESS,
+        maintenance_loose_objects: int = MAINTENANCE_LOOSE_OBJECTS,
+        quiet: bool = False,
+        git_timeout: float | None = None,
+    ):
         self.root_repo_path = root
         self.root_repo = Repo(self.root_repo_path)
+        self.fetch_freshness = fetch_freshness
+        self.maintenance_loose_objects = maintenance_loose_objects
+        self.quiet = quiet
+        self.git_timeout = git_timeout
 
         # create a clone of the repository in cache
-        cache_repo_root_str: str = platformdirs.user_cache_dir(
-            "refactor_stats_maker", "Tiago Pereira"
-        )
-        self.cache_repo_root = Path(cache_repo_root_str).joinpath(
-            hash_root_repo_path(self.root_repo.git_dir.__str__())
+        self.cache_repo_root = get_cache_repo_root(self.root_repo)
+
+        # fetches and checkouts take an exclusive lock, reads take a shared one
+        self.lock = CacheLock(self.cache_repo_root.with_suffix(".lock"))
+        self.maintenance_lock = CacheLock(
+            self.cache_repo_root.with_suffix(".maintenance.lock")
         )
 
         self.cache_repo = self.clone_cache_repo()
+        self.cache_state = CacheState(
+            Path(self.cache_repo.git_dir).joinpath("refactor_stats_maker.json")
+        )
+
+    def spinner(self, text: str) -> Halo:
+        return Halo(text=text, spinner="dots", enabled=not self.quiet)
 
     def create_cache_repo_root_folder(self):
         if not self.cache_repo_root.exists():
@@ -47,42 +158,230 @@ class RepoHandler:
         try:
             repo = Repo(self.cache_repo_root)
         except InvalidGitRepositoryError:
-            remote = self.get_repo_remote_origin()
-            spinner = Halo(text="Cloning the repository into cache", spinner="dots")
+            with self.lock.exclusive():
+                try:
+                    # another process may have cloned it while we waited
+                    return Repo(self.cache_repo_root)
+                except InvalidGitRepositoryError:
+                    pass
+                remote = self.get_repo_remote_origin()
+                spinner = self.spinner("Cloning the repository into cache")
+                spinner.start()
+                # clone_from runs git as a process, which can't be killed on timeout
+                Git().clone(
+                    remote,
+                    str(self.cache_repo_root),
+                    kill_after_timeout=self.git_timeout,
+                )
+                repo = Repo(self.cache_repo_root)
+                spinner.stop()
+        return repo
+
+    def get_remote_tips(self) -> dict[str, str]:
+        refs = self.cache_repo.git.for_each_ref(
+            "--format=%(refname) %(objectname)", "refs/remotes"
+        )
+        return dict(line.split(" ") for line in refs.splitlines())
+
+    def is_checked_out(self, rev: str) -> bool:
+        head = self.cache_repo.head
+        return (
+            head.is_valid()
+            and head.commit == self.cache_repo.commit(rev)
+            and not self.cache_repo.is_dirty()
+        )
+
+    def resolve_rev(self, rev: str) -> str:
+        """
+        :return: commit SHA of rev in the cache repository, as of the last fetch
+        """
+        return resolve_ref(self.cache_repo, rev)
+
+    def update_cache_repo(self) -> bool:
+        """
+        Fetches the remote and pulls the root repository's active branch into the
+        cache repository. Nothing is done if the cache repository was already fetched
+        by this handler or within the freshness window of a previous run.
+
+        :return: True if any remote ref moved since the previous fetch
+        """
+        if self.fetched or self.cache_state.is_fresh(self.fetch_freshness):
+            return False
+
+        with self.lock.exclusive():
+            # another process may have fetched while we waited for the lock
+            self.cache_state.load()
+            if self.cache_state.is_fresh(self.fetch_freshness):
+                return False
+
+            git = self.cache_repo.git
+            branch = self.root_repo.active_branch.name
+            spinner = self.spinner("Fetching commits...")
             spinner.start()
-            repo = Repo.clone_from(remote, str(self.cache_repo_root))
+            if self.cache_repo.is_dirty():
+                git.reset("--hard")
+            if self.cache_repo.head.is_detached or (
+                self.cache_repo.active_branch.name != branch
+            ):
+                git.checkout(branch)
+            git.fetch(kill_after_timeout=self.git_timeout)
+            remote_tips = self.get_remote_tips()
+            tracking_branch = self.cache_repo.active_branch.tracking_branch()
+            if (
+                tracking_branch
+                and tracking_branch.commit != self.cache_repo.head.commit
+            ):
+                git.pull(kill_after_timeout=self.git_timeout)
             spinner.stop()
-        return repo
+
+            moved = remote_tips != self.cache_state.remote_tips
+            self.fetched = True
+            self.cache_state.fetched_at = datetime.now()
+            self.cache_state.remote_tips = remote_tips
+            self.cache_state.save()
+        return moved
 
     def move_to_baseline_commit(self, commit_hash: str, pull=True):
         git = self.cache_repo.git
         if pull:
-            spinner = Halo(text="Fetching commits...", spinner="dots")
+            self.update_cache_repo()
+        with self.lock.exclusive():
+            if self.is_checked_out(commit_hash):
+                return
+            spinner = self.spinner("Moving to baseline commit")
             spinner.start()
-            git.reset("--hard")
-            git.checkout(self.root_repo.active_branch.name)
-            git.fetch()
-            git.pull()
+            if self.cache_repo.is_dirty():
+                git.reset("--hard")
+            git.checkout(commit_hash)
             spinner.stop()
-        spinner = Halo(text="Moving to baseline commit", spinner="dots")
-        spinner.start()
-        git.checkout(commit_hash)
-        spinner.stop()
-
-    def get_commits_since_hash(self, commit_hash: str) -> list[Commit]:
-        commits: list[Commit] = []
-        for commit in list(self.cache_repo.iter_commits()):
-            # maybe there's a better way to determine if a commit is a merge commit
-            if not commit.summary.startswith("Merge"):
-                commits.append(commit)
-            if commit.hexsha == commit_hash:
-                return commits
+
+    def get_object_stats(self) -> dict[str, int]:
+        """
+        :return: output of git count-objects, sizes are in KiB
+        """
+        output = self.cache_repo.git.count_objects("-v")
+        stats = {}
+        for line in output.splitlines():
+            key, value = line.split(": ")
+            stats[key] = int(value)
+        return stats
+
+    def get_objects_size(self) -> int:
+        """
+        :return: size in bytes of loose objects, packs and garbage
+        """
+        stats = self.get_object_stats()
+        return (stats["size"] + stats["size-pack"] + stats["size-garbage"]) * 1024
+
+    def has_commit_graph(self) -> bool:
+        info = Path(self.cache_repo.git_dir).joinpath("objects", "info")
+        return (
+            info.joinpath("commit-graph").exists()
+            or info.joinpath("commit-graphs").exists()
+        )
+
+    def needs_maintenance(self) -> bool:
+        if not self.has_commit_graph():
+            return True
+        maintained_at = self.cache_state.maintained_at
+        if not maintained_at or datetime.now() - maintained_at > (
+            self.maintenance_interval
+        ):
+            return True
+        return self.get_object_stats()["count"] >= self.maintenance_loose_objects
+
+    def maintain_cache_repo(self) -> MaintenanceReport:
+        """
+        Packs loose objects, prunes old unreachable ones and writes the commit-graph
+        with changed-path Bloom filters, which speeds up history walks and path
+        limited log/diff operations
+        """
+        git = self.cache_repo.git
+        # git keeps these operations safe for concurrent fetches and reads, the
+        # maintenance lock only stops two runs from repacking at the same time
+        with self.maintenance_lock.exclusive():
+            start = time.monotonic()
+            size_before = self.get_objects_size()
+
+            git.repack("-d", "-l")
+            # keep recent unreachable objects, another process may still use them
+            git.prune("--expire=2.weeks.ago")
+            git.commit_graph("write", "--reachable", "--changed-paths")
+
+            self.maintenance_report = MaintenanceReport(
+                duration=timedelta(seconds=time.monotonic() - start),
+                size_before=size_before,
+                size_after=self.get_objects_size(),
+            )
+        self.cache_state.maintained_at = datetime.now()
+        self.cache_state.save()
+        return self.maintenance_report
+
+    def start_maintenance(self, force=False) -> Thread | None:
+        """
+        Runs maintain_cache_repo in a background thread if the cache repository needs
+        it (or force is set). The report is available in maintenance_report once the
+        thread finishes.
+        """
+        if not force and not self.needs_maintenance():
+            return None
+        thread = Thread(target=self.maintain_cache_repo, name="cache-maintenance")
+        thread.start()
+        return thread
+
+    def get_commits_since_hash(self, commit_hash: str, rev="HEAD") -> list[Commit]:
+        """
+        Same commits as iter_commits_since_hash but newest first. Passing an explicit
+        rev instead of relying on the checked out HEAD allows the walk to only take a
+        shared lock. The whole history of rev is walked if commit_hash doesn't exist.
+        """
+        with self.lock.shared():
+            try:
+                commits = list(self.iter_commits_since_hash(commit_hash, rev))
+            except BadName:
+                commits = [
+                    commit
+                    for commit in self.cache_repo.iter_commits(rev, reverse=True)
+                    if not commit.summary.startswith("Merge")
+                ]
+        commits.reverse()
         return commits
 
+    def iter_commits_since_hash(self, commit_hash: str, rev="HEAD") -> Iterator[Commit]:
+        """
+        The commit_hash commit followed by the commits reachable from rev but not from
+        commit_hash, oldest first and streamed from git log, so that the history is
+        never held in memory. Commits merged from a branch that forked before
+        commit_hash are included whatever their date. Callers hold a shared lock
+        while iterating.
+        """
+        commit = self.cache_repo.commit(commit_hash)
+        if not commit.summary.startswith("Merge"):
+            yield commit
+        for commit in self.cache_repo.iter_commits(
+            f"{commit_hash}..{rev}", reverse=True
+        ):
+            if not commit.summary.startswith("Merge"):
+                yield commit
+
+    def get_commits_after(self, commit_hash: str, rev="HEAD") -> list[Commit]:
+        """
+        Commits reachable from rev but not from commit_hash, newest first, used to
+        only walk the commits that landed since a previous walk
+        """
+        with self.lock.shared():
+            return [
+                commit
+                for commit in self.cache_repo.iter_commits(f"{commit_hash}..{rev}")
+                if not commit.summary.startswith("Merge")
+            ]
+
     def get_baseline_file_paths(self, commit_hash, regex, exclude) -> list[str]:
         working_dir = Path(self.cache_repo.working_dir)
-        self.move_to_baseline_commit(commit_hash)
-        files = self.get_files_to_refactor_in_folder(working_dir, regex, exclude)
+        # the scan reads the working tree so nobody may check out in the meantime
+        with self.lock.exclusive():
+            self.move_to_baseline_commit(commit_hash)
+            files = self.get_files_to_refactor_in_folder(working_dir, regex, exclude)
         return files
 
     @staticmethod
@@ -108,9 +407,38 @@ class RepoHandler:
 
         return lines
 
+    def get_scan_cache_path(self, regex: str) -> Path:
+        return Path(self.cache_repo.git_dir).joinpath(
+            f"refactor_stats_maker_scan_{hashlib.md5(str.encode(regex)).hexdigest()}.json"
+        )
+
+    def get_history_path(self, commit_hash: str, regex: str, rev: str) -> Path:
+        name = hashlib.md5(str.encode(f"{commit_hash} {regex} {rev}")).hexdigest()
+        return Path(self.cache_repo.git_dir).joinpath(
+            f"refactor_stats_maker_history_{name}.json"
+        )
+
+    def is_ancestor(self, ancestor: str, rev: str) -> bool:
+        """
+        :return: False if ancestor isn't an ancestor of rev or doesn't exist anymore
+        """
+        try:
+            return self.cache_repo.is_ancestor(ancestor, rev)
+        except GitCommandError:
+            return False
+
     def get_files_to_refactor(self, regex: str, exclude=None) -> list[str]:
+        """
+        Scans the root repository's working tree, only the files that changed since
+        the previous scan are matched again
+        """
         if not exclude:
             exclude = []
         if not self.root_repo_path:
             raise Exception("Invalid repository root")
-        return self.get_files_to_refactor_in_folder(self.root_repo_path, regex, exclude)
+        scanner = WorkingTreeScanner(
+            self.root_repo, regex, self.get_scan_cache_path(regex)
+        )
+        files = scanner.scan(exclude)
+        scanner.save()
+        return files
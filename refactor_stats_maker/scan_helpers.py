@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+
+from git import Repo
+
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE
+from refactor_stats_maker.merge_request_helpers import is_excluded
+from refactor_stats_maker.tree_helpers import SYMLINK_MODE, BlobMatchCache
+
+SCAN_CACHE_VERSION = 1
+SUBMODULE_MODE = "160000"
+
+
+def is_hidden(path: str) -> bool:
+    """
+    ripgrep skips hidden files and folders by default, the scan does the same
+    """
+    return any(part.startswith(".") for part in path.split("/"))
+
+
+def parse_index_entries(output: str) -> dict[str, str]:
+    """
+    :param output: output of git ls-files -s -z
+    :return: blob SHA of each merged path in the index, without symlinks and
+    submodules
+    """
+    entries = {}
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, hexsha, stage = info.split(" ")
+        # conflicted paths have one entry per stage, they're dirty anyway
+        if stage == "0" and mode not in (SYMLINK_MODE, SUBMODULE_MODE):
+            entries[path] = hexsha
+    return entries
+
+
+def parse_status(output: str) -> tuple[set[str], set[str]]:
+    """
+    :param output: output of git status --porcelain -z
+    :return: paths whose working tree content may differ from the index and paths
+    deleted from the working tree
+    """
+    changed: set[str] = set()
+    deleted: set[str] = set()
+    entries = iter(output.split("\0"))
+    for entry in entries:
+        if not entry:
+            continue
+        status, path = entry[:2], entry[3:]
+        if status[0] in "RC":
+            # renames and copies are followed by the original path
+            next(entries, None)
+        if "D" in status:
+            deleted.add(path)
+        else:
+            changed.add(path)
+    return changed, deleted
+
+
+class WorkingTreeScanner:
+    """
+    Finds the files of a working tree that match a regex without reading all of them:
+    files that match their index entry are looked up by blob SHA and the few files
+    git status reports as changed or untracked are read from disk, keyed by their
+    size and modification time
+
+    Both caches are persisted in a JSON file so that a scan of an unchanged working
+    tree only costs a git ls-files and a git status.
+    """
+
+    def __init__(
+        self,
+        repo: Repo,
+        regex: str,
+        cache_path: Path,
+        max_blob_size: int = MAX_BLOB_SIZE,
+    ):
+        self.repo = repo
+        self.regex = regex
+        self.cache_path = cache_path
+        self.blob_cache = BlobMatchCache(regex, max_blob_size)
+        # path: (size, modification time in ns, match count)
+        self.file_counts: dict[str, tuple[int, int, int]] = {}
+        # files read from disk in the last scan
+        self.file_reads = 0
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (IOError, ValueError):
+            return
+        if data.get("version") != SCAN_CACHE_VERSION or data.get("regex") != self.regex:
+            return
+        self.blob_cache.counts = data.get("blobs", {})
+        self.file_counts = {k: tuple(v) for k, v in data.get("files", {}).items()}
+
+    def save(self):
+        data = {
+            "version": SCAN_CACHE_VERSION,
+            "regex": self.regex,
+            "blobs": self.blob_cache.counts,
+            "files": self.file_counts,
+        }
+        # write to a temporary file first so that a concurrent run never reads a
+        # partially written cache
+        temporary_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        temporary_path.write_text(json.dumps(data))
+        os.replace(temporary_path, self.cache_path)
+
+    def count_file(self, path: str) -> int:
+        file_path = Path(self.repo.working_tree_dir, path)
+        stat = file_path.stat()
+        cached = self.file_counts.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        self.file_reads += 1
+        with file_path.open("rb") as f:
+            count = self.blob_cache.matcher.count_stream(f, stat.st_size, path)
+        self.file_counts[path] = (stat.st_size, stat.st_mtime_ns, count)
+        return count
+
+    def scan(self, exclude: list[str]) -> list[str]:
+        """
+        :return: sorted paths, relative to the working tree, of the files that match
+        """
+        git = self.repo.git
+        index_entries = parse_index_entries(git.ls_files("-s", "-z"))
+        changed, deleted = parse_status(
+            git.status("--porcelain", "-z", "--untracked-files=all")
+        )
+
+        counts: dict[str, int] = {}
+        blob_counts: dict[str, int] = {}
+        for path, hexsha in index_entries.items():
+            if path in changed or path in deleted:
+                continue
+            if is_hidden(path) or is_excluded(path, exclude):
+                continue
+            counts[path] = self.blob_cache.count(self.repo, hexsha, path)
+            blob_counts[hexsha] = counts[path]
+
+        file_counts = {}
+        for path in changed:
+            if is_hidden(path) or is_excluded(path, exclude):
+                continue
+            if not Path(self.repo.working_tree_dir, path).is_file():
+                # e.g. untracked submodules or symlinks to folders
+                continue
+            counts[path] = self.count_file(path)
+            file_counts[path] = self.file_counts[path]
+
+        # only keep what the working tree still has so the cache doesn't keep growing
+        self.blob_cache.counts = blob_counts
+        self.file_counts = file_counts
+
+        return sorted(path for path, count in counts.items() if count)
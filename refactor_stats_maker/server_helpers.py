@@ -0,0 +1,257 @@
+import hashlib
+import json
+import time
+from dataclasses import asdict
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+import click
+from codeowners import CodeOwners
+
+from refactor_stats_maker.session_helpers import RefactorStatsSession
+from refactor_stats_maker.stats_helpers import (
+    File,
+    assign_files_to_teams,
+    get_conclusion_estimates,
+    get_file_owners,
+    resolve_leaderboard_window,
+)
+from refactor_stats_maker.store_helpers import (
+    CumulativeLeaderboard,
+    RefactorCommitStore,
+)
+
+POLL_INTERVAL = 60
+
+
+def build_files_payload(status_files: list[File], codeowners: CodeOwners) -> list:
+    return [
+        {
+            "name": f.name(),
+            "path": f.path,
+            "fixed": f.fixed,
+            "is_new": f.is_new,
+            "teams": get_file_owners(f.path, codeowners),
+        }
+        for f in sorted(status_files)
+    ]
+
+
+def build_teams_payload(status_files: list[File], codeowners: CodeOwners) -> list:
+    payload = []
+    for team, files in sorted(assign_files_to_teams(status_files, codeowners).items()):
+        fixed_files_count = len([f for f in files if f.fixed])
+        payload.append(
+            {
+                "team": team,
+                "fixed": fixed_files_count,
+                "total": len(files),
+                "percentage": round(fixed_files_count / len(files) * 100, 1),
+            }
+        )
+    return payload
+
+
+def build_leaderboard_payload(
+    leaderboard: CumulativeLeaderboard,
+    window: str,
+    now: datetime,
+    sprint_start: datetime = datetime(2024, 1, 1),
+    sprint_length: int = 14,
+) -> list:
+    start, end = resolve_leaderboard_window(window, now, sprint_start, sprint_length)
+    authors = leaderboard.window(start, end)
+    return [
+        {"name": author.name, "email": author.email, "refactor_count": count}
+        for author, count in sorted(authors.items(), key=lambda i: i[1], reverse=True)
+    ]
+
+
+def build_forecast_payload(store: RefactorCommitStore) -> dict | None:
+    estimates = get_conclusion_estimates(store.chart_data())
+    if estimates is None:
+        return None
+    return {
+        k: v.isoformat() if isinstance(v, datetime) else v
+        for k, v in asdict(estimates).items()
+    }
+
+
+class StatsService:
+    """
+    Keeps the results of a session in memory and updates them when new commits
+    land. The history is only walked for the commits that weren't analyzed yet and
+    JSON responses are memoized until the results change.
+
+    Results are only replaced as a whole under the lock, request threads never see
+    them while they're being built.
+    """
+
+    def __init__(self, session: RefactorStatsSession):
+        self.session = session
+
+        self.lock = Lock()
+        self.version: str | None = None
+        self.codeowners: CodeOwners | None = None
+        self.status_files: list[File] = []
+        self.store = RefactorCommitStore()
+        # built once per store, every leaderboard window is read from it
+        self.leaderboard = CumulativeLeaderboard(self.store)
+        # (window, ETag, body) by URL
+        self.responses: dict[str, tuple[tuple | None, str, bytes]] = {}
+
+    def refresh(self) -> bool:
+        """
+        :return: True if the results changed
+        """
+        session = self.session
+        handler = session.handler
+        session.refresh()
+        handler.update_cache_repo()
+
+        head = handler.root_repo.head.commit.hexsha
+        tip = handler.resolve_rev(session.rev)
+        version = f"{head}-{tip}"
+        if version == self.version:
+            return False
+
+        codeowners = session.codeowners
+        status_files = session.file_statuses()
+        store = session.store()
+        leaderboard = CumulativeLeaderboard(store)
+        session.save()
+
+        with self.lock:
+            self.codeowners = codeowners
+            self.status_files = status_files
+            self.store = store
+            self.leaderboard = leaderboard
+            self.version = version
+            self.responses = {}
+        return True
+
+    def get_window(
+        self, path: str, query: dict[str, list[str]], now: datetime
+    ) -> tuple | None:
+        """
+        :return: date range of a leaderboard, which moves with the current date
+        """
+        if path != "/leaderboard":
+            return None
+        return resolve_leaderboard_window(
+            query.get("window", ["all"])[0],
+            now,
+            self.session.sprint_start,
+            self.session.sprint_length,
+        )
+
+    def build_payload(self, path: str, query: dict[str, list[str]], now: datetime):
+        match path:
+            case "/files":
+                return build_files_payload(self.status_files, self.codeowners)
+            case "/teams":
+                return build_teams_payload(self.status_files, self.codeowners)
+            case "/leaderboard":
+                window = query.get("window", ["all"])[0]
+                return build_leaderboard_payload(
+                    self.leaderboard,
+                    window,
+                    now,
+                    self.session.sprint_start,
+                    self.session.sprint_length,
+                )
+            case "/forecast":
+                return build_forecast_payload(self.store)
+        raise KeyError(path)
+
+    def get_response(self, url: str) -> tuple[str, bytes]:
+        """
+        :return: ETag and body of the response, read together
+        :raise KeyError: if the path is unknown
+        :raise Exception: if the query is invalid
+        """
+        parsed_url = urlparse(url)
+        query = parse_qs(parsed_url.query)
+        now = datetime.now()
+        window = self.get_window(parsed_url.path, query, now)
+        with self.lock:
+            memoized = self.responses.get(url)
+            if memoized and memoized[0] == window:
+                return memoized[1:]
+            payload = self.build_payload(parsed_url.path, query, now)
+            body = json.dumps(payload).encode()
+            etag = f'"{self.version}"'
+            if window is not None:
+                # responses of the same version differ once the window moved
+                window_hash = hashlib.md5(repr(window).encode()).hexdigest()
+                etag = f'"{self.version}-{window_hash[:8]}"'
+            self.responses[url] = (window, etag, body)
+            return etag, body
+
+    def poll(self, interval: float, stopped: Event):
+        while not stopped.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                click.secho(f"Unable to refresh statistics: {e}", fg="red", err=True)
+
+
+def build_request_handler(service: StatsService) -> type[BaseHTTPRequestHandler]:
+    class StatsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if service.version is None:
+                self.send_error(HTTPStatus.SERVICE_UNAVAILABLE)
+                return
+            try:
+                etag, body = service.get_response(self.path)
+            except KeyError:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            except Exception as e:
+                self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+                return
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # keep the terminal quiet, errors are still reported by send_error
+            pass
+
+    return StatsRequestHandler
+
+
+def serve_stats(
+    service: StatsService, host: str, port: int, poll_interval: float = POLL_INTERVAL
+):
+    start = time.monotonic()
+    service.refresh()
+    click.secho(
+        f"Statistics ready in {time.monotonic() - start:.1f}s, "
+        f"serving on http://{host}:{port}",
+        fg="green",
+    )
+
+    stopped = Event()
+    poller = Thread(target=service.poll, args=(poll_interval, stopped), daemon=True)
+    poller.start()
+
+    server = ThreadingHTTPServer((host, port), build_request_handler(service))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        server.server_close()
@@ -0,0 +1,254 @@
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from threading import RLock
+
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker.history_helpers import HistoryState
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE, BlobMatcher
+from refactor_stats_maker.repository_helpers import (
+    FETCH_FRESHNESS,
+    MAINTENANCE_LOOSE_OBJECTS,
+    RepoHandler,
+)
+from refactor_stats_maker.stats_helpers import (
+    ConclusionEstimates,
+    File,
+    FileStatusList,
+    RefactorCommit,
+    assign_files_to_teams,
+    build_file_status_list,
+    get_conclusion_estimates,
+    iter_refactor_commits,
+    resolve_leaderboard_window,
+)
+from refactor_stats_maker.store_helpers import (
+    CumulativeLeaderboard,
+    RefactorCommitStore,
+)
+
+EXCLUDE = ["spec.ts", "stories.ts", "md"]
+
+
+class StatsType(Enum):
+    EXPANDS = "expands"
+    CLASS_BASED = "class-based"
+
+
+PROJECT_NAMES = {
+    StatsType.EXPANDS: "Old Expands",
+    StatsType.CLASS_BASED: "Class Based to Options API",
+}
+
+
+def get_scan_args(stats_type: StatsType) -> tuple[str, str]:
+    match stats_type.value:
+        case "expands":
+            return "a4c5abe006e7b55ecdab72bf6e997118cc6e60e6", "expanded: [',\\[].*"
+        case "class-based":
+            return "74d716e70263ffb017171a39a5a0e724c02356b3", "@Component"
+    raise Exception("Invalid type for commit hash")
+
+
+def read_codeowners(repo_path: Path) -> CodeOwners:
+    """
+    :raise IOError: if the repository doesn't have a CODEOWNERS file
+    """
+    return CodeOwners(Path(repo_path, "CODEOWNERS").read_text())
+
+
+class RefactorStatsSession:
+    """
+    Library entry point that keeps what a run needs warm between calls: the
+    repository handler, the parsed CODEOWNERS, the compiled matcher and the history
+    state. Results are computed on first use and kept until refresh().
+
+        session = RefactorStatsSession("~/WebCoreClient")
+        for commit in session.commits(newest_first=True):
+            ...
+        session.refresh()
+        session.leaderboard("sprint")
+
+    The commit hash and regex default to the ones of stats_type. A session can be
+    shared by threads, its state is guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        repo_path: Path | str,
+        stats_type: StatsType = StatsType.EXPANDS,
+        rev: str = "develop",
+        commit_hash: str | None = None,
+        regex: str | None = None,
+        exclude: list[str] | None = None,
+        fetch_freshness: timedelta = FETCH_FRESHNESS,
+        maintenance_loose_objects: int = MAINTENANCE_LOOSE_OBJECTS,
+        max_blob_size: int = MAX_BLOB_SIZE,
+        sprint_start: datetime = datetime(2024, 1, 1),
+        sprint_length: int = 14,
+        quiet: bool = False,
+        git_timeout: float | None = None,
+    ):
+        self.repo_path = Path(repo_path).expanduser()
+        self.stats_type = stats_type
+        self.project_name = PROJECT_NAMES[stats_type]
+        default_commit_hash, default_regex = get_scan_args(stats_type)
+        self.commit_hash = commit_hash or default_commit_hash
+        self.regex = regex or default_regex
+        self.exclude = EXCLUDE if exclude is None else exclude
+        self.rev = rev
+        self.sprint_start = sprint_start
+        self.sprint_length = sprint_length
+        self.matcher = BlobMatcher(self.regex, max_blob_size)
+        self.handler = RepoHandler(
+            self.repo_path,
+            fetch_freshness=fetch_freshness,
+            maintenance_loose_objects=maintenance_loose_objects,
+            quiet=quiet,
+            git_timeout=git_timeout,
+        )
+
+        self.lock = RLock()
+        self._codeowners: CodeOwners | None = None
+        self._codeowners_mtime: int | None = None
+        self._history: HistoryState | None = None
+        self._status_files: FileStatusList | None = None
+        # (store, store size, leaderboard) so it's rebuilt once the store is replaced
+        # or grows
+        self._cumulative_leaderboard: (
+            tuple[RefactorCommitStore, int, CumulativeLeaderboard] | None
+        ) = None
+
+    @property
+    def codeowners(self) -> CodeOwners:
+        """
+        Only parsed again when the CODEOWNERS file changes
+
+        :raise IOError: if the repository doesn't have a CODEOWNERS file
+        """
+        with self.lock:
+            mtime = Path(self.repo_path, "CODEOWNERS").stat().st_mtime_ns
+            if mtime != self._codeowners_mtime:
+                self._codeowners = read_codeowners(self.repo_path)
+                self._codeowners_mtime = mtime
+                # team counts depend on the rules
+                self._history = None
+                self._cumulative_leaderboard = None
+            return self._codeowners
+
+    @property
+    def history(self) -> HistoryState:
+        with self.lock:
+            codeowners = self.codeowners
+            if self._history is None:
+                self._history = HistoryState(
+                    self.handler,
+                    self.commit_hash,
+                    self.regex,
+                    self.exclude,
+                    codeowners,
+                    self.matcher,
+                    self.rev,
+                )
+            return self._history
+
+    def refresh(self):
+        """
+        Forgets the results so that the next calls pick up the commits and working
+        tree changes since, the refactor commits already found are kept
+        """
+        with self.lock:
+            # allow a new fetch, the freshness window still applies
+            self.handler.fetched = False
+            self._status_files = None
+
+    def save(self):
+        """
+        Persists the history state so that the next session starts warm
+        """
+        with self.lock:
+            if self._history:
+                self._history.save()
+
+    # RESULTS
+
+    def baseline_files(self) -> list[str]:
+        with self.lock:
+            return self.history.get_baseline_files()
+
+    def file_statuses(self) -> FileStatusList:
+        with self.lock:
+            if self._status_files is None:
+                current_files = self.handler.get_files_to_refactor(
+                    self.regex, exclude=self.exclude
+                )
+                self._status_files = build_file_status_list(
+                    self.baseline_files(), current_files
+                )
+            return self._status_files
+
+    def team_assignments(self) -> dict[str, list[File]]:
+        with self.lock:
+            return assign_files_to_teams(self.file_statuses(), self.codeowners)
+
+    def store(self) -> RefactorCommitStore:
+        """
+        :return: every refactor commit up to rev, only the commits that landed since
+        the previous call, or the previous session, are inspected
+        """
+        with self.lock:
+            return self.history.update()
+
+    def commits(self, newest_first=False) -> Iterator[RefactorCommit]:
+        return self.store().rows(newest_first=newest_first)
+
+    def iter_refactor_commits(self) -> Iterator[RefactorCommit]:
+        """
+        Walks the whole history from the baseline commit and yields each refactor
+        commit as soon as it's found, neither the commits nor the results are kept
+        """
+        with self.lock:
+            self.handler.update_cache_repo()
+            baseline_files = list(self.baseline_files())
+            codeowners = self.codeowners
+        with self.handler.lock.shared():
+            commits = self.handler.iter_commits_since_hash(
+                self.commit_hash, self.handler.resolve_rev(self.rev)
+            )
+            yield from iter_refactor_commits(
+                commits,
+                self.regex,
+                baseline_files,
+                codeowners,
+                self.matcher,
+                oldest_first=True,
+            )
+
+    def leaderboard(
+        self, window: str | None = None, now: datetime | None = None
+    ) -> dict[Actor, int]:
+        """
+        :param window: all, week, month, sprint or a number of days such as 30d, the
+        whole history if None
+        """
+        with self.lock:
+            store = self.store()
+            if window is None:
+                return store.leaderboard_data()
+            cached = self._cumulative_leaderboard
+            if cached is None or cached[0] is not store or cached[1] != len(store):
+                cached = (store, len(store), CumulativeLeaderboard(store))
+                self._cumulative_leaderboard = cached
+        start, end = resolve_leaderboard_window(
+            window, now or datetime.now(), self.sprint_start, self.sprint_length
+        )
+        return cached[2].window(start, end)
+
+    def forecast(self) -> ConclusionEstimates | None:
+        """
+        :return: end date estimates or None while there isn't enough data
+        """
+        return get_conclusion_estimates(self.store().chart_data())
@@ -1,8 +1,12 @@
 import re
+import shutil
 import time
 from abc import ABC
-from dataclasses import dataclass
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, date
+from functools import total_ordering
 from itertools import chain
 
 import holidays
@@ -17,15 +21,49 @@ from rich.console import Console
 from rich.table import Table
 from rich.text import Text
 
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.path_helpers import PATHS, PathTable
 
-@dataclass(order=True)
+
+@total_ordering
 class File:
-    path: str
-    fixed: bool = False
-    is_new: bool = False
+    """
+    Status of a file, a view over its entry in a PathTable so its name and simple
+    path don't have to be split out of the path on every call. Files built on their
+    own share the PATHS table.
+    """
+
+    __slots__ = ("table", "path_id", "fixed", "is_new")
+
+    def __init__(
+        self,
+        path: str,
+        fixed: bool = False,
+        is_new: bool = False,
+        table: PathTable = PATHS,
+    ):
+        self.table = table
+        self.path_id = table.intern(path)
+        self.fixed = fixed
+        self.is_new = is_new
+
+    @classmethod
+    def from_path_id(
+        cls, table: PathTable, path_id: int, fixed: bool, is_new: bool
+    ) -> "File":
+        file = cls.__new__(cls)
+        file.table = table
+        file.path_id = path_id
+        file.fixed = fixed
+        file.is_new = is_new
+        return file
+
+    @property
+    def path(self) -> str:
+        return self.table.path(self.path_id)
 
     def name(self):
-        return self.path.split("/")[-1]
+        return self.table.name(self.path_id)
 
     def get_fixed_icon(self) -> str:
         if self.fixed:
@@ -34,15 +72,75 @@ class File:
             return "❌"
 
     def get_simple_path(self):
-        return self.path.replace("src/", "")
+        return self.table.simple_path(self.path_id)
 
     def to_json(self):
         return {"name": self.name(), "path": self.path}
 
+    def sort_key(self) -> tuple[str, bool, bool]:
+        return self.path, self.fixed, self.is_new
+
+    def __eq__(self, other):
+        if not isinstance(other, File):
+            return NotImplemented
+        return self.sort_key() == other.sort_key()
+
+    def __lt__(self, other):
+        if not isinstance(other, File):
+            return NotImplemented
+        return self.sort_key() < other.sort_key()
+
+    # mutable, like the dataclass it replaced
+    __hash__ = None
+
+    def __repr__(self):
+        return f"File(path={self.path!r}, fixed={self.fixed}, is_new={self.is_new})"
+
     def __str__(self):
         return f"  {self.get_fixed_icon()} {self.get_simple_path()}"
 
 
+class FileStatusList(Sequence):
+    """
+    File statuses stored as compact arrays of path ids and flags, File views are
+    only created when items are read. Compares equal to a list of the same files.
+
+    Each list has its own PathTable by default, so paths are freed with the list.
+    """
+
+    def __init__(self, table: PathTable | None = None):
+        self.table = table if table is not None else PathTable()
+        self._path_ids = array("i")
+        self._fixed = array("b")
+        self._is_new = array("b")
+
+    def append(self, path_id: int, fixed: bool = False, is_new: bool = False):
+        self._path_ids.append(path_id)
+        self._fixed.append(fixed)
+        self._is_new.append(is_new)
+
+    def __len__(self) -> int:
+        return len(self._path_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return File.from_path_id(
+            self.table,
+            self._path_ids[index],
+            bool(self._fixed[index]),
+            bool(self._is_new[index]),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, FileStatusList)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 @dataclass(order=True)
 class RefactorCommit:
     hexsha: str
@@ -52,6 +150,8 @@ class RefactorCommit:
     author_email: str
     refactor_count: int
     remaining_files_count: int
+    # remaining files count of the teams whose count changed in this commit
+    team_remaining_files_counts: dict[str, int] = field(default_factory=dict)
 
     def __str__(self):
         return f"{self.summary} {self.refactor_count} {self.remaining_files_count}"
@@ -70,7 +170,9 @@ class ConclusionEstimates:
     estimated_days_left: int
 
 
-def build_file_status_list(before: list[str], after: list[str]) -> list[File]:
+def build_file_status_list(
+    before: list[str], after: list[str], table: PathTable | None = None
+) -> FileStatusList:
     """
     This function assumes that each filename in the codebase is unique
 
@@ -80,28 +182,22 @@ def build_file_status_list(before: list[str], after: list[str]) -> list[File]:
     """
     # index each file by its filename
 
-    before_files_list = index_files(before)
-    after_files_list = index_files(after)
-    index = {}
-    file_list = []
+    file_list = FileStatusList(table)
+    before_files_index = index_path_ids(before, file_list.table)
+    after_files_index = index_path_ids(after, file_list.table)
 
     # iterate files from the oldest snapshot
-    for key, before_value in before_files_list.items():
-        after_value = after_files_list.get(key)
-        index[key] = (before_value, after_value)
-
-    # iterate files from the most recent snapshot
-    for key, after_value in after_files_list.items():
-        current_value = index.get(key)
-        if current_value:
-            current_value = (before_files_list.get(key), after_value)
+    for basename_id, before_path_id in before_files_index.items():
+        after_path_id = after_files_index.get(basename_id)
+        if after_path_id is None:
+            file_list.append(before_path_id, fixed=True)
         else:
-            current_value = (None, after_value)
-        index[key] = current_value
+            file_list.append(after_path_id)
 
-    # map each tuple in index to a File
-    for k, v in index.items():
-        file_list.append(build_file_status(v))
+    # iterate files that only exist in the most recent snapshot
+    for basename_id, after_path_id in after_files_index.items():
+        if basename_id not in before_files_index:
+            file_list.append(after_path_id, is_new=True)
 
     return file_list
 
@@ -129,6 +225,17 @@ def index_files(files: list[str]) -> dict[str, str]:
     return index
 
 
+def index_path_ids(files: list[str], table: PathTable) -> dict[int, int]:
+    """
+    :return: id of each interned path by the id of its basename
+    """
+    index = {}
+    for f in files:
+        path_id = table.intern(f)
+        index[table.basename_id(path_id)] = path_id
+    return index
+
+
 def get_most_recent_file(file: File, recent_files: list[File]):
     return next((f for f in recent_files if f.name() == file.name()), file)
 
@@ -256,10 +363,6 @@ def display_team_assignments(
     format_for_gitlab=False,
     copy_to_clipboard=False,
 ):
-    # report_data = export_report_data_to_json(status_files, codeowners)
-    # json.dump(report_data, open('refactors.json', 'w'), sort_keys=True, indent=4)
-    # create_jira_issues(status_files, codeowners)
-
     # PRINT FILES AND STATS
 
     report_data = build_report_data(
@@ -311,16 +414,46 @@ def display_team_assignments(
         pyperclip.copy(report_text)
 
 
-def build_stats_data(
-    commits: list[Commit], regex: str, baseline_file_list: list[str]
-) -> list[RefactorCommit]:
-    regex_expr = re.compile(regex)
+def iter_commit_refactors(
+    commits: Iterable[Commit],
+    regex: str,
+    baseline_file_list: list[str],
+    codeowners: CodeOwners | None = None,
+    matcher: BlobMatcher | None = None,
+    oldest_first: bool = False,
+) -> Iterator[tuple[Commit, int, int, dict[str, int]]]:
+    """
+    Walks commits from the oldest to the most recent one and yields, for each commit
+    that applied refactors, a tuple of (commit, refactor count, remaining files count,
+    remaining files count of each team whose count changed in that commit)
 
-    # GET REFACTORS LEFT PER COMMIT
-    refactor_commits: dict[str, RefactorCommit] = {}
+    commits are given newest first, as a list, unless oldest_first is set, in which
+    case any iterable is walked as it's consumed
 
-    for commit in list(reversed(commits)):
+    Files that no longer match the regex are removed from baseline_file_list
+
+    Team counts are only tracked when codeowners is given, the owners of each
+    baseline file are resolved once before walking the history
+
+    Blobs are matched by matcher, which defaults to a BlobMatcher for regex
+    """
+    if matcher is None:
+        matcher = BlobMatcher(regex)
+
+    file_owners: dict[str, list[str]] = {}
+    team_remaining_files_counts: dict[str, int] = {}
+    if codeowners:
+        for path in baseline_file_list:
+            file_owners[path] = get_file_owners(path, codeowners)
+            for team in file_owners[path]:
+                team_remaining_files_counts[team] = (
+                    team_remaining_files_counts.get(team, 0) + 1
+                )
+
+    for commit in commits if oldest_first else reversed(commits):
         diff = commit.diff(commit.parents)
+        refactor_count = 0
+        changed_teams: dict[str, int] = {}
 
         # look at modified M and deleted D files to check for applied refactors
         for d in chain(diff.iter_change_type("M"), diff.iter_change_type("D")):
@@ -328,47 +461,73 @@ def build_stats_data(
             if not d.a_path.endswith("vue") and not d.a_path.endswith("ts"):
                 continue
 
-            before_text = ""
-            after_text = d.a_blob.data_stream.read().decode()
+            matches_after = matcher.count_blob(d.a_blob, d.a_path)
             deleted_matches = 0
-            deleted_file = False
-            try:
-                before_text = d.b_blob.data_stream.read().decode()
-                # this throws if the file was deleted
-                # still don't know WHY since it's the _before_ blob that fails to be
-                # decoded...
-            except AttributeError:
-                deleted_matches = len(regex_expr.findall(after_text))
-                deleted_file = True
-            matches_before = len(regex_expr.findall(before_text))
-            matches_after = len(regex_expr.findall(after_text))
+            # the _before_ blob is missing if the file was deleted
+            deleted_file = d.b_blob is None
+            if deleted_file:
+                matches_before = 0
+                deleted_matches = matches_after
+            else:
+                matches_before = matcher.count_blob(d.b_blob, d.b_path)
 
             diff_matches = matches_before - matches_after
-            refactor_commit = refactor_commits.get(
-                commit.hexsha,
-                RefactorCommit(
-                    commit.hexsha,
-                    datetime.fromtimestamp(commit.committed_date),
-                    commit.summary,
-                    commit.author.name,
-                    commit.author.email,
-                    0,
-                    len(baseline_file_list),
-                ),
-            )
             if diff_matches > 0:
-                refactor_commit.refactor_count = (
-                    refactor_commit.refactor_count + diff_matches + deleted_matches
-                )
+                refactor_count = refactor_count + diff_matches + deleted_matches
             if matches_before > 0 and (matches_after == 0 or deleted_file):
                 if d.a_path in baseline_file_list:
                     baseline_file_list.remove(d.a_path)
-                    refactor_commit.remaining_files_count = len(baseline_file_list)
+                    for team in file_owners.get(d.a_path, []):
+                        team_remaining_files_counts[team] -= 1
+                        changed_teams[team] = team_remaining_files_counts[team]
+
+        if refactor_count:
+            yield commit, refactor_count, len(baseline_file_list), changed_teams
+
+
+def iter_refactor_commits(
+    commits: Iterable[Commit],
+    regex: str,
+    baseline_file_list: list[str],
+    codeowners: CodeOwners | None = None,
+    matcher: BlobMatcher | None = None,
+    oldest_first: bool = False,
+) -> Iterator[RefactorCommit]:
+    """
+    Same as iter_commit_refactors but yields RefactorCommit rows, so that they can
+    be consumed while the history is walked
+    """
+    for (
+        commit,
+        refactor_count,
+        remaining_files_count,
+        team_remaining_files_counts,
+    ) in iter_commit_refactors(
+        commits, regex, baseline_file_list, codeowners, matcher, oldest_first
+    ):
+        yield RefactorCommit(
+            commit.hexsha,
+            datetime.fromtimestamp(commit.committed_date),
+            commit.summary,
+            commit.author.name,
+            commit.author.email,
+            refactor_count,
+            remaining_files_count,
+            team_remaining_files_counts,
+        )
 
-            if refactor_commit.refactor_count:
-                refactor_commits[commit.hexsha] = refactor_commit
 
-    return list(refactor_commits.values())
+def build_stats_data(
+    commits: list[Commit],
+    regex: str,
+    baseline_file_list: list[str],
+    codeowners: CodeOwners | None = None,
+    matcher: BlobMatcher | None = None,
+) -> list[RefactorCommit]:
+    # GET REFACTORS LEFT PER COMMIT
+    return list(
+        iter_refactor_commits(commits, regex, baseline_file_list, codeowners, matcher)
+    )
 
 
 def build_leaderboard_data(commits: list[RefactorCommit]) -> dict[Actor, int]:
@@ -382,6 +541,52 @@ def build_leaderboard_data(commits: list[RefactorCommit]) -> dict[Actor, int]:
     return {Actor(k[0], k[1]): v for k, v in leaderboard_data.items()}
 
 
+LEADERBOARD_WINDOWS = ["all", "week", "month", "sprint", "<N>d"]
+
+
+def resolve_leaderboard_window(
+    window: str,
+    now: datetime,
+    sprint_start: datetime = datetime(2024, 1, 1),
+    sprint_length: int = 14,
+) -> tuple[datetime | None, datetime | None]:
+    """
+    Converts a leaderboard window name into a [start, end) datetime range
+
+    :param window: "all", "week", "month", "sprint" or a rolling "<N>d" window, every
+    window starts at midnight so that it only moves once a day
+    :param now: reference datetime
+    :param sprint_start: start date of any sprint, sprints repeat every sprint_length
+    :param sprint_length: sprint length in days
+    :return: tuple of start and end datetimes, None means unbounded
+    """
+    today = datetime.combine(now.date(), datetime.min.time())
+    match window:
+        case "all":
+            return None, None
+        case "week":
+            return today - timedelta(days=today.weekday()), None
+        case "month":
+            return today.replace(day=1), None
+        case "sprint":
+            elapsed = (today - sprint_start).days % sprint_length
+            start = today - timedelta(days=elapsed)
+            return start, start + timedelta(days=sprint_length)
+    result = re.fullmatch(r"(\d+)d", window)
+    if result:
+        return today - timedelta(days=int(result.group(1))), None
+    raise Exception(f"Invalid leaderboard window {window}")
+
+
+def get_leaderboard_window_label(window: str) -> str:
+    match window:
+        case "all":
+            return "ALL TIME"
+        case "week" | "month" | "sprint":
+            return f"THIS {window.upper()}"
+    return f"LAST {window[:-1]} DAYS"
+
+
 def build_chart_data(refactor_commits: list[RefactorCommit]) -> (dict)[datetime, int]:
     """
 
@@ -400,6 +605,105 @@ def build_chart_data(refactor_commits: list[RefactorCommit]) -> (dict)[datetime,
     return refactors_by_date
 
 
+CHART_BUCKETS = ["commit", "day", "week", "month"]
+CHART_WIDTH = 100
+
+
+def bucket_dates(dates: np.ndarray, bucket: str) -> np.ndarray:
+    """
+    Floors each datetime64 value to the start of its day, week (Monday) or month
+
+    :param dates: array of datetime64 values
+    :param bucket: one of CHART_BUCKETS
+    :return: array of datetime64[s] bucket keys
+    """
+    match bucket:
+        case "commit":
+            return dates.astype("datetime64[s]")
+        case "day":
+            return dates.astype("datetime64[D]").astype("datetime64[s]")
+        case "week":
+            days = dates.astype("datetime64[D]")
+            # 1970-01-01 was a Thursday, shift so that weeks start on Monday
+            weekdays = (days.astype(np.int64) + 3) % 7
+            return (days - weekdays).astype("datetime64[s]")
+        case "month":
+            return dates.astype("datetime64[M]").astype("datetime64[s]")
+    raise Exception(f"Invalid chart bucket {bucket}")
+
+
+def min_by_key(keys: np.ndarray, values: np.ndarray) -> dict[datetime, int]:
+    """
+    Groups values by key and keeps the minimum of each group, sorted by key
+    """
+    if not len(keys):
+        return {}
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    minimums = np.full(len(unique_keys), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(minimums, inverse, values)
+    return {
+        k.astype(datetime): int(v)
+        for k, v in zip(unique_keys.astype("datetime64[s]"), minimums)
+    }
+
+
+def bucket_chart_data(
+    remaining_refactors_by_date: dict[datetime, int], bucket: str
+) -> dict[datetime, int]:
+    """
+    Aggregates chart data into day, week or month buckets keeping the lowest
+    remaining count of each bucket
+
+    :param remaining_refactors_by_date: dictionary of remaining file count per datetime
+    :param bucket: one of CHART_BUCKETS
+    :return: dictionary of remaining file count per bucket start
+    """
+    dates = np.array(list(remaining_refactors_by_date.keys()), dtype="datetime64[s]")
+    values = np.array(list(remaining_refactors_by_date.values()), dtype=np.int64)
+    return min_by_key(bucket_dates(dates, bucket), values)
+
+
+def downsample_chart_data(
+    remaining_refactors_by_date: dict[datetime, int], threshold: int
+) -> dict[datetime, int]:
+    """
+    Reduces the number of points to plot using the Largest-Triangle-Three-Buckets
+    algorithm, which keeps the visual shape of the series (first and last points are
+    always kept)
+
+    :param remaining_refactors_by_date: dictionary of remaining file count per datetime
+    :param threshold: maximum number of points to keep
+    :return: dictionary with at most threshold points
+    """
+    count = len(remaining_refactors_by_date)
+    if threshold >= count or threshold < 3:
+        return remaining_refactors_by_date
+
+    dates = list(remaining_refactors_by_date.keys())
+    x = np.array([d.timestamp() for d in dates], dtype=np.float64)
+    y = np.array(list(remaining_refactors_by_date.values()), dtype=np.float64)
+
+    # the first and last points have buckets of their own
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    selected = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else count
+        next_start = end if i + 2 < len(edges) else count - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        a = selected[-1]
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        selected.append(int(start + np.argmax(areas)))
+    selected.append(count - 1)
+
+    return {dates[i]: remaining_refactors_by_date[dates[i]] for i in selected}
+
+
 class Oracle(ABC):
     @staticmethod
     def display_estimates(estimates: ConclusionEstimates):
@@ -424,11 +728,35 @@ class Oracle(ABC):
 
         console.print(text)
 
+    @staticmethod
+    def can_make_prediction(refactors_by_date: dict[datetime, int]) -> bool:
+        """
+        Predictions need at least two points, some progress between them and a start
+        date in the past
+        """
+        if len(refactors_by_date) < 2:
+            return False
+        refactors = list(refactors_by_date.values())
+        first_day = list(refactors_by_date.keys())[0]
+        return refactors[0] > refactors[-1] and first_day.date() < date.today()
+
     @staticmethod
     def make_prediction(refactors_by_date: dict[datetime, int]) -> ConclusionEstimates:
         raise NotImplementedError()
 
 
+def count_workdays(first_day: datetime, last_day: datetime) -> int:
+    # get holidays for Porto district
+    local_holidays = list(
+        holidays.country_holidays(
+            "PT", subdiv="14", years=[first_day.year, last_day.year]
+        ).keys()
+    )
+    return int(
+        np.busday_count(first_day.date(), last_day.date(), holidays=local_holidays)
+    )
+
+
 class BasicOracle(Oracle):
     @staticmethod
     def make_prediction(refactors_by_date: dict[datetime, int]) -> ConclusionEstimates:
@@ -443,15 +771,7 @@ class BasicOracle(Oracle):
         """
         first_day = list(refactors_by_date.keys())[0]
         last_day = datetime.today()
-        # get holidays for Porto district
-        local_holidays = list(
-            holidays.country_holidays(
-                "PT", subdiv="14", years=[first_day.year, last_day.year]
-            ).keys()
-        )
-        days_delta = np.busday_count(
-            first_day.date(), last_day.date(), holidays=local_holidays
-        )
+        days_delta = count_workdays(first_day, last_day)
 
         if not days_delta:
             print("Unable to estimate end date: date range is empty")
@@ -481,7 +801,24 @@ class BasicOracle(Oracle):
         )
 
 
-def display_commits(commits: list[RefactorCommit]):
+def get_conclusion_estimates(
+    refactors_by_date: dict[datetime, int],
+) -> ConclusionEstimates | None:
+    """
+    Same as BasicOracle.make_prediction but it never exits, which matters outside of
+    the CLI
+
+    :return: end date estimates or None while there isn't enough data
+    """
+    if not BasicOracle.can_make_prediction(refactors_by_date):
+        return None
+    first_day = list(refactors_by_date.keys())[0]
+    if not count_workdays(first_day, datetime.today()):
+        return None
+    return BasicOracle.make_prediction(refactors_by_date)
+
+
+def display_commits(commits: Iterable[RefactorCommit]):
     table = Table(title="Commits in reverse chronological order", box=box.SIMPLE_HEAD)
 
     table.add_column("Author", style="#1FB0FF", justify="right")
@@ -500,23 +837,35 @@ def display_commits(commits: list[RefactorCommit]):
     return
 
 
-def display_chart(remaining_refactors_by_date: dict[datetime, int]):
+def display_chart(
+    remaining_refactors_by_date: dict[datetime, int],
+    bucket: str = "commit",
+    width: int | None = None,
+    title: str = "Refactored files over time",
+):
+    if not width:
+        width = min(shutil.get_terminal_size((CHART_WIDTH, 0)).columns, CHART_WIDTH)
+
+    # keep the number of plotted points bounded by the chart width
+    data = bucket_chart_data(remaining_refactors_by_date, bucket)
+    data = downsample_chart_data(data, width)
+
     plt.date_form("Y/m/d")
     plt.clc()
-    plt.plotsize(100, 10)
+    plt.plotsize(width, 10)
 
-    points = {k.strftime("%Y/%m/%d"): v for k, v in remaining_refactors_by_date.items()}
+    points = {k.strftime("%Y/%m/%d"): v for k, v in data.items()}
 
     plt.plot(points.keys(), points.values())
 
-    plt.title("Refactored files over time")
+    plt.title(title)
     plt.xlabel("Date")
     plt.ylabel("Refactors left")
     plt.show()
     return ""
 
 
-def display_leaderboard(authors: dict[Actor, int]):
+def display_leaderboard(authors: dict[Actor, int], window: str | None = None):
     start = datetime(day=1, month=12, year=date.today().year).date()
     end = datetime(day=31, month=12, year=date.today().year).date()
     xmas_style = start <= date.today() <= end
@@ -524,13 +873,16 @@ def display_leaderboard(authors: dict[Actor, int]):
     santa = "\U0001F385"
     gift = "\U0001F381"
 
+    title = "LEADERBOARD"
+    if window:
+        title = f"{title} - {get_leaderboard_window_label(window)}"
+
     match xmas_style:
         case True:
-            title = f"{xmas_tree} LEADERBOARD {santa}"
+            title = f"{xmas_tree} {title} {santa}"
             author_color = "red1"
             refactors_color = "green1"
         case _:
-            title = "LEADERBOARD"
             author_color = "#808080"
             refactors_color = "#1FB0FF"
 
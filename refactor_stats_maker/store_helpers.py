@@ -0,0 +1,442 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from copy import deepcopy
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from codeowners import CodeOwners
+from git import Actor, Commit
+
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.stats_helpers import (
+    RefactorCommit,
+    bucket_dates,
+    iter_commit_refactors,
+    min_by_key,
+)
+
+# 2 added the per team remaining files counts
+STORE_FORMAT_VERSION = 2
+
+
+def pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs a list of strings into a single UTF-8 buffer plus an array of offsets so
+    they can be saved without resorting to pickle
+    """
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.int64)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def unpack_strings(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = data.tobytes()
+    return [raw[start:end].decode() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class RefactorCommitStore:
+    """
+    Columnar storage for the commits that contributed to the refactor effort
+
+    Each column is kept in a NumPy array that grows geometrically, authors are
+    interned so every row only holds an author id. RefactorCommit objects are only
+    created when rows are read back.
+
+    Dates are stored as naive datetime64 values in local time, the same way
+    RefactorCommit.date is built.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._size = 0
+        self._hexshas = np.zeros((capacity, 20), dtype=np.uint8)
+        self._dates = np.zeros(capacity, dtype="datetime64[s]")
+        self._author_ids = np.zeros(capacity, dtype=np.int32)
+        self._refactor_counts = np.zeros(capacity, dtype=np.int32)
+        self._remaining_files_counts = np.zeros(capacity, dtype=np.int32)
+        self._summaries: list[str] = []
+        self.authors: list[tuple[str, str]] = []
+        self._author_index: dict[tuple[str, str], int] = {}
+        # sparse per team remaining files counts, one entry per team change
+        self.teams: list[str] = []
+        self._team_index: dict[str, int] = {}
+        self._team_change_rows = array("i")
+        self._team_change_ids = array("i")
+        self._team_change_counts = array("i")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[RefactorCommit]:
+        for i in range(self._size):
+            yield self.row(i)
+
+    # COLUMNS
+
+    @property
+    def hexshas(self) -> np.ndarray:
+        return self._hexshas[: self._size]
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[: self._size]
+
+    @property
+    def author_ids(self) -> np.ndarray:
+        return self._author_ids[: self._size]
+
+    @property
+    def refactor_counts(self) -> np.ndarray:
+        return self._refactor_counts[: self._size]
+
+    @property
+    def remaining_files_counts(self) -> np.ndarray:
+        return self._remaining_files_counts[: self._size]
+
+    @property
+    def team_change_rows(self) -> np.ndarray:
+        return np.array(self._team_change_rows, dtype=np.int32)
+
+    @property
+    def team_change_ids(self) -> np.ndarray:
+        return np.array(self._team_change_ids, dtype=np.int32)
+
+    @property
+    def team_change_counts(self) -> np.ndarray:
+        return np.array(self._team_change_counts, dtype=np.int32)
+
+    # WRITING
+
+    def intern_author(self, name: str, email: str) -> int:
+        key = (name or "", email or "")
+        author_id = self._author_index.get(key)
+        if author_id is None:
+            author_id = len(self.authors)
+            self.authors.append(key)
+            self._author_index[key] = author_id
+        return author_id
+
+    def intern_team(self, team: str) -> int:
+        team_id = self._team_index.get(team)
+        if team_id is None:
+            team_id = len(self.teams)
+            self.teams.append(team)
+            self._team_index[team] = team_id
+        return team_id
+
+    def _grow(self):
+        capacity = max(len(self._dates) * 2, 1)
+        for column in (
+            "_hexshas",
+            "_dates",
+            "_author_ids",
+            "_refactor_counts",
+            "_remaining_files_counts",
+        ):
+            old = getattr(self, column)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self._size] = old[: self._size]
+            setattr(self, column, new)
+
+    def append(
+        self,
+        hexsha: str,
+        date: datetime,
+        summary: str,
+        author_name: str,
+        author_email: str,
+        refactor_count: int,
+        remaining_files_count: int,
+        team_remaining_files_counts: dict[str, int] | None = None,
+    ):
+        if self._size == len(self._dates):
+            self._grow()
+        i = self._size
+        self._hexshas[i] = np.frombuffer(bytes.fromhex(hexsha), dtype=np.uint8)
+        self._dates[i] = np.datetime64(date, "s")
+        self._author_ids[i] = self.intern_author(author_name, author_email)
+        self._refactor_counts[i] = refactor_count
+        self._remaining_files_counts[i] = remaining_files_count
+        self._summaries.append(summary)
+        for team, count in (team_remaining_files_counts or {}).items():
+            self._team_change_rows.append(i)
+            self._team_change_ids.append(self.intern_team(team))
+            self._team_change_counts.append(count)
+        self._size += 1
+
+    def append_commit(
+        self,
+        commit: Commit,
+        refactor_count: int,
+        remaining_files_count: int,
+        team_remaining_files_counts: dict[str, int] | None = None,
+    ):
+        self.append(
+            commit.hexsha,
+            datetime.fromtimestamp(commit.committed_date),
+            commit.summary,
+            commit.author.name,
+            commit.author.email,
+            refactor_count,
+            remaining_files_count,
+            team_remaining_files_counts,
+        )
+
+    @classmethod
+    def from_refactor_commits(
+        cls, commits: Iterable[RefactorCommit]
+    ) -> "RefactorCommitStore":
+        store = cls()
+        for c in commits:
+            store.append(
+                c.hexsha,
+                c.date,
+                c.summary,
+                c.author_name,
+                c.author_email,
+                c.refactor_count,
+                c.remaining_files_count,
+                c.team_remaining_files_counts,
+            )
+        return store
+
+    def copy(self) -> "RefactorCommitStore":
+        """
+        :return: independent copy, rows appended to it aren't seen by the readers of
+        this store
+        """
+        return deepcopy(self)
+
+    # READING
+
+    def team_remaining_files_counts(self, i: int) -> dict[str, int]:
+        # team changes are appended in row order
+        start = bisect_left(self._team_change_rows, i)
+        end = bisect_right(self._team_change_rows, i, lo=start)
+        return {
+            self.teams[self._team_change_ids[j]]: self._team_change_counts[j]
+            for j in range(start, end)
+        }
+
+    def row(self, i: int) -> RefactorCommit:
+        author_name, author_email = self.authors[self._author_ids[i]]
+        return RefactorCommit(
+            bytes(self._hexshas[i]).hex(),
+            self._dates[i].astype(datetime),
+            self._summaries[i],
+            author_name,
+            author_email,
+            int(self._refactor_counts[i]),
+            int(self._remaining_files_counts[i]),
+            self.team_remaining_files_counts(i),
+        )
+
+    def rows(self, newest_first=False) -> Iterator[RefactorCommit]:
+        """
+        Yields rows sorted by date, ties keep their insertion order
+        """
+        keys = self.dates.astype(np.int64)
+        if newest_first:
+            keys = -keys
+        for i in np.argsort(keys, kind="stable"):
+            yield self.row(int(i))
+
+    # AGGREGATIONS
+
+    def chart_data(self) -> dict[datetime, int]:
+        """
+        Vectorized equivalent of build_chart_data: the minimum remaining file count
+        per commit date, sorted by date
+        """
+        return self.remaining_by_bucket("commit")
+
+    def remaining_by_bucket(self, bucket: str) -> dict[datetime, int]:
+        return min_by_key(bucket_dates(self.dates, bucket), self.remaining_files_counts)
+
+    def min_remaining_by_day(self) -> dict[datetime, int]:
+        return self.remaining_by_bucket("day")
+
+    def team_chart_data(self, bucket: str = "commit") -> dict[str, dict[datetime, int]]:
+        """
+        Per team equivalent of chart_data, only commits that changed a team's
+        remaining files count are part of that team's series
+        """
+        rows = self.team_change_rows
+        team_ids = self.team_change_ids
+        counts = self.team_change_counts
+        keys = bucket_dates(self.dates[rows], bucket)
+        return {
+            team: min_by_key(keys[team_ids == team_id], counts[team_ids == team_id])
+            for team_id, team in enumerate(self.teams)
+        }
+
+    def author_totals(self) -> np.ndarray:
+        return np.bincount(
+            self.author_ids,
+            weights=self.refactor_counts,
+            minlength=len(self.authors),
+        ).astype(np.int64)
+
+    def leaderboard_data(self) -> dict[Actor, int]:
+        """
+        Vectorized equivalent of build_leaderboard_data
+        """
+        totals = self.author_totals()
+        present = np.unique(self.author_ids)
+        return {
+            Actor(*self.authors[author_id]): int(totals[author_id])
+            for author_id in present
+        }
+
+    # PERSISTENCE
+
+    def save(self, path: Path):
+        summaries, summary_offsets = pack_strings(self._summaries)
+        names, name_offsets = pack_strings([a[0] for a in self.authors])
+        emails, email_offsets = pack_strings([a[1] for a in self.authors])
+        teams, team_offsets = pack_strings(self.teams)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=np.array(STORE_FORMAT_VERSION),
+                hexshas=self.hexshas,
+                dates=self.dates.astype(np.int64),
+                author_ids=self.author_ids,
+                refactor_counts=self.refactor_counts,
+                remaining_files_counts=self.remaining_files_counts,
+                summaries=summaries,
+                summary_offsets=summary_offsets,
+                author_names=names,
+                author_name_offsets=name_offsets,
+                author_emails=emails,
+                author_email_offsets=email_offsets,
+                teams=teams,
+                team_offsets=team_offsets,
+                team_change_rows=self.team_change_rows,
+                team_change_ids=self.team_change_ids,
+                team_change_counts=self.team_change_counts,
+            )
+
+    @classmethod
+    def load(cls, path: Path) -> "RefactorCommitStore":
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["version"])
+            if version != STORE_FORMAT_VERSION:
+                raise Exception(f"Unsupported commit store version {version}")
+
+            size = len(data["dates"])
+            store = cls(capacity=max(size, 1))
+            store._size = size
+            store._hexshas[:size] = data["hexshas"]
+            store._dates[:size] = data["dates"].astype("datetime64[s]")
+            store._author_ids[:size] = data["author_ids"]
+            store._refactor_counts[:size] = data["refactor_counts"]
+            store._remaining_files_counts[:size] = data["remaining_files_counts"]
+            store._summaries = unpack_strings(
+                data["summaries"], data["summary_offsets"]
+            )
+            names = unpack_strings(data["author_names"], data["author_name_offsets"])
+            emails = unpack_strings(data["author_emails"], data["author_email_offsets"])
+            for team in unpack_strings(data["teams"], data["team_offsets"]):
+                store.intern_team(team)
+            store._team_change_rows.extend(data["team_change_rows"].tolist())
+            store._team_change_ids.extend(data["team_change_ids"].tolist())
+            store._team_change_counts.extend(data["team_change_counts"].tolist())
+        for name, email in zip(names, emails):
+            store.intern_author(name, email)
+        return store
+
+
+class CumulativeLeaderboard:
+    """
+    Per-author cumulative refactor counts over time
+
+    Rows are sorted by author and date and refactor counts are accumulated once, so
+    the total of any author within a time window is the difference between two
+    cumulative values found by binary search.
+    """
+
+    # room reserved for the date offset inside each author's sort key
+    DATE_BITS = 40
+
+    def __init__(self, store: RefactorCommitStore):
+        self.authors = store.authors
+        seconds = store.dates.astype(np.int64)
+        self.origin = int(seconds.min()) if len(seconds) else 0
+
+        order = np.lexsort((seconds, store.author_ids))
+        self.keys = self.build_keys(store.author_ids[order], seconds[order])
+        self.cumulative = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(store.refactor_counts[order], out=self.cumulative[1:])
+        self.author_ids = np.unique(store.author_ids)
+
+    def build_keys(self, author_ids: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        offsets = np.clip(seconds - self.origin, 0, (1 << self.DATE_BITS) - 1)
+        return (author_ids.astype(np.int64) << self.DATE_BITS) | offsets
+
+    def totals(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> np.ndarray:
+        """
+        :return: refactor count of each author in self.author_ids within [start, end)
+        """
+        start_seconds = np.full(len(self.author_ids), self.origin, dtype=np.int64)
+        end_seconds = np.full(
+            len(self.author_ids), self.origin + (1 << self.DATE_BITS) - 1
+        )
+        if start is not None:
+            start_seconds[:] = np.datetime64(start, "s").astype(np.int64)
+        if end is not None:
+            end_seconds[:] = np.datetime64(end, "s").astype(np.int64)
+
+        lower = np.searchsorted(
+            self.keys, self.build_keys(self.author_ids, start_seconds)
+        )
+        upper = np.searchsorted(
+            self.keys, self.build_keys(self.author_ids, end_seconds)
+        )
+        return self.cumulative[upper] - self.cumulative[lower]
+
+    def window(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> dict[Actor, int]:
+        """
+        Leaderboard data for the commits dated within [start, end), authors without
+        refactors in that window are left out
+        """
+        return {
+            Actor(*self.authors[author_id]): int(total)
+            for author_id, total in zip(self.author_ids, self.totals(start, end))
+            if total
+        }
+
+
+def build_stats_store(
+    commits: list[Commit],
+    regex: str,
+    baseline_file_list: list[str],
+    codeowners: CodeOwners | None = None,
+    store: RefactorCommitStore | None = None,
+    matcher: BlobMatcher | None = None,
+) -> RefactorCommitStore:
+    """
+    Same as build_stats_data but appends each refactor commit to a columnar store
+    instead of creating a RefactorCommit per row
+    """
+    if store is None:
+        store = RefactorCommitStore()
+
+    for (
+        commit,
+        refactor_count,
+        remaining_files_count,
+        team_remaining_files_counts,
+    ) in iter_commit_refactors(commits, regex, baseline_file_list, codeowners, matcher):
+        store.append_commit(
+            commit, refactor_count, remaining_files_count, team_remaining_files_counts
+        )
+
+    return store
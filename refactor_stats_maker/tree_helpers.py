@@ -0,0 +1,283 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from codeowners import CodeOwners
+from git import BadName, Commit, Repo
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from refactor_stats_maker.match_helpers import MAX_BLOB_SIZE, BlobMatcher
+from refactor_stats_maker.merge_request_helpers import is_excluded
+from refactor_stats_maker.stats_helpers import (
+    File,
+    RefactorCommit,
+    assign_files_to_teams,
+    bucket_dates,
+    build_file_status_list,
+)
+
+SYMLINK_MODE = "120000"
+
+
+class BlobMatchCache:
+    """
+    Match counts by blob SHA, files that are identical between refs share the same
+    blob so they're only read and matched once
+    """
+
+    def __init__(self, regex: str, max_blob_size: int = MAX_BLOB_SIZE):
+        self.matcher = BlobMatcher(regex, max_blob_size)
+        self.counts: dict[str, int] = {}
+        self.reads = 0
+
+    def count(self, repo: Repo, hexsha: str, path: str | None = None) -> int:
+        count = self.counts.get(hexsha)
+        if count is None:
+            binsha = bytes.fromhex(hexsha)
+            name = path or hexsha
+            # check the size before opening the stream, it would be read whole
+            # once discarded
+            if self.matcher.is_too_large(repo.odb.info(binsha).size, name):
+                count = 0
+            else:
+                stream = repo.odb.stream(binsha)
+                count = self.matcher.count_stream(stream, stream.size, name)
+            self.counts[hexsha] = count
+            self.reads += 1
+        return count
+
+
+def resolve_ref(repo: Repo, ref: str) -> str:
+    """
+    Branches that were never checked out in the cache repository only exist as
+    remote tracking branches, and the ones that were aren't moved by a fetch, so the
+    remote tracking branch wins over a local one
+
+    :return: commit SHA of ref
+    """
+    try:
+        return repo.commit(f"origin/{ref}").hexsha
+    except (BadName, ValueError):
+        return repo.commit(ref).hexsha
+
+
+def list_tree_blobs(repo: Repo, rev: str) -> list[tuple[str, str]]:
+    """
+    :return: (path, blob SHA) of every file in the tree of rev, without symlinks and
+    submodules
+    """
+    output = repo.git.ls_tree("-r", "-z", "--full-tree", rev)
+    blobs = []
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        info, path = entry.split("\t", 1)
+        mode, object_type, hexsha = info.split(" ")
+        if object_type == "blob" and mode != SYMLINK_MODE:
+            blobs.append((path, hexsha))
+    return blobs
+
+
+def get_files_to_refactor_at_rev(
+    repo: Repo, rev: str, cache: BlobMatchCache, exclude: list[str]
+) -> list[str]:
+    return [
+        path
+        for path, hexsha in list_tree_blobs(repo, rev)
+        if not is_excluded(path, exclude) and cache.count(repo, hexsha, path)
+    ]
+
+
+def build_ref_comparison(
+    repo: Repo,
+    refs: list[str],
+    commit_hash: str,
+    regex: str,
+    exclude: list[str],
+    max_blob_size: int = MAX_BLOB_SIZE,
+) -> dict[str, list[File]]:
+    """
+    Builds the file status list of each ref against the baseline commit by reading
+    trees straight from the object database, nothing is checked out
+
+    :return: dictionary of file status lists by ref, in the same order as refs
+    """
+    cache = BlobMatchCache(regex, max_blob_size)
+    baseline_files = get_files_to_refactor_at_rev(repo, commit_hash, cache, exclude)
+    return {
+        ref: build_file_status_list(
+            baseline_files,
+            get_files_to_refactor_at_rev(repo, resolve_ref(repo, ref), cache, exclude),
+        )
+        for ref in refs
+    }
+
+
+def get_first_parent_commits(repo: Repo, commit_hash: str, rev: str) -> list[Commit]:
+    """
+    :return: first-parent history from commit_hash to rev, oldest first and
+    commit_hash included
+    """
+    commits = list(repo.iter_commits(f"{commit_hash}..{rev}", first_parent=True))
+    commits.append(repo.commit(commit_hash))
+    return list(reversed(commits))
+
+
+def count_remaining_files(
+    repo: Repo, rev: str, baseline_files: set[str], cache: BlobMatchCache
+) -> int:
+    """
+    :return: number of baseline files that still match at rev
+    """
+    return len(
+        [
+            path
+            for path, hexsha in list_tree_blobs(repo, rev)
+            if path in baseline_files and cache.count(repo, hexsha, path)
+        ]
+    )
+
+
+def sample_commits(commits: list[Commit], bucket: str) -> list[Commit]:
+    """
+    Keeps the first commit and the last commit of each day, week or month, which is
+    the state of the repository at the end of that period
+
+    :param commits: commits sorted from the oldest to the most recent one
+    :param bucket: one of CHART_BUCKETS
+    """
+    if bucket == "commit" or not commits:
+        return commits
+    dates = np.array(
+        [datetime.fromtimestamp(c.committed_date) for c in commits],
+        dtype="datetime64[s]",
+    )
+    samples: dict[np.datetime64, Commit] = {}
+    for key, commit in zip(bucket_dates(dates, bucket)[1:], commits[1:]):
+        samples[key] = commit
+    return [commits[0]] + list(samples.values())
+
+
+def build_snapshot_data(
+    repo: Repo,
+    commit_hash: str,
+    rev: str,
+    regex: str,
+    exclude: list[str],
+    bucket: str = "day",
+    workers: int = 4,
+    max_blob_size: int = MAX_BLOB_SIZE,
+) -> list[RefactorCommit]:
+    """
+    Cheaper alternative to build_stats_data for charts and estimates: the remaining
+    file count is only computed for sample commits along first-parent history, from
+    their trees and in parallel, so the cost depends on the number of samples
+    instead of the number of commits
+
+    The refactor count of each sample is the number of files fixed since the
+    previous sample, it isn't meant for leaderboards.
+
+    :return: one RefactorCommit per sample, the first one is the baseline commit
+    """
+    commits = sample_commits(get_first_parent_commits(repo, commit_hash, rev), bucket)
+    cache = BlobMatchCache(regex, max_blob_size)
+    baseline_files = set(
+        get_files_to_refactor_at_rev(repo, commit_hash, cache, exclude)
+    )
+
+    # Repo objects keep git processes around and aren't safe to share between threads
+    local = threading.local()
+    repos: list[Repo] = []
+
+    def count(hexsha: str) -> int:
+        if not hasattr(local, "repo"):
+            local.repo = Repo(repo.git_dir)
+            repos.append(local.repo)
+        return count_remaining_files(local.repo, hexsha, baseline_files, cache)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            remaining_files_counts = list(
+                executor.map(count, [c.hexsha for c in commits])
+            )
+    finally:
+        for r in repos:
+            r.close()
+
+    snapshots = []
+    previous_count = len(baseline_files)
+    for commit, remaining_files_count in zip(commits, remaining_files_counts):
+        snapshots.append(
+            RefactorCommit(
+                commit.hexsha,
+                datetime.fromtimestamp(commit.committed_date),
+                commit.summary,
+                commit.author.name,
+                commit.author.email,
+                max(previous_count - remaining_files_count, 0),
+                remaining_files_count,
+            )
+        )
+        previous_count = remaining_files_count
+    return snapshots
+
+
+def get_team_progress(
+    status_files: list[File], codeowners: CodeOwners
+) -> dict[str, tuple[int, int]]:
+    """
+    :return: dictionary of (fixed files count, total files count) per team
+    """
+    return {
+        team: (len([f for f in files if f.fixed]), len(files))
+        for team, files in assign_files_to_teams(status_files, codeowners).items()
+    }
+
+
+def format_progress(fixed_files_count: int, total_file_count: int) -> str:
+    if not total_file_count:
+        return "-"
+    percent_done = fixed_files_count / total_file_count * 100
+    return f"{fixed_files_count}/{total_file_count} {percent_done:.1f}%"
+
+
+def display_ref_comparison(
+    project_name: str, statuses: dict[str, list[File]], codeowners: CodeOwners
+):
+    progress_by_ref = {
+        ref: get_team_progress(status_files, codeowners)
+        for ref, status_files in statuses.items()
+    }
+    teams = sorted(set().union(*progress_by_ref.values()))
+
+    table = Table(
+        title=f"REFACTORING STATUS OF {project_name.upper()} BY REF",
+        box=box.SIMPLE_HEAD,
+    )
+    table.add_column("Team")
+    for ref in statuses:
+        table.add_column(ref, justify="right")
+
+    for team in teams:
+        table.add_row(
+            team,
+            *[
+                format_progress(*progress.get(team, (0, 0)))
+                for progress in progress_by_ref.values()
+            ],
+        )
+
+    table.add_section()
+    table.add_row(
+        "Overall",
+        *[
+            format_progress(len([f for f in files if f.fixed]), len(files))
+            for files in statuses.values()
+        ],
+        style="bold",
+    )
+
+    Console().print(table)
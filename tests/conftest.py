@@ -0,0 +1,106 @@
+import gc
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from git import Actor, Repo
+
+from refactor_stats_maker.session_helpers import RefactorStatsSession
+
+REGEX = "expanded: [',\\[].*"
+CODEOWNERS = "^[Domain]\nsrc/a/ @TeamA\nsrc/b/ @TeamB\n"
+# size of the blobs that must never be loaded whole
+LARGE_BLOB_SIZE = 8 * 1024 * 1024
+
+
+def commit_files(repo: Repo, files: dict[str, str | None], message: str, author):
+    """
+    Writes (or removes when the content is None) each file and commits the result
+    """
+    for path, content in files.items():
+        file_path = Path(repo.working_tree_dir, path)
+        if content is None:
+            repo.index.remove([path], working_tree=True)
+            continue
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+        repo.index.add([path])
+    return repo.index.commit(message, author=author, committer=author)
+
+
+def peak_memory(function) -> int:
+    """
+    :return: peak of the memory allocated while function runs, in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        # streams read their remaining bytes when they're garbage collected
+        gc.collect()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def git_repository(tmp_path):
+    """
+    A repository where two files start with old expands and get refactored by
+    different authors over a few commits
+    """
+    repo = Repo.init(tmp_path / "repository")
+    jane = Actor("Jane", "jane@enterprise.com")
+    john = Actor("John", "john@enterprise.com")
+
+    commit_files(
+        repo,
+        {
+            "CODEOWNERS": CODEOWNERS,
+            "src/a/A.vue": "expanded: 'a'\nexpanded: ['b']\n",
+            "src/b/B.ts": "expanded: 'c'\n",
+            "src/b/C.ts": "const c = 1\n",
+        },
+        "Baseline",
+        jane,
+    )
+    commit_files(repo, {"src/a/A.vue": "expanded: 'a'\n"}, "Refactor A", jane)
+    commit_files(repo, {"src/b/B.ts": "expand: {}\n"}, "Refactor B", john)
+    commit_files(repo, {"src/a/A.vue": "expand: {}\n"}, "Finish A", jane)
+    return repo
+
+
+@pytest.fixture
+def root_repository(git_repository, tmp_path, monkeypatch):
+    """
+    A clone of git_repository, which acts as its remote, with the tool's cache folder
+    redirected to a temporary folder
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return git_repository.clone(tmp_path / "root")
+
+
+@pytest.fixture
+def stats_session(root_repository, monkeypatch):
+    """
+    A session over root_repository whose baseline is the Baseline commit, file scans
+    are replaced since they need ripgrep
+    """
+    session = RefactorStatsSession(
+        root_repository.working_tree_dir,
+        rev=root_repository.active_branch.name,
+        commit_hash=root_repository.commit("HEAD~3").hexsha,
+        regex=REGEX,
+        exclude=[],
+        fetch_freshness=timedelta(0),
+    )
+    monkeypatch.setattr(
+        session.handler,
+        "get_baseline_file_paths",
+        lambda *args, **kwargs: ["src/a/A.vue", "src/b/B.ts"],
+    )
+    monkeypatch.setattr(
+        session.handler, "get_files_to_refactor", lambda *args, **kwargs: []
+    )
+    return session
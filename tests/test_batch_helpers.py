@@ -0,0 +1,121 @@
+import time
+from pathlib import Path
+from threading import Event
+
+import pytest
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker.batch_helpers import (
+    RepositoryReport,
+    build_repository_report,
+    expand_repository_paths,
+    merge_leaderboards,
+    merge_team_assignments,
+    run_batch,
+)
+from refactor_stats_maker.stats_helpers import File
+from tests.conftest import CODEOWNERS, REGEX
+
+
+def test_expand_repository_paths(tmp_path):
+    for name in ["web", "admin", "notes.md"]:
+        if name.endswith(".md"):
+            tmp_path.joinpath(name).write_text("")
+        else:
+            tmp_path.joinpath(name).mkdir()
+
+    paths = expand_repository_paths([f"{tmp_path}/*", str(tmp_path / "web")])
+    # files are skipped and folders are only listed once
+    assert paths == [tmp_path / "admin", tmp_path / "web"]
+
+    with pytest.raises(FileNotFoundError):
+        expand_repository_paths([str(tmp_path / "missing")])
+
+
+def test_build_repository_report_records_errors(tmp_path):
+    report = build_repository_report(tmp_path, "0" * 40, REGEX, [])
+    assert report.error
+    assert report.status_files == []
+
+
+def test_run_batch_isolates_slow_and_failing_repositories():
+    def build_report(path: Path) -> RepositoryReport:
+        if path.name == "slow":
+            time.sleep(5)
+        if path.name == "failing":
+            raise ValueError("broken")
+        return RepositoryReport(path, [File("src/a/A.vue", fixed=True)])
+
+    start = time.monotonic()
+    reports = run_batch(
+        [Path("slow"), Path("failing"), Path("ok")], build_report, 3, timeout=0.5
+    )
+    assert time.monotonic() - start < 5
+
+    assert [r.name for r in reports] == ["slow", "failing", "ok"]
+    assert reports[0].error == "Timed out after 0.5s"
+    assert reports[1].error == "broken"
+    assert reports[2].error is None
+    assert reports[2].fixed_files_count == 1
+
+
+def test_run_batch_timed_out_repositories_keep_their_slot():
+    started: dict[str, float] = {}
+    ended: dict[str, float] = {}
+
+    def build_report(path: Path) -> RepositoryReport:
+        started[path.name] = time.monotonic()
+        if path.name == "slow":
+            time.sleep(0.15)
+        ended[path.name] = time.monotonic()
+        return RepositoryReport(path)
+
+    reports = run_batch([Path("slow"), Path("ok")], build_report, 1, timeout=0.1)
+    assert reports[0].error == "Timed out after 0.1s"
+    assert reports[1].error is None
+    # the abandoned repository was still running, so the next one had to wait
+    assert started["ok"] >= ended["slow"]
+
+
+def test_run_batch_returns_when_every_worker_hangs():
+    hung = Event()
+
+    def build_report(path: Path) -> RepositoryReport:
+        if path.name == "hung":
+            hung.wait()
+        return RepositoryReport(path)
+
+    try:
+        reports = run_batch([Path("hung"), Path("ok")], build_report, 1, timeout=0.1)
+    finally:
+        hung.set()
+    assert reports[0].error == "Timed out after 0.1s"
+    assert reports[1].error == "Not started, no worker was free after 0.1s"
+
+
+def test_merge_team_assignments():
+    codeowners = CodeOwners(CODEOWNERS)
+    a_vue = File("src/a/A.vue")
+    b_ts = File("src/b/B.ts", fixed=True)
+    other_a_vue = File("src/a/A.vue", fixed=True)
+    reports = [
+        RepositoryReport(Path("web"), [a_vue, b_ts], codeowners),
+        RepositoryReport(Path("admin"), [other_a_vue], codeowners),
+        RepositoryReport(Path("broken"), [File("src/b/C.ts")], error="Failed"),
+    ]
+    assert merge_team_assignments(reports) == {
+        "TeamA": [a_vue, other_a_vue],
+        "TeamB": [b_ts],
+    }
+
+
+def test_merge_leaderboards():
+    jane = Actor("Jane", "jane@enterprise.com")
+    john = Actor("John", "john@enterprise.com")
+    assert merge_leaderboards(
+        [{jane: 2, john: 1}, {Actor(jane.name, jane.email): 3}]
+    ) == {
+        jane: 5,
+        john: 1,
+    }
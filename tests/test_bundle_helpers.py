@@ -0,0 +1,126 @@
+import json
+import zipfile
+from datetime import timedelta
+
+import pytest
+from codeowners import CodeOwners
+from git import Actor, Repo
+
+from refactor_stats_maker.bundle_helpers import (
+    MANIFEST_NAME,
+    export_cache_bundle,
+    import_cache_bundle,
+)
+from refactor_stats_maker.history_helpers import HistoryState
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.repository_helpers import RepoHandler
+from tests.conftest import CODEOWNERS, REGEX, commit_files
+
+
+def build_history(root_repository, monkeypatch) -> HistoryState:
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    monkeypatch.setattr(
+        handler,
+        "get_baseline_file_paths",
+        lambda *args: ["src/a/A.vue", "src/b/B.ts"],
+    )
+    return HistoryState(
+        handler,
+        root_repository.commit("HEAD~3").hexsha,
+        REGEX,
+        [],
+        CodeOwners(CODEOWNERS),
+        BlobMatcher(REGEX),
+        root_repository.active_branch.name,
+    )
+
+
+@pytest.fixture
+def cache_bundle(root_repository, monkeypatch, tmp_path):
+    history = build_history(root_repository, monkeypatch)
+    history.update()
+    history.save()
+    bundle_path = tmp_path / "cache.zip"
+    export_cache_bundle(history.repo_handler, bundle_path)
+    return bundle_path
+
+
+def test_export_cache_bundle(cache_bundle):
+    with zipfile.ZipFile(cache_bundle) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    assert manifest["version"] == 1
+    assert "repository.bundle" in manifest["files"]
+    # the history state and its commit store
+    assert len([name for name in manifest["files"] if name.startswith("state/")]) == 2
+
+
+def test_failed_export_leaves_no_temporary_file(root_repository, monkeypatch, tmp_path):
+    history = build_history(root_repository, monkeypatch)
+    bundle_path = tmp_path / "cache.zip"
+
+    def write(*args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(zipfile.ZipFile, "write", write)
+    with pytest.raises(OSError):
+        export_cache_bundle(history.repo_handler, bundle_path)
+    assert list(tmp_path.glob("cache.zip*")) == []
+
+
+def test_import_cache_bundle(
+    cache_bundle, git_repository, root_repository, monkeypatch, tmp_path
+):
+    # a fresh runner with an empty cache
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "other-cache"))
+    import_cache_bundle(cache_bundle, root_repository)
+
+    def clone_from(*args, **kwargs):
+        raise AssertionError("the cache repository should have been restored")
+
+    monkeypatch.setattr(Repo, "clone_from", clone_from)
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "expanded: 'c'\n"},
+        "New file",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    history = build_history(root_repository, monkeypatch)
+    assert len(history.store) == 3
+
+    walked = []
+    get_commits_after = history.repo_handler.get_commits_after
+
+    def spy(commit_hash, rev):
+        commits = get_commits_after(commit_hash, rev)
+        walked.extend(c.summary for c in commits)
+        return commits
+
+    history.repo_handler.get_commits_after = spy
+    history.update()
+    # the new commit was fetched from the remote and only it was walked
+    assert walked == ["New file"]
+
+
+def test_import_rejects_corrupted_bundles(cache_bundle, root_repository, tmp_path):
+    corrupted_path = tmp_path / "corrupted.zip"
+    with (
+        zipfile.ZipFile(cache_bundle) as source,
+        zipfile.ZipFile(corrupted_path, "w") as destination,
+    ):
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename.startswith("state/"):
+                data += b" "
+            destination.writestr(item, data)
+
+    with pytest.raises(Exception, match="checksum"):
+        import_cache_bundle(corrupted_path, root_repository)
+
+
+def test_import_rejects_other_archives(root_repository, tmp_path):
+    path = tmp_path / "other.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("file.txt", "")
+
+    with pytest.raises(Exception, match="Not a refactor_stats_maker cache bundle"):
+        import_cache_bundle(path, root_repository)
@@ -0,0 +1,124 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+from codeowners import CodeOwners
+
+from refactor_stats_maker.export_helpers import (
+    RecordWriter,
+    iter_commit_records,
+    iter_file_records,
+    iter_team_records,
+)
+from refactor_stats_maker.stats_helpers import File, RefactorCommit
+from tests.conftest import CODEOWNERS
+
+STATUS_FILES = [File("src/b/B.ts"), File("src/a/A.vue", fixed=True)]
+
+
+def test_write_ndjson():
+    stream = io.StringIO()
+    with RecordWriter(stream) as writer:
+        writer.write({"a": 1})
+        writer.write({"b": 2})
+    assert stream.getvalue() == '{"a": 1}\n{"b": 2}\n'
+
+
+def test_write_json():
+    stream = io.StringIO()
+    with RecordWriter(stream, "json") as writer:
+        writer.write({"a": 1})
+        writer.write({"b": 2})
+    assert json.loads(stream.getvalue()) == [{"a": 1}, {"b": 2}]
+
+    stream = io.StringIO()
+    with RecordWriter(stream, "json"):
+        pass
+    assert json.loads(stream.getvalue()) == []
+
+
+def test_json_array_is_left_open_on_error():
+    stream = io.StringIO()
+    with pytest.raises(ValueError):
+        with RecordWriter(stream, "json") as writer:
+            writer.write({"a": 1})
+            raise ValueError()
+    assert stream.getvalue() == '[\n{"a": 1}'
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(stream.getvalue())
+
+
+def test_records_are_written_as_they_are_produced():
+    stream = io.StringIO()
+
+    def records():
+        for i in range(3):
+            # every previous record was already written
+            assert stream.getvalue().count("\n") == i
+            yield {"i": i}
+
+    with RecordWriter(stream) as writer:
+        writer.write_all(records())
+    assert writer.count == 3
+
+
+def test_iter_file_records():
+    records = list(iter_file_records(STATUS_FILES, CodeOwners(CODEOWNERS)))
+    assert records == [
+        {
+            "type": "file",
+            "name": "A.vue",
+            "path": "src/a/A.vue",
+            "fixed": True,
+            "is_new": False,
+            "teams": ["TeamA"],
+        },
+        {
+            "type": "file",
+            "name": "B.ts",
+            "path": "src/b/B.ts",
+            "fixed": False,
+            "is_new": False,
+            "teams": ["TeamB"],
+        },
+    ]
+
+
+def test_iter_team_records():
+    records = list(iter_team_records(STATUS_FILES, CodeOwners(CODEOWNERS)))
+    assert records == [
+        {
+            "type": "team",
+            "team": "TeamA",
+            "fixed": 1,
+            "total": 1,
+            "remaining_files": [],
+        },
+        {
+            "type": "team",
+            "team": "TeamB",
+            "fixed": 0,
+            "total": 1,
+            "remaining_files": ["src/b/B.ts"],
+        },
+    ]
+
+
+def test_iter_commit_records():
+    commit = RefactorCommit(
+        "abc", datetime(2024, 1, 2, 3, 4), "Refactor", "Jane", "jane@x", 2, 1, {"A": 0}
+    )
+    assert list(iter_commit_records([commit])) == [
+        {
+            "type": "commit",
+            "hexsha": "abc",
+            "date": "2024-01-02T03:04:00",
+            "summary": "Refactor",
+            "author_name": "Jane",
+            "author_email": "jane@x",
+            "refactor_count": 2,
+            "remaining_files_count": 1,
+            "team_remaining_files_counts": {"A": 0},
+        }
+    ]
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pytest
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker.history_helpers import HistoryState
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.repository_helpers import RepoHandler
+from tests.conftest import CODEOWNERS, REGEX, commit_files
+
+
+@pytest.fixture
+def build_history(root_repository, monkeypatch):
+    """
+    Builds history states over root_repository, the baseline scan is replaced
+    since it needs ripgrep and counts how many times it ran
+    """
+    scans = []
+    baseline = root_repository.commit("HEAD~3").hexsha
+
+    def build(codeowners: str = CODEOWNERS, rev: str | None = None) -> HistoryState:
+        handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+
+        def get_baseline_file_paths(*args):
+            scans.append(args)
+            return ["src/a/A.vue", "src/b/B.ts"]
+
+        monkeypatch.setattr(handler, "get_baseline_file_paths", get_baseline_file_paths)
+        return HistoryState(
+            handler,
+            baseline,
+            REGEX,
+            [],
+            CodeOwners(codeowners),
+            BlobMatcher(REGEX),
+            rev or root_repository.active_branch.name,
+        )
+
+    build.scans = scans
+    return build
+
+
+def test_history_is_walked_incrementally(
+    build_history, git_repository, root_repository
+):
+    history = build_history()
+    store = history.update()
+    assert [c.summary for c in store] == ["Refactor A", "Refactor B", "Finish A"]
+    assert history.remaining_baseline_files == []
+    history.save()
+
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "expanded: 'c'\n"},
+        "New file",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    history = build_history()
+    assert history.baseline_files == ["src/a/A.vue", "src/b/B.ts"]
+    walked = []
+    get_commits_after = history.repo_handler.get_commits_after
+
+    def spy(commit_hash, rev):
+        commits = get_commits_after(commit_hash, rev)
+        walked.extend(c.summary for c in commits)
+        return commits
+
+    history.repo_handler.get_commits_after = spy
+    store = history.update()
+    assert walked == ["New file"]
+    assert len(store) == 3
+    # the baseline was only scanned by the first run
+    assert len(build_history.scans) == 1
+
+
+def test_history_is_discarded_when_codeowners_change(build_history, root_repository):
+    history = build_history()
+    history.update()
+    history.save()
+
+    history = build_history("src/ @Everyone\n")
+    assert history.baseline_files is None
+    assert history.last_commit is None
+    assert len(history.store) == 0
+
+
+def test_history_is_walked_again_when_rewritten(build_history, root_repository):
+    history = build_history()
+    history.update()
+    history.last_commit = "0" * 40
+    history.remaining_baseline_files = []
+
+    store = history.update()
+    assert [c.summary for c in store] == ["Refactor A", "Refactor B", "Finish A"]
+    assert history.remaining_baseline_files == []
+
+
+def test_history_is_kept_per_rev(build_history):
+    history = build_history()
+    history.update()
+    history.save()
+
+    other_history = build_history(rev="HEAD~1")
+    assert other_history.path != history.path
+    assert other_history.last_commit is None
+    assert [c.summary for c in other_history.update()] == ["Refactor A", "Refactor B"]
@@ -0,0 +1,233 @@
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from codeowners import CodeOwners
+from requests import ConnectionError
+
+from refactor_stats_maker.jira_helpers import (
+    JiraIssue,
+    JiraIssueCache,
+    JiraSync,
+    build_jira_issues,
+    connect_jira,
+)
+from refactor_stats_maker.stats_helpers import File
+from tests.conftest import CODEOWNERS
+
+
+class StubJira:
+    """
+    Implements the two endpoints used by a sync and records the requests
+    """
+
+    def __init__(self):
+        self.requests: list[tuple[str, str, dict]] = []
+        self.issues: dict[str, dict] = {}
+        # status codes returned before handling the next requests
+        self.failures: list[int] = []
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def respond(self, status: int, body: dict | None = None):
+                data = json.dumps(body or {}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_body(self) -> dict:
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_POST(self):
+                body = self.read_body()
+                stub.requests.append(("POST", self.path, body))
+                if stub.failures:
+                    status = stub.failures.pop(0)
+                    errors = [
+                        {
+                            "failedElementNumber": i,
+                            "elementErrors": {"errors": {"summary": "Invalid"}},
+                        }
+                        for i in range(len(body["issueUpdates"]))
+                    ]
+                    return self.respond(status, {"issues": [], "errors": errors})
+                issues = []
+                for update in body["issueUpdates"]:
+                    key = f"REF-{len(stub.issues) + 1}"
+                    stub.issues[key] = update["fields"]
+                    issues.append({"id": key, "key": key, "self": key})
+                self.respond(201, {"issues": issues, "errors": []})
+
+            def do_PUT(self):
+                body = self.read_body()
+                stub.requests.append(("PUT", self.path, body))
+                key = re.match(r"/rest/api/2/issue/([^?]+)", self.path).group(1)
+                if key not in stub.issues:
+                    return self.respond(
+                        404, {"errorMessages": ["Issue does not exist"]}
+                    )
+                stub.issues[key].update(body["fields"])
+                self.send_response(204)
+                self.end_headers()
+
+        return Handler
+
+
+@pytest.fixture
+def stub_jira():
+    stub = StubJira()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub.handler())
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield stub, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def build_sync(server_url, tmp_path, batch_size=50) -> JiraSync:
+    return JiraSync(
+        connect_jira(server_url, "jane@example.com", "token", workers=2),
+        "REF",
+        JiraIssueCache(tmp_path / "jira.json"),
+        workers=2,
+        batch_size=batch_size,
+    )
+
+
+def build_issues(files: list[File]):
+    return build_jira_issues("Old Expands", files, CodeOwners(CODEOWNERS))
+
+
+def test_build_jira_issues():
+    files = [File("src/a/A.vue"), File("src/a/D.vue", fixed=True), File("src/b/B.ts")]
+    issues = build_issues(files)
+    assert [i.team for i in issues] == ["TeamA", "TeamB"]
+    assert issues[0].summary == "Old Expands: TeamA refactor"
+    assert issues[0].description == "1 of 2 files left to refactor\n\n* a/A.vue"
+
+
+def test_sync_only_touches_changed_issues(stub_jira, tmp_path):
+    stub, server_url = stub_jira
+    files = [File("src/a/A.vue"), File("src/b/B.ts")]
+
+    report = build_sync(server_url, tmp_path).sync(build_issues(files))
+    assert report.created == ["TeamA", "TeamB"]
+    # both issues were created by a single request
+    assert [(m, p) for m, p, _ in stub.requests] == [("POST", "/rest/api/2/issue/bulk")]
+    assert stub.issues["REF-1"]["project"] == {"key": "REF"}
+    assert stub.issues["REF-1"]["issuetype"] == {"name": "Task"}
+
+    # the cache was saved, nothing changed so no request is made
+    stub.requests.clear()
+    report = build_sync(server_url, tmp_path).sync(build_issues(files))
+    assert report.unchanged == ["TeamA", "TeamB"]
+    assert stub.requests == []
+
+    # only TeamB's issue changed
+    files = [File("src/a/A.vue"), File("src/b/B.ts", fixed=True)]
+    report = build_sync(server_url, tmp_path).sync(build_issues(files))
+    assert report.updated == ["TeamB"]
+    assert [(m, p) for m, p, _ in stub.requests] == [
+        ("PUT", "/rest/api/2/issue/REF-2?notifyUsers=false")
+    ]
+    assert stub.issues["REF-2"]["description"].startswith("0 of 1 files")
+
+
+def test_sync_creates_in_batches(stub_jira, tmp_path):
+    stub, server_url = stub_jira
+    codeowners = "\n".join(f"src/{i}/ @Team{i}" for i in range(5))
+    files = [File(f"src/{i}/A.vue") for i in range(5)]
+    issues = build_jira_issues("Old Expands", files, CodeOwners(codeowners))
+
+    report = build_sync(server_url, tmp_path, batch_size=2).sync(issues)
+    assert sorted(report.created) == [f"Team{i}" for i in range(5)]
+    assert sorted(len(body["issueUpdates"]) for _, _, body in stub.requests) == [
+        1,
+        2,
+        2,
+    ]
+
+
+def test_sync_recreates_deleted_issues(stub_jira, tmp_path):
+    stub, server_url = stub_jira
+    build_sync(server_url, tmp_path).sync(build_issues([File("src/a/A.vue")]))
+    del stub.issues["REF-1"]
+
+    sync = build_sync(server_url, tmp_path)
+    report = sync.sync(build_issues([File("src/a/A.vue", fixed=True)]))
+    assert report.created == ["TeamA"]
+    assert report.failed == {}
+    assert sync.cache.issues["TeamA"]["key"] == "REF-1"
+    assert stub.issues["REF-1"]["description"].startswith("0 of 1 files")
+
+
+def test_sync_retries_rate_limited_requests(stub_jira, tmp_path):
+    stub, server_url = stub_jira
+    stub.failures = [429]
+
+    report = build_sync(server_url, tmp_path).sync(build_issues([File("src/a/A.vue")]))
+    assert report.created == ["TeamA"]
+    assert len(stub.requests) == 2
+
+
+def test_sync_reports_failures(stub_jira, tmp_path):
+    stub, server_url = stub_jira
+    stub.failures = [400]
+
+    sync = build_sync(server_url, tmp_path)
+    report = sync.sync(build_issues([File("src/a/A.vue")]))
+    assert list(report.failed) == ["TeamA"]
+    assert sync.cache.issues == {}
+
+
+def build_flaky_sync(server_url, tmp_path, monkeypatch, error: Exception) -> JiraSync:
+    """
+    A sync whose request for Team1's issue raises error
+    """
+    sync = build_sync(server_url, tmp_path, batch_size=1)
+    create_issues = sync.jira.create_issues
+
+    def flaky_create_issues(field_list, prefetch=True):
+        if field_list[0]["summary"].endswith("Team1 refactor"):
+            raise error
+        return create_issues(field_list, prefetch=prefetch)
+
+    monkeypatch.setattr(sync.jira, "create_issues", flaky_create_issues)
+    return sync
+
+
+def build_team_issues(count: int) -> list[JiraIssue]:
+    codeowners = "\n".join(f"src/{i}/ @Team{i}" for i in range(count))
+    files = [File(f"src/{i}/A.vue") for i in range(count)]
+    return build_jira_issues("Old Expands", files, CodeOwners(codeowners))
+
+
+def test_sync_reports_connection_errors(stub_jira, tmp_path, monkeypatch):
+    _, server_url = stub_jira
+    error = ConnectionError("Connection reset by peer")
+    sync = build_flaky_sync(server_url, tmp_path, monkeypatch, error)
+
+    report = sync.sync(build_team_issues(2))
+    assert report.created == ["Team0"]
+    assert report.failed == {"Team1": "Connection reset by peer"}
+    assert list(JiraIssueCache(tmp_path / "jira.json").issues) == ["Team0"]
+
+
+def test_sync_saves_the_cache_when_it_fails(stub_jira, tmp_path, monkeypatch):
+    _, server_url = stub_jira
+    sync = build_flaky_sync(server_url, tmp_path, monkeypatch, RuntimeError())
+
+    with pytest.raises(RuntimeError):
+        sync.sync(build_team_issues(2))
+    # the issue created before the failure isn't created again by the next sync
+    assert list(JiraIssueCache(tmp_path / "jira.json").issues) == ["Team0"]
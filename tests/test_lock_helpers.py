@@ -0,0 +1,129 @@
+import json
+import os
+import socket
+from datetime import timedelta
+from threading import Thread
+
+import pytest
+
+from refactor_stats_maker.lock_helpers import (
+    EXCLUSIVE_LOCK_FILE,
+    CacheLock,
+    LockTimeout,
+)
+
+
+def make_lock(path, **kwargs) -> CacheLock:
+    return CacheLock(path, timeout=timedelta(seconds=0.3), poll_interval=0.01, **kwargs)
+
+
+def write_foreign_lock(path, name, pid):
+    path.mkdir(parents=True, exist_ok=True)
+    owner = {"pid": pid, "host": socket.gethostname(), "token": "other"}
+    path.joinpath(name).write_text(json.dumps(owner))
+
+
+def test_shared_locks_do_not_block_each_other(tmp_path):
+    first = make_lock(tmp_path / "lock")
+    second = make_lock(tmp_path / "lock")
+    with first.shared(), second.shared():
+        assert len(list((tmp_path / "lock").glob("shared-*.lock"))) == 2
+    assert list((tmp_path / "lock").glob("*.lock")) == []
+
+
+def test_exclusive_lock_waits_for_shared_locks(tmp_path):
+    reader = make_lock(tmp_path / "lock")
+    writer = make_lock(tmp_path / "lock")
+    with reader.shared():
+        with pytest.raises(LockTimeout):
+            writer.acquire_exclusive()
+    # the exclusive lock file is removed when giving up
+    assert not (tmp_path / "lock" / EXCLUSIVE_LOCK_FILE).exists()
+    with writer.exclusive():
+        pass
+
+
+def test_shared_lock_waits_for_exclusive_lock(tmp_path):
+    reader = make_lock(tmp_path / "lock")
+    writer = make_lock(tmp_path / "lock")
+    with writer.exclusive():
+        with pytest.raises(LockTimeout):
+            reader.acquire_shared()
+
+
+def test_exclusive_lock_is_released_for_waiting_readers(tmp_path):
+    reader = CacheLock(tmp_path / "lock", poll_interval=0.01)
+    writer = make_lock(tmp_path / "lock")
+    writer.acquire_exclusive()
+    thread = Thread(target=reader.acquire_shared)
+    thread.start()
+    writer.release_exclusive()
+    thread.join(timeout=5)
+    assert reader._shared_depth == 1
+    reader.release_shared()
+
+
+def test_locks_are_reentrant_within_a_process(tmp_path):
+    lock = make_lock(tmp_path / "lock")
+    with lock.exclusive():
+        with lock.exclusive(), lock.shared():
+            pass
+        assert (tmp_path / "lock" / EXCLUSIVE_LOCK_FILE).exists()
+    with lock.shared():
+        # own shared locks don't block the exclusive lock
+        with lock.exclusive():
+            pass
+    assert list((tmp_path / "lock").glob("*.lock")) == []
+
+
+def test_lock_of_dead_process_is_removed(tmp_path):
+    # pid 2**22 + 1 is above the default pid_max so it can't be alive
+    write_foreign_lock(tmp_path / "lock", EXCLUSIVE_LOCK_FILE, 2**22 + 1)
+    lock = make_lock(tmp_path / "lock")
+    with lock.shared():
+        pass
+
+
+def test_lock_older_than_stale_timeout_is_removed(tmp_path):
+    write_foreign_lock(tmp_path / "lock", "shared-other.lock", os.getpid())
+    lock = make_lock(tmp_path / "lock", stale_timeout=timedelta(0))
+    with lock.exclusive():
+        pass
+
+    write_foreign_lock(tmp_path / "lock", "shared-other.lock", os.getpid())
+    lock = make_lock(tmp_path / "lock")
+    with pytest.raises(LockTimeout):
+        lock.acquire_exclusive()
+
+
+def test_held_lock_is_kept_fresh(tmp_path):
+    lock = make_lock(
+        tmp_path / "lock",
+        stale_timeout=timedelta(seconds=0.2),
+        refresh_interval=timedelta(seconds=0.02),
+    )
+    other = make_lock(tmp_path / "lock", stale_timeout=timedelta(seconds=0.2))
+    with lock.exclusive():
+        # longer than the stale timeout, the other process must keep waiting
+        with pytest.raises(LockTimeout):
+            other.acquire_exclusive()
+    with other.exclusive():
+        pass
+
+
+def test_stale_lock_acquired_again_is_not_removed(tmp_path, monkeypatch):
+    write_foreign_lock(tmp_path / "lock", EXCLUSIVE_LOCK_FILE, 2**22 + 1)
+    lock = make_lock(tmp_path / "lock")
+    is_stale = lock.is_stale
+
+    def is_stale_then_acquired(path, stat=None):
+        stale = is_stale(path, stat)
+        # the dead owner's lock is removed and acquired by a live process meanwhile
+        path.unlink()
+        write_foreign_lock(tmp_path / "lock", EXCLUSIVE_LOCK_FILE, os.getpid())
+        return stale
+
+    monkeypatch.setattr(lock, "is_stale", is_stale_then_acquired)
+    lock.remove_stale_locks()
+    owner = json.loads((tmp_path / "lock" / EXCLUSIVE_LOCK_FILE).read_text())
+    assert owner["pid"] == os.getpid()
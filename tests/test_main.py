@@ -1,10 +1,12 @@
 import datetime
 
 import time_machine
+from click.testing import CliRunner
 from codeowners import CodeOwners
 from git import Actor
 
 import refactor_stats_maker.__main__
+from tests.conftest import commit_files
 
 
 def test_get_team_assignments_file_without_team():
@@ -62,3 +64,58 @@ def test_display_leaderboard(capsys):
             "│    John │ 1              │\n"
             "└─────────┴────────────────┘\n"
         )
+
+
+def test_display_leaderboard_window(capsys):
+    authors = {Actor("Jane", "jane@enterprise.com"): 10}
+
+    with time_machine.travel(datetime.date(2020, 3, 14)):
+        refactor_stats_maker.__main__.display_leaderboard(authors, window="30d")
+        out, err = capsys.readouterr()
+        assert out.splitlines()[0].strip() == "LEADERBOARD - LAST 30 DAYS"
+
+
+def test_merge_request_exit_code(git_repository):
+    runner = CliRunner()
+    repository_path = git_repository.working_tree_dir
+    run = refactor_stats_maker.__main__.run
+
+    result = runner.invoke(run, [repository_path, "--merge-request", "HEAD~3", "HEAD"])
+    assert result.exit_code == 0
+
+    base = git_repository.head.commit.hexsha
+    git_repository.create_head("feature").checkout()
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "expanded: 'c'\n"},
+        "Add expands",
+        Actor("John", "john@enterprise.com"),
+    )
+    result = runner.invoke(run, [repository_path, "--merge-request", base, "feature"])
+    assert result.exit_code == 1
+
+
+def test_batch_reports_failing_repositories(tmp_path):
+    runner = CliRunner()
+    run = refactor_stats_maker.__main__.run
+    for name in ["web", "admin"]:
+        tmp_path.joinpath(name).mkdir()
+
+    result = runner.invoke(run, [f"{tmp_path}/*"])
+    # neither folder is a git repository, both are reported instead of aborting
+    assert result.exit_code == 1
+    assert "admin" in result.output and "web" in result.output
+
+    result = runner.invoke(run, [str(tmp_path / "missing")])
+    assert result.exit_code == 2
+
+
+def test_batch_rejects_single_repository_options(tmp_path):
+    runner = CliRunner()
+    run = refactor_stats_maker.__main__.run
+    for name in ["web", "admin"]:
+        tmp_path.joinpath(name).mkdir()
+
+    result = runner.invoke(run, [f"{tmp_path}/*", "--stats", "--by-team"])
+    assert result.exit_code == 1
+    assert "--stats, --by-team only support a single repository" in result.output
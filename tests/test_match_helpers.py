@@ -0,0 +1,73 @@
+import io
+import logging
+
+from git import Actor
+
+from refactor_stats_maker.match_helpers import BlobMatcher, is_binary
+from tests.conftest import LARGE_BLOB_SIZE, REGEX, commit_files, peak_memory
+
+
+def count(matcher: BlobMatcher, data: bytes) -> int:
+    return matcher.count_stream(io.BytesIO(data), len(data), "file.ts")
+
+
+def test_is_binary():
+    assert is_binary(b"GIF89a\0\0")
+    assert not is_binary(b"expanded: 'a'\n")
+    assert not is_binary(b"a" * 8000 + b"\0")
+
+
+def test_count_matches_across_chunks():
+    data = b"".join(f"expanded: ['{i}']\nconst a = {i}\n".encode() for i in range(50))
+    expected = count(BlobMatcher(REGEX), data)
+    assert expected == 50
+    # chunks smaller than a line split every match
+    for chunk_size in [1, 7, 16, 64]:
+        assert count(BlobMatcher(REGEX, chunk_size=chunk_size), data) == expected
+
+
+def test_count_matches_without_trailing_line_break():
+    assert count(BlobMatcher(REGEX, chunk_size=4), b"a\nexpanded: 'b'") == 1
+
+
+def test_count_matches_in_undecodable_content():
+    assert count(BlobMatcher(REGEX), b"caf\xe9\nexpanded: 'a'\n") == 1
+
+
+def test_binary_content_is_not_matched():
+    assert count(BlobMatcher(REGEX), b"\0expanded: 'a'\n") == 0
+
+
+def test_large_blobs_are_skipped(caplog):
+    matcher = BlobMatcher(REGEX, max_size=10)
+    with caplog.at_level(logging.WARNING):
+        assert count(matcher, b"expanded: 'a'\n") == 0
+    assert matcher.skipped == [("file.ts", 14)]
+    assert "Skipping file.ts" in caplog.text
+
+
+def test_count_blob_without_blob():
+    assert BlobMatcher(REGEX).count_blob(None) == 0
+
+
+def test_count_blob_doesnt_read_large_git_blobs(git_repository):
+    commit_files(
+        git_repository,
+        {
+            "src/Large.ts": "expanded: 'a'\n" * (LARGE_BLOB_SIZE // 14),
+            "src/Large.bin": "\0" * LARGE_BLOB_SIZE,
+        },
+        "Large files",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    tree = git_repository.head.commit.tree
+    large, binary = tree["src/Large.ts"], tree["src/Large.bin"]
+    matcher = BlobMatcher(REGEX, max_size=1024 * 1024)
+
+    assert peak_memory(lambda: matcher.count_blob(large)) < 1024 * 1024
+    assert matcher.skipped == [("src/Large.ts", large.size)]
+
+    # binary blobs are drained in chunks once detected
+    matcher = BlobMatcher(REGEX, max_size=2 * LARGE_BLOB_SIZE)
+    assert peak_memory(lambda: matcher.count_blob(binary)) < 4 * 1024 * 1024
+    assert matcher.count_blob(binary) == 0
@@ -0,0 +1,72 @@
+import pytest
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker.merge_request_helpers import (
+    MergeRequestFile,
+    build_merge_request_data,
+    get_team_deltas,
+)
+from tests.conftest import CODEOWNERS, REGEX, commit_files
+
+
+def test_merge_request_with_removed_matches(git_repository):
+    files = build_merge_request_data(
+        git_repository, "HEAD~3", "HEAD", REGEX, [], CodeOwners(CODEOWNERS)
+    )
+    assert files == [
+        MergeRequestFile("src/a/A.vue", 2, 0, ["TeamA"]),
+        MergeRequestFile("src/b/B.ts", 1, 0, ["TeamB"]),
+    ]
+
+
+def test_merge_request_with_added_matches(git_repository):
+    base = git_repository.head.commit.hexsha
+    git_repository.create_head("feature").checkout()
+    commit_files(
+        git_repository,
+        {
+            "src/b/C.ts": "expanded: 'c'\n",
+            "src/b/C.spec.ts": "expanded: 'c'\n",
+            "src/new/D.ts": "expanded: ['d']\nexpanded: 'e'\n",
+        },
+        "Add expands",
+        Actor("John", "john@enterprise.com"),
+    )
+    files = build_merge_request_data(
+        git_repository, base, "feature", REGEX, ["spec.ts"], CodeOwners(CODEOWNERS)
+    )
+    assert files == [
+        MergeRequestFile("src/b/C.ts", 0, 1, ["TeamB"]),
+        MergeRequestFile("src/new/D.ts", 0, 2, ["Orphaned files"]),
+    ]
+
+
+def test_merge_request_without_changes(git_repository):
+    files = build_merge_request_data(
+        git_repository, "HEAD", "HEAD", REGEX, [], CodeOwners(CODEOWNERS)
+    )
+    assert files == []
+
+
+def test_merge_request_without_common_commit(git_repository):
+    branch = git_repository.active_branch.name
+    git_repository.git.checkout("--orphan", "unrelated")
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "const c = 1\n"},
+        "Unrelated",
+        Actor("John", "john@enterprise.com"),
+    )
+    with pytest.raises(Exception, match=f"{branch} and unrelated have no common"):
+        build_merge_request_data(
+            git_repository, branch, "unrelated", REGEX, [], CodeOwners(CODEOWNERS)
+        )
+
+
+def test_team_deltas():
+    files = [
+        MergeRequestFile("src/a/A.vue", 2, 0, ["TeamA"]),
+        MergeRequestFile("src/a/B.vue", 0, 1, ["TeamA", "TeamB"]),
+    ]
+    assert get_team_deltas(files) == {"TeamA": (1, 2), "TeamB": (1, 0)}
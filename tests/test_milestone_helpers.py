@@ -0,0 +1,63 @@
+from git import Actor
+
+from refactor_stats_maker.milestone_helpers import MilestoneFinder, display_milestones
+from tests.conftest import REGEX, commit_files
+
+
+def test_find_threshold(git_repository):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    finder = MilestoneFinder(git_repository, baseline, "HEAD", REGEX, [])
+
+    milestone = finder.find_threshold(50)
+    assert milestone.summary == "Refactor B"
+    assert milestone.author_name == "John"
+    assert finder.find_threshold(100).summary == "Finish A"
+
+
+def test_find_threshold_not_reached(git_repository):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    finder = MilestoneFinder(git_repository, baseline, "HEAD~1", REGEX, [])
+    assert not finder.find_threshold(90).reached
+
+
+def test_find_file_fixed(git_repository):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    finder = MilestoneFinder(git_repository, baseline, "HEAD", REGEX, [])
+    assert finder.find_file_fixed("src/a/A.vue").summary == "Finish A"
+    assert finder.find_file_fixed("src/b/B.ts").summary == "Refactor B"
+    # file_matches only reads blobs
+    assert finder.scans == 0
+
+
+def test_find_file_fixed_outside_baseline(git_repository, capsys):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    finder = MilestoneFinder(git_repository, baseline, "HEAD", REGEX, [])
+    for path in ["src/a/Typo.vue", "src/b/C.ts"]:
+        milestone = finder.find_file_fixed(path)
+        assert not milestone.reached
+        assert milestone.note == "Not a baseline file"
+    display_milestones([milestone])
+    out, err = capsys.readouterr()
+    assert "Not a baseline file" in out
+
+
+def test_bisect_scans_a_logarithmic_number_of_trees(git_repository):
+    jane = Actor("Jane", "jane@enterprise.com")
+    for i in range(30):
+        commit_files(git_repository, {f"src/b/D{i}.ts": "const d = 1\n"}, "Noop", jane)
+    commit_files(git_repository, {"src/a/A.vue": "expanded: 'a'\n"}, "Revert", jane)
+    commit_files(git_repository, {"src/a/A.vue": "expand: {}\n"}, "Again", jane)
+    baseline = git_repository.commit("HEAD~35").hexsha
+
+    finder = MilestoneFinder(git_repository, baseline, "HEAD", REGEX, [])
+    assert finder.find_threshold(50).summary == "Refactor B"
+    assert finder.scans <= 7
+
+
+def test_display_milestones(git_repository, capsys):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    finder = MilestoneFinder(git_repository, baseline, "HEAD~1", REGEX, [])
+    display_milestones([finder.find_threshold(50), finder.find_threshold(90)])
+    out, err = capsys.readouterr()
+    assert "Refactor B" in out
+    assert "Not reached yet" in out
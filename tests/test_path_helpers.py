@@ -0,0 +1,30 @@
+from refactor_stats_maker.path_helpers import PathTable
+
+
+def test_intern_paths():
+    table = PathTable()
+    path_id = table.intern("src/a/A.vue")
+    assert table.intern("src/a/A.vue") == path_id
+    assert table.path(path_id) == "src/a/A.vue"
+    # the joined path is kept
+    assert table.path(path_id) is table.path(path_id)
+    assert table.name(path_id) == "A.vue"
+    assert table.simple_path(path_id) == "a/A.vue"
+
+
+def test_directories_and_basenames_are_shared():
+    table = PathTable()
+    table.intern("src/a/A.vue")
+    table.intern("src/a/B.vue")
+    other_id = table.intern("src/b/A.vue")
+    assert len(table) == 3
+    assert table.directories == ["src/a/", "src/b/"]
+    assert table.basenames == ["A.vue", "B.vue"]
+    assert table.basename_id(other_id) == table.basename_id(table.intern("src/a/A.vue"))
+
+
+def test_intern_root_paths():
+    table = PathTable()
+    path_id = table.intern("A.vue")
+    assert table.path(path_id) == "A.vue"
+    assert table.simple_path(table.intern("src/A.vue")) == "A.vue"
@@ -1,6 +1,12 @@
+from datetime import timedelta
 from pathlib import Path
 
+import pytest
+from git import Actor, Git
+
+from refactor_stats_maker.lock_helpers import LockTimeout
 from refactor_stats_maker.repository_helpers import RepoHandler
+from tests.conftest import REGEX, commit_files
 
 
 def test_get_files_to_refactor_in_folder():
@@ -8,3 +14,215 @@ def test_get_files_to_refactor_in_folder():
     assert RepoHandler.get_files_to_refactor_in_folder(repo_path, "@Component") == [
         "src/views/works/ScreenWorks.vue"
     ]
+
+
+#
+# CACHE REPOSITORY
+#
+
+
+def test_cache_repo_is_cloned_into_cache_folder(root_repository, tmp_path):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    assert handler.cache_repo_root.parent == tmp_path / "cache" / "refactor_stats_maker"
+    assert handler.cache_repo.head.commit == root_repository.head.commit
+
+
+def test_cache_repo_is_fetched_once_per_handler(root_repository, monkeypatch):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    assert handler.update_cache_repo()
+    fetched_at = handler.cache_state.fetched_at
+
+    assert not handler.update_cache_repo()
+    assert handler.cache_state.fetched_at == fetched_at
+
+
+def test_cache_repo_fetch_is_skipped_while_fresh(root_repository):
+    RepoHandler(root_repository.working_tree_dir).update_cache_repo()
+
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(minutes=5))
+    fetched_at = handler.cache_state.fetched_at
+    assert fetched_at
+    assert not handler.update_cache_repo()
+    assert handler.cache_state.fetched_at == fetched_at
+
+
+def test_cache_repo_pulls_new_commits(git_repository, root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    handler.update_cache_repo()
+
+    new_commit = commit_files(
+        git_repository, {"src/b/C.ts": "const c = 2\n"}, "Change C", Actor("J", "j@e")
+    )
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    assert handler.update_cache_repo()
+    assert handler.cache_repo.head.commit.hexsha == new_commit.hexsha
+
+
+def test_network_commands_are_killed_after_git_timeout(root_repository, monkeypatch):
+    handler = RepoHandler(
+        root_repository.working_tree_dir, timedelta(0), git_timeout=30
+    )
+    calls = []
+    execute = Git.execute
+
+    def spy(self, command, **kwargs):
+        calls.append((command[1], kwargs.get("kill_after_timeout")))
+        return execute(self, command, **kwargs)
+
+    monkeypatch.setattr(Git, "execute", spy)
+    handler.update_cache_repo()
+    assert ("fetch", 30) in calls
+
+
+def test_resolve_rev_follows_the_remote_tracking_branch(
+    git_repository, root_repository
+):
+    git_repository.create_head("develop", "HEAD~1")
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    # develop was never checked out in the cache repository
+    assert handler.resolve_rev("develop") == git_repository.commit("HEAD~1").hexsha
+
+    # a local develop isn't moved by the fetch
+    handler.cache_repo.create_head("develop", "origin/develop")
+    git_repository.heads.develop.commit = git_repository.head.commit
+    handler.update_cache_repo()
+    assert handler.resolve_rev("develop") == git_repository.head.commit.hexsha
+
+
+def test_iter_commits_since_hash_is_lazy(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    handler.update_cache_repo()
+    baseline = handler.cache_repo.commit("HEAD~3").hexsha
+
+    commits = handler.iter_commits_since_hash(baseline, "HEAD")
+    assert next(commits).hexsha == baseline
+    assert [c.summary for c in commits] == ["Refactor A", "Refactor B", "Finish A"]
+    assert [c.hexsha for c in handler.iter_commits_since_hash(baseline, "HEAD")] == [
+        c.hexsha for c in reversed(handler.get_commits_since_hash(baseline, "HEAD"))
+    ]
+
+
+def test_commits_since_hash_include_merged_commits_older_than_the_baseline(
+    git_repository, root_repository
+):
+    jane = Actor("Jane", "jane@enterprise.com")
+    baseline = git_repository.commit("HEAD~3")
+    branch = git_repository.active_branch
+    git_repository.create_head("side", baseline).checkout()
+    Path(git_repository.working_tree_dir, "src/b/D.ts").write_text("expand: {}\n")
+    git_repository.index.add(["src/b/D.ts"])
+    side = git_repository.index.commit(
+        "Side work",
+        author=jane,
+        committer=jane,
+        author_date="2000-01-01T00:00:00",
+        commit_date="2000-01-01T00:00:00",
+    )
+    branch.checkout()
+    Path(git_repository.working_tree_dir, "src/b/D.ts").write_text("expand: {}\n")
+    git_repository.index.add(["src/b/D.ts"])
+    git_repository.index.commit(
+        "Merge side",
+        parent_commits=[git_repository.head.commit, side],
+        author=jane,
+        committer=jane,
+    )
+
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    tip = handler.resolve_rev(branch.name)
+    commits = handler.get_commits_since_hash(baseline.hexsha, tip)
+    assert sorted(c.summary for c in commits) == [
+        "Baseline",
+        "Finish A",
+        "Refactor A",
+        "Refactor B",
+        "Side work",
+    ]
+    assert [
+        c.hexsha for c in handler.iter_commits_since_hash(baseline.hexsha, tip)
+    ] == [c.hexsha for c in reversed(commits)]
+
+
+def test_move_to_baseline_commit_skips_checked_out_commit(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    handler.move_to_baseline_commit("HEAD~2")
+    baseline = handler.cache_repo.head.commit
+    assert handler.is_checked_out(baseline.hexsha)
+
+    handler.move_to_baseline_commit(baseline.hexsha)
+    assert handler.cache_repo.head.commit == baseline
+
+
+#
+# CACHE REPOSITORY MAINTENANCE
+#
+
+
+def test_cache_repo_needs_maintenance_without_commit_graph(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    assert not handler.has_commit_graph()
+    assert handler.needs_maintenance()
+
+
+def test_maintain_cache_repo(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    report = handler.maintain_cache_repo()
+
+    assert handler.has_commit_graph()
+    assert handler.get_object_stats()["count"] == 0
+    assert report.size_after == handler.get_objects_size()
+    assert handler.cache_state.maintained_at
+    assert not handler.needs_maintenance()
+
+
+def test_cache_repo_needs_maintenance_past_loose_objects_threshold(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    handler.maintain_cache_repo()
+
+    handler.maintenance_loose_objects = 1
+    commit_files(handler.cache_repo, {"D.ts": "const d = 1\n"}, "D", Actor("J", "j@e"))
+    assert handler.needs_maintenance()
+
+
+def test_start_maintenance_in_background(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    thread = handler.start_maintenance()
+    thread.join()
+    assert handler.maintenance_report
+
+    assert handler.start_maintenance() is None
+    thread = handler.start_maintenance(force=True)
+    thread.join()
+
+
+#
+# CACHE REPOSITORY LOCKING
+#
+
+
+def test_cache_repo_locks_are_released(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    handler.move_to_baseline_commit("HEAD~2")
+    commits = handler.get_commits_since_hash("unknown", "origin/HEAD")
+
+    assert len(commits) == 4
+    assert list(handler.lock.path.glob("*.lock")) == []
+
+
+def test_cache_repo_fetch_waits_for_readers(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+    handler.lock.timeout = timedelta(seconds=0.2)
+    reader = RepoHandler(root_repository.working_tree_dir, timedelta(0))
+
+    with reader.lock.shared():
+        with pytest.raises(LockTimeout):
+            handler.update_cache_repo()
+    assert handler.update_cache_repo()
+
+
+def test_get_files_to_refactor_keeps_a_scan_cache(root_repository):
+    handler = RepoHandler(root_repository.working_tree_dir)
+    Path(root_repository.working_tree_dir, "src/b/C.ts").write_text("expanded: 'c'\n")
+
+    assert handler.get_files_to_refactor(REGEX) == ["src/b/C.ts"]
+    assert handler.get_scan_cache_path(REGEX).exists()
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from refactor_stats_maker.scan_helpers import (
+    WorkingTreeScanner,
+    parse_index_entries,
+    parse_status,
+)
+from tests.conftest import REGEX
+
+
+def test_parse_index_entries():
+    output = (
+        "100644 aaaa 0\tsrc/a/A.vue\0"
+        "120000 bbbb 0\tsrc/link\0"
+        "100644 cccc 1\tsrc/b/B.ts\0"
+        "100644 dddd 2\tsrc/b/B.ts\0"
+    )
+    assert parse_index_entries(output) == {"src/a/A.vue": "aaaa"}
+
+
+def test_parse_status():
+    output = " M src/a/A.vue\0R  src/b/New.ts\0src/b/Old.ts\0 D src/b/C.ts\0?? D.ts\0"
+    assert parse_status(output) == (
+        {"src/a/A.vue", "src/b/New.ts", "D.ts"},
+        {"src/b/C.ts"},
+    )
+
+
+def test_scan_working_tree(git_repository, tmp_path):
+    working_tree = Path(git_repository.working_tree_dir)
+    cache_path = tmp_path / "scan.json"
+
+    scanner = WorkingTreeScanner(git_repository, REGEX, cache_path)
+    assert scanner.scan([]) == []
+    scanner.save()
+
+    # modified, untracked, hidden and excluded files
+    working_tree.joinpath("src/b/C.ts").write_text("expanded: 'c'\n")
+    working_tree.joinpath("src/b/D.ts").write_text("expanded: 'd'\n")
+    working_tree.joinpath("src/b/D.spec.ts").write_text("expanded: 'd'\n")
+    working_tree.joinpath(".storybook").mkdir()
+    working_tree.joinpath(".storybook/E.ts").write_text("expanded: 'e'\n")
+    working_tree.joinpath("src/a/A.vue").unlink()
+
+    scanner = WorkingTreeScanner(git_repository, REGEX, cache_path)
+    assert scanner.scan(["spec.ts"]) == ["src/b/C.ts", "src/b/D.ts"]
+    # only the files reported by git status were read from disk
+    assert scanner.file_reads == 2
+    assert scanner.blob_cache.reads == 0
+    scanner.save()
+
+    scanner = WorkingTreeScanner(git_repository, REGEX, cache_path)
+    assert scanner.scan(["spec.ts"]) == ["src/b/C.ts", "src/b/D.ts"]
+    assert scanner.file_reads == 0
+    assert scanner.blob_cache.reads == 0
+
+
+def test_scan_cache_is_ignored_for_other_regexes(git_repository, tmp_path):
+    cache_path = tmp_path / "scan.json"
+    scanner = WorkingTreeScanner(git_repository, REGEX, cache_path)
+    scanner.scan([])
+    scanner.save()
+
+    scanner = WorkingTreeScanner(git_repository, "expand: ", cache_path)
+    assert scanner.scan([]) == ["src/a/A.vue", "src/b/B.ts"]
+    assert scanner.blob_cache.reads > 0
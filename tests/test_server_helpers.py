@@ -0,0 +1,264 @@
+import json
+from datetime import datetime, timedelta
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker import server_helpers, stats_helpers
+from refactor_stats_maker.server_helpers import (
+    StatsService,
+    build_files_payload,
+    build_forecast_payload,
+    build_leaderboard_payload,
+    build_request_handler,
+    build_teams_payload,
+)
+from refactor_stats_maker.stats_helpers import File, RefactorCommit
+from refactor_stats_maker.store_helpers import (
+    CumulativeLeaderboard,
+    RefactorCommitStore,
+)
+from tests.conftest import CODEOWNERS, commit_files
+
+
+def test_build_files_payload():
+    files = [File("src/b/B.ts", fixed=True), File("src/a/A.vue")]
+    assert build_files_payload(files, CodeOwners(CODEOWNERS)) == [
+        {
+            "name": "A.vue",
+            "path": "src/a/A.vue",
+            "fixed": False,
+            "is_new": False,
+            "teams": ["TeamA"],
+        },
+        {
+            "name": "B.ts",
+            "path": "src/b/B.ts",
+            "fixed": True,
+            "is_new": False,
+            "teams": ["TeamB"],
+        },
+    ]
+
+
+def test_build_teams_payload():
+    files = [
+        File("src/a/A.vue", fixed=True),
+        File("src/a/B.vue"),
+        File("src/b/C.ts", fixed=True),
+    ]
+    assert build_teams_payload(files, CodeOwners(CODEOWNERS)) == [
+        {"team": "TeamA", "fixed": 1, "total": 2, "percentage": 50.0},
+        {"team": "TeamB", "fixed": 1, "total": 1, "percentage": 100.0},
+    ]
+
+
+def test_build_leaderboard_payload():
+    store = RefactorCommitStore.from_refactor_commits(
+        [
+            RefactorCommit(
+                "a" * 40, datetime(2023, 11, 1), "A", "Jane", "j@e.com", 3, 2
+            ),
+            RefactorCommit(
+                "b" * 40, datetime(2023, 12, 1), "B", "John", "o@e.com", 1, 1
+            ),
+            RefactorCommit(
+                "c" * 40, datetime(2023, 12, 2), "C", "John", "o@e.com", 1, 0
+            ),
+        ]
+    )
+    leaderboard = CumulativeLeaderboard(store)
+    now = datetime(2023, 12, 3)
+    assert build_leaderboard_payload(leaderboard, "all", now) == [
+        {"name": "Jane", "email": "j@e.com", "refactor_count": 3},
+        {"name": "John", "email": "o@e.com", "refactor_count": 2},
+    ]
+    assert build_leaderboard_payload(leaderboard, "week", now) == [
+        {"name": "John", "email": "o@e.com", "refactor_count": 2},
+    ]
+
+
+def test_build_forecast_payload(monkeypatch):
+    store = RefactorCommitStore.from_refactor_commits(
+        [
+            RefactorCommit(
+                "a" * 40, datetime(2023, 11, 1), "A", "Jane", "j@e.com", 3, 2
+            ),
+            RefactorCommit(
+                "b" * 40, datetime(2023, 12, 1), "B", "John", "o@e.com", 1, 1
+            ),
+        ]
+    )
+    assert build_forecast_payload(store)["files_remaining"] == 1
+    # no work day since the first commit used to exit the process
+    monkeypatch.setattr(stats_helpers, "count_workdays", lambda *args: 0)
+    assert build_forecast_payload(store) is None
+
+
+@pytest.fixture
+def stats_service(stats_session):
+    return StatsService(stats_session)
+
+
+def test_stats_service_refresh_is_incremental(
+    stats_service, git_repository, root_repository
+):
+    assert stats_service.refresh()
+    assert [c.summary for c in stats_service.store] == [
+        "Refactor A",
+        "Refactor B",
+        "Finish A",
+    ]
+    assert not stats_service.refresh()
+
+    version = stats_service.version
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "expanded: 'c'\n"},
+        "New file",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    walked = []
+    get_commits_after = stats_service.session.handler.get_commits_after
+
+    def spy(commit_hash, rev):
+        commits = get_commits_after(commit_hash, rev)
+        walked.extend(c.summary for c in commits)
+        return commits
+
+    stats_service.session.handler.get_commits_after = spy
+    assert stats_service.refresh()
+    # only the new commit is walked and the version follows the new tip
+    assert walked == ["New file"]
+    assert stats_service.version != version
+
+
+def test_stats_service_memoizes_responses(stats_service):
+    stats_service.refresh()
+    etag, body = stats_service.get_response("/leaderboard?window=all")
+    assert json.loads(body) == [
+        {"name": "Jane", "email": "jane@enterprise.com", "refactor_count": 2},
+        {"name": "John", "email": "john@enterprise.com", "refactor_count": 1},
+    ]
+    assert stats_service.get_response("/leaderboard?window=all")[1] is body
+    with pytest.raises(KeyError):
+        stats_service.get_response("/unknown")
+
+
+def test_stats_service_builds_one_leaderboard_per_store(stats_service, monkeypatch):
+    built = []
+
+    class SpyLeaderboard(CumulativeLeaderboard):
+        def __init__(self, store):
+            built.append(store)
+            super().__init__(store)
+
+    monkeypatch.setattr(server_helpers, "CumulativeLeaderboard", SpyLeaderboard)
+    stats_service.refresh()
+    for window in ["all", "week", "month", "7d"]:
+        stats_service.get_response(f"/leaderboard?window={window}")
+    assert built == [stats_service.store]
+
+
+def test_stats_service_rebuilds_leaderboards_of_past_windows(
+    stats_service, monkeypatch
+):
+    stats_service.refresh()
+    now = datetime.now()
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(server_helpers, "datetime", FakeDatetime)
+    etag, body = stats_service.get_response("/leaderboard?window=week")
+    assert len(json.loads(body)) == 2
+    assert stats_service.get_response("/leaderboard?window=week")[1] is body
+
+    # the commits are from the previous week once a week went by
+    now += timedelta(days=7)
+    next_etag, next_body = stats_service.get_response("/leaderboard?window=week")
+    assert json.loads(next_body) == []
+    assert next_etag != etag
+
+
+def test_stats_service_memoizes_rolling_windows_for_the_day(stats_service, monkeypatch):
+    stats_service.refresh()
+    now = datetime.now().replace(hour=9)
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(server_helpers, "datetime", FakeDatetime)
+    etag, body = stats_service.get_response("/leaderboard?window=7d")
+    assert len(json.loads(body)) == 2
+
+    now += timedelta(hours=1)
+    assert stats_service.get_response("/leaderboard?window=7d") == (etag, body)
+
+    # the commits are out of the window once it moved by a week
+    now += timedelta(days=8)
+    next_etag, next_body = stats_service.get_response("/leaderboard?window=7d")
+    assert json.loads(next_body) == []
+    assert next_etag != etag
+
+
+def test_stats_service_keeps_serving_the_previous_store(stats_service, git_repository):
+    stats_service.refresh()
+    store = stats_service.store
+    leaderboard = stats_service.leaderboard
+    commit_files(
+        git_repository,
+        {"src/b/B.ts": "expanded: 'c'\n"},
+        "Revert B",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    commit_files(
+        git_repository,
+        {"src/b/B.ts": "expand: {}\n"},
+        "Refactor B again",
+        Actor("John", "john@enterprise.com"),
+    )
+    assert stats_service.refresh()
+    # the new commit went into a new store, the old one was left untouched
+    assert stats_service.store is not store
+    assert len(store) == 3
+    assert len(stats_service.store) == 4
+    assert stats_service.leaderboard is not leaderboard
+
+
+def test_stats_service_http_etag(stats_service):
+    stats_service.refresh()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), build_request_handler(stats_service))
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.request("GET", "/teams")
+        response = connection.getresponse()
+        assert response.status == 200
+        etag = response.getheader("ETag")
+        assert etag == f'"{stats_service.version}"'
+        assert json.loads(response.read()) == [
+            {"team": "TeamA", "fixed": 1, "total": 1, "percentage": 100.0},
+            {"team": "TeamB", "fixed": 1, "total": 1, "percentage": 100.0},
+        ]
+
+        connection.request("GET", "/teams", headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 304
+
+        connection.request("GET", "/unknown")
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 404
+    finally:
+        server.shutdown()
+        server.server_close()
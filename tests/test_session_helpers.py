@@ -0,0 +1,116 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+from git import Actor
+
+from refactor_stats_maker import RefactorStatsSession, StatsType
+from refactor_stats_maker.session_helpers import EXCLUDE, get_scan_args
+from refactor_stats_maker.stats_helpers import RefactorCommit
+from refactor_stats_maker.store_helpers import RefactorCommitStore
+from tests.conftest import commit_files
+
+
+def test_session_defaults_to_the_stats_type(root_repository):
+    session = RefactorStatsSession(
+        root_repository.working_tree_dir, StatsType.CLASS_BASED
+    )
+    assert (session.commit_hash, session.regex) == get_scan_args(StatsType.CLASS_BASED)
+    assert session.exclude == EXCLUDE
+    assert session.project_name == "Class Based to Options API"
+
+
+def test_session_memoizes_file_statuses(stats_session):
+    status_files = stats_session.file_statuses()
+    assert [(f.path, f.fixed) for f in status_files] == [
+        ("src/a/A.vue", True),
+        ("src/b/B.ts", True),
+    ]
+    assert stats_session.file_statuses() is status_files
+    assert sorted(stats_session.team_assignments()) == ["TeamA", "TeamB"]
+
+    stats_session.refresh()
+    assert stats_session.file_statuses() is not status_files
+
+
+def test_session_refresh_walks_new_commits(
+    stats_session, git_repository, root_repository
+):
+    assert [c.summary for c in stats_session.commits()] == [
+        "Refactor A",
+        "Refactor B",
+        "Finish A",
+    ]
+
+    commit_files(
+        git_repository,
+        {"src/b/B.ts": "expanded: 'c'\n"},
+        "Revert B",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    commit_files(
+        git_repository,
+        {"src/b/B.ts": "expand: {}\n"},
+        "Refactor B again",
+        Actor("John", "john@enterprise.com"),
+    )
+    walked = []
+    get_commits_after = stats_session.handler.get_commits_after
+
+    def spy(commit_hash, rev):
+        commits = get_commits_after(commit_hash, rev)
+        walked.extend(c.summary for c in commits)
+        return commits
+
+    stats_session.handler.get_commits_after = spy
+    stats_session.refresh()
+    assert [c.summary for c in stats_session.commits()][-1] == "Refactor B again"
+    assert sorted(walked) == ["Refactor B again", "Revert B"]
+
+
+def test_session_streams_refactor_commits(stats_session):
+    assert [c.summary for c in stats_session.iter_refactor_commits()] == [
+        "Refactor A",
+        "Refactor B",
+        "Finish A",
+    ]
+
+
+def test_session_leaderboard(stats_session):
+    leaderboard = {a.name: count for a, count in stats_session.leaderboard().items()}
+    assert leaderboard == {"Jane": 2, "John": 1}
+
+    now = datetime.now()
+    assert stats_session.leaderboard("all", now) == stats_session.leaderboard()
+    assert stats_session.leaderboard("week", now) == stats_session.leaderboard()
+    # every commit is from today so there isn't enough data for a forecast
+    assert stats_session.forecast() is None
+
+
+def test_session_leaderboard_follows_a_replaced_store(stats_session):
+    now = datetime.now()
+    store = stats_session.store()
+    assert len(stats_session.leaderboard("all", now)) == 2
+
+    # a rebuilt history, after a rewrite or a CODEOWNERS change, with as many rows
+    history = stats_session.history
+    history.store = RefactorCommitStore.from_refactor_commits(
+        RefactorCommit(c.hexsha, c.date, c.summary, "Joe", "joe@e.com", 1, 0)
+        for c in store
+    )
+    leaderboard = stats_session.leaderboard("all", now)
+    assert {a.name: count for a, count in leaderboard.items()} == {"Joe": 3}
+
+
+def test_session_reloads_changed_codeowners(stats_session, root_repository):
+    history = stats_session.history
+    assert stats_session.history is history
+
+    codeowners_path = Path(root_repository.working_tree_dir, "CODEOWNERS")
+    codeowners_path.write_text("^[Domain]\nsrc/ @TeamC\n")
+    # the same mtime as before would hide the change
+    mtime = codeowners_path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(codeowners_path, ns=(mtime, mtime))
+
+    assert sorted(stats_session.team_assignments()) == ["TeamC"]
+    assert stats_session.history is not history
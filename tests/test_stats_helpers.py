@@ -1,7 +1,15 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
 from codeowners import CodeOwners
+from git import Actor
 
 from refactor_stats_maker import stats_helpers
+from refactor_stats_maker.match_helpers import BlobMatcher
+from refactor_stats_maker.path_helpers import PathTable
 from refactor_stats_maker.stats_helpers import File
+from tests.conftest import CODEOWNERS, REGEX, commit_files
 
 
 #
@@ -15,6 +23,16 @@ def test_empty():
     assert file.name() == "name"
 
 
+def test_file_comparison():
+    assert File("src/a/A.vue") == File("src/a/A.vue")
+    assert File("src/a/A.vue") != File("src/a/A.vue", fixed=True)
+    assert sorted([File("src/b/B.ts"), File("src/a/A.vue")]) == [
+        File("src/a/A.vue"),
+        File("src/b/B.ts"),
+    ]
+    assert File("src/a/A.vue").get_simple_path() == "a/A.vue"
+
+
 #
 # FILE STATUS TESTS
 #
@@ -30,6 +48,33 @@ def test_empty_file_status_list():
     assert stats_helpers.build_file_status_list([], []) == []
 
 
+def test_file_status_list_views():
+    table = PathTable()
+    status_files = stats_helpers.build_file_status_list(
+        ["src/a/A.vue", "src/b/B.ts"], ["src/b/B.ts", "src/b/C.ts"], table
+    )
+    assert len(status_files) == 3
+    assert status_files[0] == File("src/a/A.vue", fixed=True)
+    assert status_files[-1] == File("src/b/C.ts", is_new=True)
+    assert status_files[1:] == [File("src/b/B.ts"), File("src/b/C.ts", is_new=True)]
+    # every path was interned once
+    assert len(table) == 3
+
+
+def test_file_status_lists_dont_share_paths():
+    first = stats_helpers.build_file_status_list(["src/a/A.vue"], [])
+    second = stats_helpers.build_file_status_list(["src/b/B.ts"], [])
+    assert first.table is not second.table
+    assert first.table.basenames == ["A.vue"]
+    assert File("src/a/A.vue").table is not first.table
+
+
+def test_standalone_files_share_a_table():
+    file = File("src/a/A.vue")
+    assert File("src/a/A.vue", fixed=True).table is file.table
+    assert File("src/a/A.vue", fixed=True).path_id == file.path_id
+
+
 def test_fixed_file_status():
     file_a = "some/path/to/fileA"
     assert stats_helpers.build_file_status_list([file_a], []) == [
@@ -184,3 +229,203 @@ def test_single_file_assignment(capsys):
         "38;5;12m▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇▇\x1b[0m "
         "\x1b[1m\x1b[38;5;7m50.00\x1b[0m\x1b[0m\n"
     )
+
+
+#
+# CHART DATA
+#
+
+
+def test_bucket_chart_data_by_day():
+    data = {
+        datetime(2023, 12, 1, 10): 10,
+        datetime(2023, 12, 1, 15): 8,
+        datetime(2023, 12, 2, 9): 7,
+    }
+    assert stats_helpers.bucket_chart_data(data, "day") == {
+        datetime(2023, 12, 1): 8,
+        datetime(2023, 12, 2): 7,
+    }
+
+
+def test_bucket_chart_data_by_week_starts_on_monday():
+    data = {
+        datetime(2023, 12, 3, 10): 10,  # Sunday
+        datetime(2023, 12, 4, 15): 8,  # Monday
+        datetime(2023, 12, 10, 9): 7,  # Sunday
+    }
+    assert stats_helpers.bucket_chart_data(data, "week") == {
+        datetime(2023, 11, 27): 10,
+        datetime(2023, 12, 4): 7,
+    }
+
+
+def test_bucket_chart_data_by_month():
+    data = {
+        datetime(2023, 11, 30, 10): 10,
+        datetime(2023, 12, 1, 15): 8,
+        datetime(2023, 12, 31, 9): 7,
+    }
+    assert stats_helpers.bucket_chart_data(data, "month") == {
+        datetime(2023, 11, 1): 10,
+        datetime(2023, 12, 1): 7,
+    }
+
+
+def test_bucket_chart_data_by_commit_keeps_data():
+    data = {datetime(2023, 12, 1, 10): 10, datetime(2023, 12, 1, 15): 8}
+    assert stats_helpers.bucket_chart_data(data, "commit") == data
+
+
+def test_downsample_chart_data_below_threshold():
+    data = {datetime(2023, 12, d): 10 - d for d in range(1, 5)}
+    assert stats_helpers.downsample_chart_data(data, 10) == data
+
+
+def test_downsample_chart_data_keeps_shape():
+    data = {datetime(2023, 1, 1) + timedelta(days=d): 100 for d in range(100)}
+    # a single sharp drop in an otherwise flat series
+    data[datetime(2023, 1, 1) + timedelta(days=50)] = 0
+    sampled = stats_helpers.downsample_chart_data(data, 10)
+
+    assert len(sampled) == 10
+    assert list(sampled.keys())[0] == datetime(2023, 1, 1)
+    assert list(sampled.keys())[-1] == datetime(2023, 1, 1) + timedelta(days=99)
+    assert 0 in sampled.values()
+
+
+#
+# LEADERBOARD WINDOWS
+#
+
+
+def test_resolve_all_time_leaderboard_window():
+    now = datetime(2023, 12, 6, 15)
+    assert stats_helpers.resolve_leaderboard_window("all", now) == (None, None)
+
+
+def test_resolve_calendar_leaderboard_windows():
+    now = datetime(2023, 12, 6, 15)  # Wednesday
+    assert stats_helpers.resolve_leaderboard_window("week", now) == (
+        datetime(2023, 12, 4),
+        None,
+    )
+    assert stats_helpers.resolve_leaderboard_window("month", now) == (
+        datetime(2023, 12, 1),
+        None,
+    )
+
+
+def test_resolve_sprint_leaderboard_window():
+    now = datetime(2023, 12, 6, 15)
+    assert stats_helpers.resolve_leaderboard_window(
+        "sprint", now, sprint_start=datetime(2023, 11, 27), sprint_length=14
+    ) == (datetime(2023, 11, 27), datetime(2023, 12, 11))
+    assert stats_helpers.resolve_leaderboard_window(
+        "sprint", now, sprint_start=datetime(2024, 1, 1), sprint_length=14
+    ) == (datetime(2023, 12, 4), datetime(2023, 12, 18))
+
+
+def test_resolve_rolling_leaderboard_window():
+    now = datetime(2023, 12, 6, 15)
+    assert stats_helpers.resolve_leaderboard_window("30d", now) == (
+        datetime(2023, 11, 6),
+        None,
+    )
+
+
+def test_resolve_invalid_leaderboard_window():
+    with pytest.raises(Exception):
+        stats_helpers.resolve_leaderboard_window("year", datetime(2023, 12, 6))
+
+
+#
+# ORACLES
+#
+
+
+def test_can_make_prediction():
+    assert not stats_helpers.BasicOracle.can_make_prediction({})
+    assert not stats_helpers.BasicOracle.can_make_prediction(
+        {datetime(2023, 12, 1): 10}
+    )
+    assert not stats_helpers.BasicOracle.can_make_prediction(
+        {datetime(2023, 12, 1): 10, datetime(2023, 12, 4): 10}
+    )
+    assert stats_helpers.BasicOracle.can_make_prediction(
+        {datetime(2023, 12, 1): 10, datetime(2023, 12, 4): 8}
+    )
+
+
+#
+# COMMIT HISTORY
+#
+
+
+def test_iter_commit_refactors(git_repository):
+    commits = list(git_repository.iter_commits())
+    baseline_files = ["src/a/A.vue", "src/b/B.ts"]
+    codeowners = CodeOwners(CODEOWNERS)
+    refactors = [
+        (c.summary, refactor_count, remaining, teams)
+        for c, refactor_count, remaining, teams in stats_helpers.iter_commit_refactors(
+            commits, REGEX, baseline_files, codeowners
+        )
+    ]
+    assert refactors == [
+        ("Refactor A", 1, 2, {}),
+        ("Refactor B", 1, 1, {"TeamB": 0}),
+        ("Finish A", 1, 0, {"TeamA": 0}),
+    ]
+    assert baseline_files == []
+
+
+def test_build_stats_data_without_codeowners(git_repository):
+    commits = list(git_repository.iter_commits())
+    stats_data = stats_helpers.build_stats_data(
+        commits, REGEX, ["src/a/A.vue", "src/b/B.ts"]
+    )
+    assert [(c.author_name, c.remaining_files_count) for c in stats_data] == [
+        ("Jane", 2),
+        ("John", 1),
+        ("Jane", 0),
+    ]
+    assert all(c.team_remaining_files_counts == {} for c in stats_data)
+
+
+def test_iter_refactor_commits_is_lazy(git_repository):
+    commits = list(git_repository.iter_commits())
+    baseline_files = ["src/a/A.vue", "src/b/B.ts"]
+    refactor_commits = stats_helpers.iter_refactor_commits(
+        commits, REGEX, baseline_files
+    )
+    assert next(refactor_commits).summary == "Refactor A"
+    # the rest of the history wasn't walked yet
+    assert baseline_files == ["src/a/A.vue", "src/b/B.ts"]
+    assert [c.summary for c in refactor_commits] == ["Refactor B", "Finish A"]
+
+
+def test_iter_commit_refactors_skips_large_and_undecodable_blobs(git_repository):
+    jane = Actor("Jane", "jane@enterprise.com")
+    commit_files(
+        git_repository,
+        {"src/b/C.ts": "expanded: 'c'\n"},
+        "Add expands",
+        jane,
+    )
+    # not valid UTF-8
+    Path(git_repository.working_tree_dir, "src/b/C.ts").write_bytes(b"caf\xe9\n")
+    git_repository.index.add(["src/b/C.ts"])
+    git_repository.index.commit("Refactor C", author=jane, committer=jane)
+
+    commits = list(git_repository.iter_commits())
+    matcher = BlobMatcher(REGEX, max_size=25)
+    refactors = [
+        c.summary
+        for c, *_ in stats_helpers.iter_commit_refactors(
+            commits, REGEX, ["src/a/A.vue", "src/b/B.ts", "src/b/C.ts"], None, matcher
+        )
+    ]
+    # the first version of A.vue is over the size limit
+    assert refactors == ["Refactor B", "Finish A", "Refactor C"]
+    assert matcher.skipped == [("src/a/A.vue", 30)]
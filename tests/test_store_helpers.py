@@ -0,0 +1,199 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from git import Actor
+
+from refactor_stats_maker import stats_helpers
+from refactor_stats_maker.stats_helpers import RefactorCommit
+from refactor_stats_maker.store_helpers import (
+    CumulativeLeaderboard,
+    RefactorCommitStore,
+)
+
+COMMITS = [
+    RefactorCommit(
+        "a" * 40, datetime(2023, 12, 1, 10), "First", "Jane", "jane@e.com", 3, 10
+    ),
+    RefactorCommit(
+        "b" * 40,
+        datetime(2023, 12, 1, 15),
+        "Second",
+        "John",
+        "john@e.com",
+        1,
+        8,
+        {"TeamA": 3, "TeamB": 4},
+    ),
+    RefactorCommit(
+        "c" * 40, datetime(2023, 12, 1, 15), "Third", "Jane", "jane@e.com", 2, 7
+    ),
+    RefactorCommit(
+        "0" * 40,
+        datetime(2023, 12, 4, 9),
+        "Fourth",
+        "Jane",
+        "jane@e.com",
+        4,
+        5,
+        {"TeamA": 1},
+    ),
+]
+
+
+#
+# ROWS
+#
+
+
+def test_empty_store():
+    store = RefactorCommitStore()
+    assert len(store) == 0
+    assert list(store) == []
+    assert store.chart_data() == {}
+    assert store.leaderboard_data() == {}
+
+
+def test_rows_roundtrip():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert len(store) == 4
+    assert list(store) == COMMITS
+
+
+def test_store_grows_past_capacity():
+    store = RefactorCommitStore(capacity=1)
+    for c in COMMITS:
+        store.append(
+            c.hexsha,
+            c.date,
+            c.summary,
+            c.author_name,
+            c.author_email,
+            c.refactor_count,
+            c.remaining_files_count,
+            c.team_remaining_files_counts,
+        )
+    assert list(store) == COMMITS
+
+
+def test_authors_are_interned():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert store.authors == [("Jane", "jane@e.com"), ("John", "john@e.com")]
+    assert store.author_ids.tolist() == [0, 1, 0, 0]
+
+
+def test_rows_newest_first():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert [c.summary for c in store.rows(newest_first=True)] == [
+        "Fourth",
+        "Second",
+        "Third",
+        "First",
+    ]
+
+
+#
+# AGGREGATIONS
+#
+
+
+def test_chart_data_matches_build_chart_data():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert store.chart_data() == stats_helpers.build_chart_data(COMMITS)
+
+
+def test_min_remaining_by_day():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert store.min_remaining_by_day() == {
+        datetime(2023, 12, 1): 7,
+        datetime(2023, 12, 4): 5,
+    }
+
+
+def test_leaderboard_data_matches_build_leaderboard_data():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert store.leaderboard_data() == stats_helpers.build_leaderboard_data(COMMITS)
+    assert store.leaderboard_data() == {
+        Actor("Jane", "jane@e.com"): 9,
+        Actor("John", "john@e.com"): 1,
+    }
+
+
+def test_team_chart_data():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    assert store.teams == ["TeamA", "TeamB"]
+    assert store.team_chart_data() == {
+        "TeamA": {datetime(2023, 12, 1, 15): 3, datetime(2023, 12, 4, 9): 1},
+        "TeamB": {datetime(2023, 12, 1, 15): 4},
+    }
+    assert store.team_chart_data("month") == {
+        "TeamA": {datetime(2023, 12, 1): 1},
+        "TeamB": {datetime(2023, 12, 1): 4},
+    }
+
+
+#
+# PERSISTENCE
+#
+
+
+def test_save_and_load(tmp_path):
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    path = tmp_path / "commits.npz"
+    store.save(path)
+    loaded = RefactorCommitStore.load(path)
+    assert list(loaded) == COMMITS
+    assert loaded.authors == store.authors
+    assert loaded.teams == store.teams
+
+
+def test_save_and_load_empty_store(tmp_path):
+    path = tmp_path / "commits.npz"
+    RefactorCommitStore().save(path)
+    assert list(RefactorCommitStore.load(path)) == []
+
+
+def test_load_store_of_previous_version(tmp_path):
+    path = tmp_path / "commits.npz"
+    # saved before team counts were added
+    with open(path, "wb") as f:
+        np.savez_compressed(f, version=np.array(1), dates=np.zeros(0, np.int64))
+    with pytest.raises(Exception, match="Unsupported commit store version 1"):
+        RefactorCommitStore.load(path)
+
+
+#
+# CUMULATIVE LEADERBOARD
+#
+
+
+def test_cumulative_leaderboard_all_time():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    leaderboard = CumulativeLeaderboard(store)
+    assert leaderboard.window() == store.leaderboard_data()
+
+
+def test_cumulative_leaderboard_window():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    leaderboard = CumulativeLeaderboard(store)
+    assert leaderboard.window(datetime(2023, 12, 1, 12), datetime(2023, 12, 4)) == {
+        Actor("Jane", "jane@e.com"): 2,
+        Actor("John", "john@e.com"): 1,
+    }
+    assert leaderboard.window(start=datetime(2023, 12, 2)) == {
+        Actor("Jane", "jane@e.com"): 4
+    }
+    assert leaderboard.window(end=datetime(2023, 12, 1, 15)) == {
+        Actor("Jane", "jane@e.com"): 3
+    }
+
+
+def test_cumulative_leaderboard_empty_window():
+    store = RefactorCommitStore.from_refactor_commits(COMMITS)
+    leaderboard = CumulativeLeaderboard(store)
+    assert leaderboard.window(start=datetime(2024, 1, 1)) == {}
+    assert leaderboard.window(end=datetime(2020, 1, 1)) == {}
+
+
+def test_cumulative_leaderboard_empty_store():
+    assert CumulativeLeaderboard(RefactorCommitStore()).window() == {}
@@ -0,0 +1,154 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from codeowners import CodeOwners
+from git import Actor
+
+from refactor_stats_maker.stats_helpers import File
+from refactor_stats_maker.tree_helpers import (
+    BlobMatchCache,
+    build_ref_comparison,
+    build_snapshot_data,
+    display_ref_comparison,
+    get_files_to_refactor_at_rev,
+    list_tree_blobs,
+    resolve_ref,
+    sample_commits,
+)
+from tests.conftest import (
+    CODEOWNERS,
+    LARGE_BLOB_SIZE,
+    REGEX,
+    commit_files,
+    peak_memory,
+)
+
+
+def test_list_tree_blobs(git_repository):
+    blobs = dict(list_tree_blobs(git_repository, "HEAD"))
+    assert sorted(blobs) == ["CODEOWNERS", "src/a/A.vue", "src/b/B.ts", "src/b/C.ts"]
+    assert blobs["src/a/A.vue"] == git_repository.head.commit.tree["src/a/A.vue"].hexsha
+
+
+def test_get_files_to_refactor_at_rev(git_repository):
+    cache = BlobMatchCache(REGEX)
+    files = get_files_to_refactor_at_rev(git_repository, "HEAD~3", cache, [])
+    assert files == ["src/a/A.vue", "src/b/B.ts"]
+    assert get_files_to_refactor_at_rev(git_repository, "HEAD~3", cache, ["vue"]) == [
+        "src/b/B.ts"
+    ]
+    assert get_files_to_refactor_at_rev(git_repository, "HEAD", cache, []) == []
+
+
+def test_blob_match_cache_reads_identical_files_once(git_repository):
+    cache = BlobMatchCache(REGEX)
+    get_files_to_refactor_at_rev(git_repository, "HEAD~1", cache, [])
+    reads = cache.reads
+    # src/a/A.vue changed in the last commit but it now has the same content as
+    # src/b/B.ts so its blob was already matched
+    get_files_to_refactor_at_rev(git_repository, "HEAD", cache, [])
+    assert cache.reads == reads
+    assert len(cache.counts) == reads
+
+
+def test_blob_match_cache_doesnt_read_large_blobs(git_repository):
+    commit_files(
+        git_repository,
+        {"src/Large.ts": "expanded: 'a'\n" * (LARGE_BLOB_SIZE // 14)},
+        "Large file",
+        Actor("Jane", "jane@enterprise.com"),
+    )
+    hexsha = git_repository.head.commit.tree["src/Large.ts"].hexsha
+    cache = BlobMatchCache(REGEX, max_blob_size=1024 * 1024)
+
+    def count():
+        assert cache.count(git_repository, hexsha, "src/Large.ts") == 0
+
+    assert peak_memory(count) < 1024 * 1024
+    assert cache.matcher.skipped == [("src/Large.ts", LARGE_BLOB_SIZE // 14 * 14)]
+
+
+def test_resolve_ref_falls_back_to_remote_tracking_branch(git_repository, tmp_path):
+    git_repository.create_head("release", "HEAD~2")
+    clone = git_repository.clone(tmp_path / "clone")
+    assert resolve_ref(clone, "release") == git_repository.commit("HEAD~2").hexsha
+
+
+def test_build_ref_comparison(git_repository):
+    git_repository.create_head("release", "HEAD~2")
+    git_repository.create_head("feature").checkout()
+    commit_files(
+        git_repository,
+        {"src/b/D.ts": "expanded: 'd'\n"},
+        "Add expands",
+        Actor("John", "john@enterprise.com"),
+    )
+    statuses = build_ref_comparison(
+        git_repository, ["release", "feature"], "HEAD~4", REGEX, []
+    )
+    assert list(statuses) == ["release", "feature"]
+    assert sorted(statuses["release"]) == [
+        File("src/a/A.vue"),
+        File("src/b/B.ts"),
+    ]
+    assert sorted(statuses["feature"]) == [
+        File("src/a/A.vue", fixed=True),
+        File("src/b/B.ts", fixed=True),
+        File("src/b/D.ts", is_new=True),
+    ]
+
+
+def test_display_ref_comparison(capsys):
+    statuses = {
+        "release": [File("src/a/A.vue"), File("src/b/B.ts")],
+        "develop": [File("src/a/A.vue", fixed=True), File("src/b/B.ts")],
+    }
+    display_ref_comparison("Old Expands", statuses, CodeOwners(CODEOWNERS))
+    out, err = capsys.readouterr()
+    lines = [line.split() for line in out.splitlines()]
+    assert ["TeamA", "0/1", "0.0%", "1/1", "100.0%"] in lines
+    assert ["Overall", "0/2", "0.0%", "1/2", "50.0%"] in lines
+
+
+def test_sample_commits():
+    commits = [
+        SimpleNamespace(
+            name=name, committed_date=datetime(2024, 1, day, hour).timestamp()
+        )
+        for name, day, hour in [
+            ("baseline", 1, 9),
+            ("a", 1, 12),
+            ("b", 2, 9),
+            ("c", 2, 18),
+            ("d", 8, 9),
+        ]
+    ]
+    assert [c.name for c in sample_commits(commits, "day")] == [
+        "baseline",
+        "a",
+        "c",
+        "d",
+    ]
+    # 2024-01-01 is a Monday
+    assert [c.name for c in sample_commits(commits, "week")] == ["baseline", "c", "d"]
+    assert sample_commits([], "week") == []
+
+
+def test_build_snapshot_data(git_repository):
+    baseline = git_repository.commit("HEAD~3").hexsha
+    snapshots = build_snapshot_data(
+        git_repository, baseline, "HEAD", REGEX, [], bucket="commit", workers=2
+    )
+    assert [s.summary for s in snapshots] == [
+        "Baseline",
+        "Refactor A",
+        "Refactor B",
+        "Finish A",
+    ]
+    assert [s.remaining_files_count for s in snapshots] == [2, 2, 1, 0]
+    assert [s.refactor_count for s in snapshots] == [0, 0, 1, 1]
+
+    # every commit was made on the same day
+    snapshots = build_snapshot_data(git_repository, baseline, "HEAD", REGEX, [])
+    assert [s.summary for s in snapshots] == ["Baseline", "Finish A"]
+    assert [s.remaining_files_count for s in snapshots] == [2, 0]